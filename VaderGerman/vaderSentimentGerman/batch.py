@@ -0,0 +1,106 @@
+# coding: utf-8
+"""
+Batch scoring for VADER style analyzers.
+
+Any analyzer class with a `polarity_scores(text)` method can mix in
+`BatchScoringMixin` to score many texts per call. Large batches are fanned
+out to a process pool whose workers receive the already loaded analyzer
+once (inherited on fork, pickled once per worker otherwise), so lexicons
+are never reloaded per text.
+
+Pools can not be started from daemonic processes, e.g. Celery prefork
+children, use `workers=1` there.
+"""
+import os
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
+
+# texts sent to a worker per task
+CHUNK_SIZE = 500
+
+# the analyzer of a pool worker, set once by the pool initializer
+_worker_analyzer = None
+
+
+def _init_worker(analyzer):
+    global _worker_analyzer
+    _worker_analyzer = analyzer
+
+
+def _score_chunk(texts):
+    polarity_scores = _worker_analyzer.polarity_scores
+    return [polarity_scores(text) for text in texts]
+
+
+def chunks(iterable, size):
+    """
+    Split an iterable into lists of at most `size` items without materializing it
+    """
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+
+def imap_chunks(function, chunked, workers, initializer=None, initargs=(), arguments=None):
+    """
+    Apply `function` to chunks in a process pool and yield every chunk with its result in input order
+
+    At most two chunks per worker are in flight, so arbitrarily long iterables
+    of chunks are processed in bounded memory. `arguments(chunk)` builds what
+    is sent to the worker, the chunk itself by default.
+    """
+    with Pool(workers, initializer=initializer, initargs=initargs) as pool:
+        pending = deque()
+        for chunk in chunked:
+            pending.append((chunk, pool.apply_async(function, (arguments(chunk) if arguments else chunk,))))
+            if len(pending) >= 2 * workers:
+                chunk, result = pending.popleft()
+                yield chunk, result.get()
+        while pending:
+            chunk, result = pending.popleft()
+            yield chunk, result.get()
+
+
+class BatchScoringMixin(object):
+    """
+    Adds `polarity_scores_batch` and `iter_polarity_scores` to an analyzer.
+    """
+
+    # batches smaller than this are scored in process, a pool would cost more than it saves
+    min_parallel_batch = 5000
+
+    def iter_polarity_scores(self, texts, workers=1, chunksize=CHUNK_SIZE):
+        """
+        Lazily score an iterable of texts, results are yielded in input order
+
+        With `workers` > 1 the texts are scored by a process pool. At most two
+        chunks per worker are in flight, so arbitrarily long iterables are
+        scored in bounded memory. `workers=None` uses all cores.
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+
+        if workers <= 1:
+            polarity_scores = self.polarity_scores
+            for text in texts:
+                yield polarity_scores(text)
+            return
+
+        for _, scores in imap_chunks(_score_chunk, chunks(texts, chunksize), workers, _init_worker, (self,)):
+            yield from scores
+
+    def polarity_scores_batch(self, texts, workers=1, chunksize=CHUNK_SIZE):
+        """
+        Score an iterable of texts and return the list of `polarity_scores` results in input order
+
+        Batches shorter than `min_parallel_batch` are always scored in process.
+        """
+        texts = list(texts)
+        if len(texts) < self.min_parallel_batch:
+            workers = 1
+        elif workers is not None:
+            workers = min(workers, -(-len(texts) // chunksize))
+        return list(self.iter_polarity_scores(texts, workers=workers, chunksize=chunksize))
@@ -0,0 +1,131 @@
+# coding: utf-8
+"""
+Translation of emojis into their textual descriptions.
+
+The first codepoints of the keys of the emoji lexicon are compiled into a
+character class which finds the positions where an emoji may start, at every
+candidate the longest key is looked up, so ZWJ sequences, skin tones and variation selectors are
+translated as a whole. Emojis attached to words or to each other are found as
+well, their description is surrounded by spaces so it is tokenized into words
+of its own.
+
+Texts without an emoji are returned as they are, without building a new string.
+Most texts are rejected by a set lookup of their characters before the
+expression runs: every emoji contains at least one of the marker codepoints.
+"""
+import re
+
+# emoji dict -> translator, shared by all analyzers of a process
+_TRANSLATORS = {}
+
+# codepoints above U+FFFF at most this far apart share a range of the candidate class
+ASTRAL_GAP = 0x400
+
+
+def _character_ranges(characters):
+    """
+    Return the body of a character class matching at least the sorted characters
+
+    `re` tests codepoints outside the basic multilingual plane against every range
+    of a class, so these are merged into a few wide ranges, the characters in the
+    gaps are candidates which do not start an emoji.
+    """
+    ranges = []
+    for character in characters:
+        gap = ASTRAL_GAP if character > '\uffff' else 1
+        if ranges and ord(ranges[-1][1]) + gap >= ord(character):
+            ranges[-1][1] = character
+        else:
+            ranges.append([character, character])
+    return ''.join(
+        re.escape(first) if first == last else '{}-{}'.format(re.escape(first), re.escape(last))
+        for first, last in ranges
+    )
+
+
+class EmojiTranslator(object):
+    """
+    Replaces every emoji of a text by its description in a single scan
+    """
+
+    def __init__(self, emojis):
+        self.emojis = emojis
+        self.descriptions = {emoji: " {} ".format(description) for emoji, description in emojis.items()}
+        # first codepoint -> lengths of the keys starting with it, longest first
+        self.lengths = {}
+        for emoji in emojis:
+            self.lengths.setdefault(emoji[0], set()).add(len(emoji))
+        self.lengths = {first: sorted(lengths, reverse=True) for first, lengths in self.lengths.items()}
+
+        # emojis starting with an ASCII character like the keycap '#️⃣' are found by their second character,
+        # so digits and the like are no candidates, unless such an emoji is a single character
+        candidates = {first for first in self.lengths if first >= '\x80'}
+        self.ascii_firsts = frozenset(emoji[0] for emoji in emojis if emoji[0] < '\x80')
+        for emoji in emojis:
+            if emoji[0] < '\x80':
+                candidates.add(emoji[1] if len(emoji) > 1 else emoji[0])
+        self.pattern = re.compile('[{}]'.format(_character_ranges(sorted(candidates)))) if candidates else None
+
+        # the first non ASCII codepoint of every emoji, None if an emoji consists of ASCII characters only
+        markers = set()
+        for emoji in emojis:
+            marker = next((character for character in emoji if character >= '\x80'), None)
+            if marker is None:
+                markers = None
+                break
+            markers.add(marker)
+        self.markers = frozenset(markers) if markers is not None else None
+
+    @classmethod
+    def for_emojis(cls, emojis):
+        """
+        Return the shared translator of an emoji dict, compiling it on first use
+        """
+        cached = _TRANSLATORS.get(id(emojis))
+        if cached is None or cached[0] is not emojis:
+            # the dict is kept with its translator, so its id is not reused while cached
+            cached = _TRANSLATORS[id(emojis)] = (emojis, cls(emojis))
+        return cached[1]
+
+    def _longest(self, text, start):
+        """
+        Return the longest emoji starting at `start` or None
+        """
+        emojis = self.emojis
+        for length in self.lengths.get(text[start], ()):
+            candidate = text[start:start + length]
+            if len(candidate) == length and candidate in emojis:
+                return candidate
+        return None
+
+    def translate(self, text):
+        """
+        Return the text with every emoji replaced by its description, the text itself if it has none
+        """
+        if self.pattern is None or (self.markers is not None and self.markers.isdisjoint(text)):
+            return text
+        ascii_firsts = self.ascii_firsts
+        longest = self._longest
+        pieces = []
+        position = 0
+        for match in self.pattern.finditer(text):
+            start = match.start()
+            if start < position:
+                continue  # part of the emoji translated last
+            emoji = None
+            if start > position and text[start - 1] in ascii_firsts:
+                emoji = longest(text, start - 1)
+            if emoji is not None:
+                start -= 1
+            else:
+                emoji = longest(text, start)
+                if emoji is None:
+                    continue
+            pieces.append(text[position:start])
+            pieces.append(self.descriptions[emoji])
+            position = start + len(emoji)
+
+        if not pieces:
+            return text
+        pieces.append(text[position:])
+        return "".join(pieces)
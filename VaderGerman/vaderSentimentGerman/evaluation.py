@@ -0,0 +1,191 @@
+# coding: utf-8
+"""
+Evaluation of GerVADER on a labeled corpus.
+
+The corpus is read once and scored in parallel. A single pass collects the
+confusion matrix, per-class precision, recall and F1 at the classification
+threshold and the same metrics for a sweep of alternative thresholds, so a
+lexicon change can be judged by one run:
+
+    python -m VaderGerman.vaderSentimentGerman.evaluation corpus.tsv --output report.json
+
+The corpus is a tsv file without a header line, the label is in the second and
+the text in the third column (see README). Labels other than positive, neutral
+and negative are counted as unknown and are left out of the metrics.
+"""
+import os
+import sys
+import csv
+import json
+import argparse
+from io import open
+from itertools import tee
+
+LABELS = ('positive', 'neutral', 'negative')
+UNKNOWN = 'unknown'
+
+# compound scores at or above the threshold are positive, at or below its negative are negative
+DEFAULT_THRESHOLD = 0.05
+# thresholds evaluated by the sweep: start, stop (inclusive) and step
+DEFAULT_SWEEP = (0.0, 0.5, 0.05)
+
+
+def classify(compound, threshold=DEFAULT_THRESHOLD):
+    """
+    Map a compound score to positive, neutral or negative
+    """
+    if compound >= threshold:
+        return 'positive'
+    if compound <= -threshold:
+        return 'negative'
+    return 'neutral'
+
+
+def sweep_thresholds(start, stop, step):
+    """
+    The thresholds from `start` to `stop` (inclusive) in steps of `step`
+    """
+    count = int(round((stop - start) / step)) + 1
+    return [round(start + i * step, 6) for i in range(max(count, 0))]
+
+
+def read_corpus(path, labels=None):
+    """
+    Lazily read (label, text) rows of a corpus file, rows without a text are skipped
+
+    `labels` restricts the rows to these labels.
+    """
+    with open(path, encoding="utf-8", newline='') as tsvfile:
+        for row in csv.reader(tsvfile, delimiter='\t'):
+            if len(row) < 3:
+                continue
+            if labels is not None and row[1] not in labels:
+                continue
+            yield row[1], row[2]
+
+
+def class_metrics(confusion, label):
+    """
+    Precision, recall, F1 and support of a label from a confusion matrix of known labels
+    """
+    true_positives = confusion[label][label]
+    predicted = sum(confusion[gold][label] for gold in LABELS)
+    support = sum(confusion[label].values())
+    precision = true_positives / predicted if predicted else 0.0
+    recall = true_positives / support if support else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {'precision': precision, 'recall': recall, 'f1': f1, 'support': support}
+
+
+def summarize(confusion):
+    """
+    Accuracy, macro F1 and the metrics of every class of a confusion matrix
+    """
+    classes = {label: class_metrics(confusion, label) for label in LABELS}
+    labeled = sum(metrics['support'] for metrics in classes.values())
+    correct = sum(confusion[label][label] for label in LABELS)
+    return {
+        'accuracy': correct / labeled if labeled else 0.0,
+        'macro_f1': sum(metrics['f1'] for metrics in classes.values()) / len(LABELS),
+        'classes': classes,
+    }
+
+
+def _empty_confusion():
+    return {gold: dict.fromkeys(LABELS, 0) for gold in LABELS + (UNKNOWN,)}
+
+
+class Evaluation(object):
+    """
+    Collects the outcome of scored rows, for the classification threshold and all sweep thresholds at once
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, thresholds=None):
+        self.threshold = threshold
+        self.thresholds = sweep_thresholds(*DEFAULT_SWEEP) if thresholds is None else list(thresholds)
+        self.confusion = _empty_confusion()
+        self.sweep = [_empty_confusion() for _ in self.thresholds]
+        self.documents = 0
+
+    def add(self, label, compound):
+        """
+        Count a row and return its predicted label at the classification threshold
+        """
+        gold = label if label in LABELS else UNKNOWN
+        predicted = classify(compound, self.threshold)
+        self.confusion[gold][predicted] += 1
+        for threshold, confusion in zip(self.thresholds, self.sweep):
+            confusion[gold][classify(compound, threshold)] += 1
+        self.documents += 1
+        return predicted
+
+    def report(self):
+        """
+        The results as a JSON serializable dict
+        """
+        report = {
+            'documents': self.documents,
+            'threshold': self.threshold,
+            'labels': {gold: sum(row.values()) for gold, row in self.confusion.items()},
+            'predictions': {label: sum(row[label] for row in self.confusion.values()) for label in LABELS},
+            'confusion': self.confusion,
+        }
+        report.update(summarize(self.confusion))
+
+        report['sweep'] = []
+        for threshold, confusion in zip(self.thresholds, self.sweep):
+            entry = {'threshold': threshold}
+            entry.update(summarize(confusion))
+            report['sweep'].append(entry)
+        if report['sweep']:
+            best = max(report['sweep'], key=lambda entry: (entry['macro_f1'], entry['accuracy']))
+            report['best_threshold'] = best['threshold']
+        return report
+
+
+def evaluate(inputfile, analyzer=None, workers=None, threshold=DEFAULT_THRESHOLD, thresholds=None, labels=None, on_row=None):
+    """
+    Score a labeled corpus in one pass and return the evaluation report
+
+    `workers` processes score the texts, None uses all cores and 1 scores in
+    process. `labels` restricts the rows to these labels. `on_row(label, text,
+    scores, predicted)` is called for every row in corpus order, e.g. to write
+    the rows by outcome.
+    """
+    if analyzer is None:
+        from .vaderSentimentGER import SentimentIntensityAnalyzer
+        analyzer = SentimentIntensityAnalyzer()
+
+    evaluation = Evaluation(threshold, thresholds)
+    rows, texts = tee(read_corpus(inputfile, labels))
+    scored = analyzer.iter_polarity_scores((text for _, text in texts), workers=workers)
+    for (label, text), scores in zip(rows, scored):
+        predicted = evaluation.add(label, scores['compound'])
+        if on_row is not None:
+            on_row(label, text, scores, predicted)
+    return evaluation.report()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate GerVADER on a labeled tsv corpus")
+    parser.add_argument('corpus', help="tsv file with the label in the 2nd and the text in the 3rd column")
+    parser.add_argument('--output', default=None, help="write the JSON report to this file instead of stdout")
+    parser.add_argument('--workers', type=int, default=None, help="scoring processes, all cores by default")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--sweep', type=float, nargs=3, default=DEFAULT_SWEEP, metavar=('START', 'STOP', 'STEP'),
+                        help="thresholds to evaluate, stop is inclusive")
+    args = parser.parse_args(argv)
+
+    report = evaluate(args.corpus, workers=args.workers, threshold=args.threshold, thresholds=sweep_thresholds(*args.sweep))
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        with open(args.output, 'w', encoding="utf-8") as output:
+            output.write(json.dumps(report, indent=2))
+        print("Wrote {}".format(os.path.abspath(args.output)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
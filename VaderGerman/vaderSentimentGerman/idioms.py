@@ -0,0 +1,92 @@
+# coding: utf-8
+"""
+Matching of multi-word phrases in a token stream.
+
+The idiom and multi-word booster tables are compiled into an Aho-Corasick
+automaton over tokens. It runs once per text and finds every phrase of every
+table in a single left to right pass, so the cost of a text does not grow with
+the size of the tables. The scorer then looks the matched spans up instead of
+formatting and probing n-gram strings around every lexicon word.
+"""
+
+
+class PhraseMatcher(object):
+    """
+    Aho-Corasick automaton over lowercased tokens
+
+    Every phrase is a string of space separated words with a value per table,
+    `match` returns the spans of all phrases occurring in a token list.
+    """
+
+    def __init__(self, tables):
+        """
+        `tables` is a list of dicts mapping phrases to values, a span matched by a
+        phrase yields a tuple with its value in every table (None if it is missing)
+        """
+        self.tables = tables
+        # state -> {word: next state}, state 0 is the root
+        self.transitions = [{}]
+        self.failures = [0]
+        # state -> [(number of words, values)] of the phrases ending in this state
+        self.outputs = [[]]
+
+        phrases = {}
+        for index, table in enumerate(tables):
+            for phrase, value in table.items():
+                values = phrases.setdefault(tuple(phrase.split()), [None] * len(tables))
+                values[index] = value
+        for words, values in phrases.items():
+            self._add(words, tuple(values))
+        self._link()
+
+        self.words = frozenset(word for words in phrases for word in words)
+
+    def _add(self, words, values):
+        state = 0
+        for word in words:
+            next_state = self.transitions[state].get(word)
+            if next_state is None:
+                next_state = len(self.transitions)
+                self.transitions.append({})
+                self.failures.append(0)
+                self.outputs.append([])
+                self.transitions[state][word] = next_state
+            state = next_state
+        self.outputs[state].append((len(words), values))
+
+    def _link(self):
+        """
+        Set the failure link of every state to its longest proper suffix which is a prefix of a phrase
+        """
+        queue = list(self.transitions[0].values())
+        for state in queue:
+            for word, next_state in self.transitions[state].items():
+                queue.append(next_state)
+                failure = self.failures[state]
+                while failure and word not in self.transitions[failure]:
+                    failure = self.failures[failure]
+                self.failures[next_state] = self.transitions[failure].get(word, 0)
+                self.outputs[next_state] = self.outputs[next_state] + self.outputs[self.failures[next_state]]
+
+    def match(self, tokens):
+        """
+        Return the phrases occurring in a list of lowercased tokens as a dict of
+        (start, end) token spans to the tuple of the values of the phrase
+        """
+        words = self.words
+        transitions = self.transitions
+        failures = self.failures
+        outputs = self.outputs
+
+        spans = {}
+        state = 0
+        for end, token in enumerate(tokens, 1):
+            if token not in words:
+                state = 0
+                continue
+            while state and token not in transitions[state]:
+                state = failures[state]
+            state = transitions[state].get(token, 0)
+            for length, values in outputs[state]:
+                spans[(end - length, end)] = values
+        return spans
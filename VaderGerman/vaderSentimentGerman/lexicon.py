@@ -0,0 +1,209 @@
+# coding: utf-8
+"""
+Loading of the sentiment and emoji lexicons.
+
+The text lexicons can be compiled into a single binary artifact which is
+deserialized without any text parsing:
+
+    python -m VaderGerman.vaderSentimentGerman.lexicon
+
+Layout of the artifact (little endian):
+
+    magic (4s) | format version (H) | marshal version (H) |
+    lexicon size (Q) | lexicon sha1 (20s) | emoji size (Q) | emoji sha1 (20s) |
+    marshal payload of (lexicon dict, emoji dict)
+
+Rebuild it whenever one of the text lexicons changes, `--check` verifies that
+the artifact still matches its sources.
+"""
+import os
+import sys
+import struct
+import marshal
+import hashlib
+import argparse
+from io import open
+
+MAGIC = b'GVLX'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHHQ20sQ20s')
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_LEXICON_FILE = "GERVaderLexicon.txt"
+DEFAULT_EMOJI_LEXICON_FILE = "emoji_utf8_lexicon.txt"
+DEFAULT_COMPILED_FILE = os.path.join(PACKAGE_DIR, "bin", "lexicons.bin")
+
+# (lexicon path, emoji path) -> (lexicon dict, emoji dict), shared by all analyzers of a process
+_LOADED_LEXICONS = {}
+
+
+class LexiconFormatError(ValueError):
+    """
+    The compiled artifact is missing, stale or was written by an incompatible version.
+    """
+
+
+def resolve_path(filename):
+    """
+    Resolve lexicon file names relative to this package
+    """
+    return os.path.join(PACKAGE_DIR, filename)
+
+
+def parse_lexicon(lexicon_text):
+    """
+    Convert the text of a lexicon file to a dictionary of word -> valence
+    """
+    lex_dict = {}
+    for line in lexicon_text.split('\n'):
+        (word, measure) = line.strip().split('\t')[0:2]
+        lex_dict[word] = float(measure)
+    return lex_dict
+
+
+def parse_emoji_lexicon(emoji_text):
+    """
+    Convert the text of an emoji lexicon file to a dictionary of emoji -> description
+    """
+    emoji_dict = {}
+    for line in emoji_text.split('\n'):
+        (emoji, description) = line.strip().split('\t')[0:2]
+        emoji_dict[emoji] = description
+    return emoji_dict
+
+
+def _read_source(path):
+    with open(path, 'rb') as f:
+        raw = f.read()
+    return raw, len(raw), hashlib.sha1(raw).digest()
+
+
+def compile_lexicons(lexicon_path, emoji_path, output_path=DEFAULT_COMPILED_FILE):
+    """
+    Parse both text lexicons once and write them to a binary artifact
+    """
+    lexicon_raw, lexicon_size, lexicon_sha1 = _read_source(lexicon_path)
+    emoji_raw, emoji_size, emoji_sha1 = _read_source(emoji_path)
+
+    payload = marshal.dumps((parse_lexicon(lexicon_raw.decode('utf-8')),
+                             parse_emoji_lexicon(emoji_raw.decode('utf-8'))))
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, marshal.version,
+                         lexicon_size, lexicon_sha1, emoji_size, emoji_sha1)
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    tmp_path = output_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        f.write(payload)
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+def _read_header(buffer):
+    if len(buffer) < HEADER.size:
+        raise LexiconFormatError("truncated lexicon artifact")
+    header = HEADER.unpack_from(buffer)
+    if header[0] != MAGIC:
+        raise LexiconFormatError("not a compiled lexicon artifact")
+    if header[1] != FORMAT_VERSION or header[2] != marshal.version:
+        raise LexiconFormatError("lexicon artifact was written by an incompatible version")
+    return header
+
+
+def load_compiled(compiled_path, lexicon_path=None, emoji_path=None):
+    """
+    Load both lexicons from a compiled artifact
+
+    If the source paths are given, their SHA-1 is compared against the one
+    recorded at compile time, so an edit which keeps the size of a source
+    (e.g. a changed valence) is caught as well. Hashing the sources is far
+    cheaper than parsing them. The whole payload is deserialized right away,
+    so the file is read instead of memory-mapped.
+    """
+    with open(compiled_path, 'rb') as f:
+        data = f.read()
+    _, _, _, _, lexicon_sha1, _, emoji_sha1 = _read_header(data)
+    if lexicon_path is not None and _read_source(lexicon_path)[2] != lexicon_sha1:
+        raise LexiconFormatError("lexicon artifact is stale: {}".format(lexicon_path))
+    if emoji_path is not None and _read_source(emoji_path)[2] != emoji_sha1:
+        raise LexiconFormatError("lexicon artifact is stale: {}".format(emoji_path))
+    with memoryview(data) as view:
+        return marshal.loads(view[HEADER.size:])
+
+
+def check_compiled(compiled_path, lexicon_path, emoji_path):
+    """
+    Return True if the artifact exists and was compiled from exactly these sources
+    """
+    try:
+        with open(compiled_path, 'rb') as f:
+            header = _read_header(f.read(HEADER.size))
+    except (OSError, LexiconFormatError):
+        return False
+    _, lexicon_size, lexicon_sha1 = _read_source(lexicon_path)
+    _, emoji_size, emoji_sha1 = _read_source(emoji_path)
+    return header[3:] == (lexicon_size, lexicon_sha1, emoji_size, emoji_sha1)
+
+
+def load_text(lexicon_path, emoji_path):
+    """
+    Parse both lexicons from their text files
+    """
+    with open(lexicon_path, encoding='utf-8') as f:
+        lexicon = parse_lexicon(f.read())
+    with open(emoji_path, encoding='utf-8') as f:
+        emojis = parse_emoji_lexicon(f.read())
+    return lexicon, emojis
+
+
+def load_lexicons(lexicon_file=DEFAULT_LEXICON_FILE, emoji_lexicon=DEFAULT_EMOJI_LEXICON_FILE,
+                  compiled_file=DEFAULT_COMPILED_FILE):
+    """
+    Return (lexicon dict, emoji dict) for the given lexicon files
+
+    The compiled artifact is used for the default lexicons if it is present and
+    matches them, otherwise the text files are parsed. The result is cached per
+    process, so every analyzer after the first one shares the same dictionaries.
+    Nothing is ever written here.
+    """
+    lexicon_path = resolve_path(lexicon_file)
+    emoji_path = resolve_path(emoji_lexicon)
+    key = (lexicon_path, emoji_path)
+
+    if key not in _LOADED_LEXICONS:
+        loaded = None
+        is_default = lexicon_file == DEFAULT_LEXICON_FILE and emoji_lexicon == DEFAULT_EMOJI_LEXICON_FILE
+        if is_default and compiled_file and os.path.isfile(compiled_file):
+            try:
+                loaded = load_compiled(compiled_file, lexicon_path, emoji_path)
+            except LexiconFormatError:
+                loaded = None
+        if loaded is None:
+            loaded = load_text(lexicon_path, emoji_path)
+        _LOADED_LEXICONS[key] = loaded
+    return _LOADED_LEXICONS[key]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile the GerVADER lexicons into a binary artifact")
+    parser.add_argument('--lexicon', default=DEFAULT_LEXICON_FILE)
+    parser.add_argument('--emoji-lexicon', default=DEFAULT_EMOJI_LEXICON_FILE)
+    parser.add_argument('--output', default=DEFAULT_COMPILED_FILE)
+    parser.add_argument('--check', action='store_true', help="only verify that the artifact is up to date")
+    args = parser.parse_args(argv)
+
+    lexicon_path = resolve_path(args.lexicon)
+    emoji_path = resolve_path(args.emoji_lexicon)
+    if args.check:
+        if check_compiled(args.output, lexicon_path, emoji_path):
+            print("{} is up to date".format(args.output))
+            return 0
+        print("{} is missing or stale, rebuild it".format(args.output))
+        return 1
+
+    print("Wrote {}".format(compile_lexicons(lexicon_path, emoji_path, args.output)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
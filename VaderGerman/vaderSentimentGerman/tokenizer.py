@@ -0,0 +1,78 @@
+# coding: utf-8
+"""
+Single pass tokenizer for SentiText.
+
+Splits a text on whitespace, drops single character tokens and strips one
+leading or trailing punctuation sequence from PUNC_LIST off a word. Emoticons
+and contractions are kept as they are. This yields the same tokens as the
+original punctuation/word product lookup without building it for every text.
+"""
+import re
+import string
+
+PUNC_LIST = [".", "!", "?", ",", ";", ":", "-", "'", "\"",
+             "!!", "!!!", "??", "???", "?!?", "!?!", "?!?!", "!?!?"]
+PUNC_SET = frozenset(PUNC_LIST)
+
+PUNCTUATION_CHARS = frozenset(string.punctuation)
+
+_ESCAPED_PUNCTUATION = re.escape(string.punctuation)
+REGEX_TOKEN = re.compile(r'\S+')
+# a punctuation run followed by a word of at least two characters without any punctuation, and vice versa
+REGEX_LEADING_PUNC = re.compile('([{0}]+)([^{0}]{{2,}})'.format(_ESCAPED_PUNCTUATION))
+REGEX_TRAILING_PUNC = re.compile('([^{0}]{{2,}})([{0}]+)'.format(_ESCAPED_PUNCTUATION))
+
+
+def _strip_punctuation(token):
+    """
+    Strip one leading or trailing PUNC_LIST sequence off a token starting or ending with punctuation
+    """
+    if token[0] in PUNCTUATION_CHARS:
+        stripped = REGEX_LEADING_PUNC.fullmatch(token)
+        if stripped is not None and stripped.group(1) in PUNC_SET:
+            return stripped.group(2)
+    elif token[-1] in PUNCTUATION_CHARS:
+        stripped = REGEX_TRAILING_PUNC.fullmatch(token)
+        if stripped is not None and stripped.group(2) in PUNC_SET:
+            return stripped.group(1)
+    return token
+
+
+def tokenize(text):
+    """
+    Return the tokens of `text`
+
+    A token only loses its punctuation if what remains is a word of at least
+    two characters, so 'cat,' becomes 'cat' while ':-)' and "don't" survive.
+    """
+    tokens = []
+    append = tokens.append
+    for token in text.split():
+        if len(token) < 2:
+            continue
+        if token[0] in PUNCTUATION_CHARS or token[-1] in PUNCTUATION_CHARS:
+            token = _strip_punctuation(token)
+        append(token)
+    return tokens
+
+
+def tokenize_with_offsets(text):
+    """
+    Return the tokens of `text` like `tokenize` and their (start, end) character offsets in it
+    """
+    tokens = []
+    offsets = []
+    for match in REGEX_TOKEN.finditer(text):
+        token = match.group()
+        if len(token) < 2:
+            continue
+        start, end = match.span()
+        stripped = _strip_punctuation(token)
+        if stripped is not token:
+            if token.startswith(stripped):
+                end = start + len(stripped)
+            else:
+                start = end - len(stripped)
+        tokens.append(stripped)
+        offsets.append((start, end))
+    return tokens, offsets
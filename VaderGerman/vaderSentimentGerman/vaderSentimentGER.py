@@ -15,10 +15,15 @@ import re
 import math
 import string
 import csv
-from itertools import product
-from inspect import getsourcefile
 from io import open
 
+from .batch import BatchScoringMixin
+from .emojis import EmojiTranslator
+from .evaluation import evaluate
+from .idioms import PhraseMatcher
+from .lexicon import load_lexicons, parse_emoji_lexicon, parse_lexicon, resolve_path
+from .tokenizer import PUNC_LIST, tokenize, tokenize_with_offsets
+
 # ##Constants##
 
 # (empirically derived mean sentiment intensity rating increase for booster words)
@@ -32,8 +37,6 @@ N_SCALAR = -0.74
 # for removing punctuation
 REGEX_REMOVE_PUNCTUATION = re.compile('[%s]' % re.escape(string.punctuation))
 
-PUNC_LIST = [".", "!", "?", ",", ";", ":", "-", "'", "\"",
-             "!!", "!!!", "??", "???", "?!?", "!?!", "?!?!", "!?!?"]
 NEGATE_EN = \
     ["aint", "arent", "cannot", "cant", "couldnt", "darent", "didnt", "doesnt",
      "ain't", "aren't", "can't", "couldn't", "daren't", "didn't", "doesn't",
@@ -50,6 +53,7 @@ NEGATE = \
      "keine", "nope", "nichts", "weder", "nix", "nirgendwo",
      "uhuh","uh-uh",
      "ohne", "selten", "kaum", "seltentst", "rar", "trotz", "trotzdem", "obwohl"]
+NEGATE_SET = frozenset(NEGATE)
 
 # booster/dampener 'intensifiers' or 'degree adverbs'
 # http://en.wiktionary.org/wiki/Category:English_degree_adverbs
@@ -154,6 +158,25 @@ SENTIMENT_LADEN_IDIOMS = {"cut the mustard": 2, "hand to mouth": -2,
 SPECIAL_CASE_IDIOMS = {"the shit": 3, "the bomb": 3, "bad ass": 1.5, "yeah right": -2,
                        "kiss of death": -1.5}
 
+# the idioms and multi-word boosters (e.g. 'kind of') compiled into matchers which run once per text,
+# call `compile_idioms` after changing one of the tables
+IDIOM_MATCHER = None
+SENTIMENT_LADEN_IDIOM_MATCHER = None
+
+
+def compile_idioms():
+    """
+    Compile the idiom tables into the phrase matchers, spans matched by IDIOM_MATCHER
+    hold the (SPECIAL_CASE_IDIOMS, BOOSTER_DICT) values of their phrase
+    """
+    global IDIOM_MATCHER, SENTIMENT_LADEN_IDIOM_MATCHER
+    multi_word_boosters = {phrase: value for phrase, value in BOOSTER_DICT.items() if " " in phrase}
+    IDIOM_MATCHER = PhraseMatcher([SPECIAL_CASE_IDIOMS, multi_word_boosters])
+    SENTIMENT_LADEN_IDIOM_MATCHER = PhraseMatcher([SENTIMENT_LADEN_IDIOMS])
+
+
+compile_idioms()
+
 
 # #Static methods# #
 
@@ -162,11 +185,8 @@ def negated(input_words, include_nt=True):
     Determine if input contains negation words
     """
     input_words = [str(w).lower() for w in input_words]
-    neg_words = []
-    neg_words.extend(NEGATE)
-    for word in neg_words:
-        if word in input_words:
-            return True
+    if not NEGATE_SET.isdisjoint(input_words):
+        return True
     if include_nt:
         for word in input_words:
             if "n't" in word:
@@ -178,6 +198,13 @@ def negated(input_words, include_nt=True):
     return False
 
 
+def is_negation(word_lower, include_nt=True):
+    """
+    Determine if a single lowercased word is a negation, same as `negated([word_lower])`
+    """
+    return word_lower in NEGATE_SET or (include_nt and "n't" in word_lower)
+
+
 def normalize(score, alpha=15):
     """
     Normalize the score to be between -1 and 1 using an alpha that
@@ -209,13 +236,14 @@ def allcap_differential(words):
     return is_different
 
 
-def scalar_inc_dec(word, valence, is_cap_diff):
+def scalar_inc_dec(word, valence, is_cap_diff, word_lower=None):
     """
     Check if the preceding words increase, decrease, or negate/nullify the
     valence
     """
     scalar = 0.0
-    word_lower = word.lower()
+    if word_lower is None:
+        word_lower = word.lower()
     if word_lower in BOOSTER_DICT:
         scalar = BOOSTER_DICT[word_lower]
         if valence < 0:
@@ -236,32 +264,27 @@ class SentiText(object):
 
     def __init__(self, text):
         if not isinstance(text, str):
-            text = str(text).encode('utf-8')
+            text = str(text)
         self.text = text
-        self.words_and_emoticons = self._words_and_emoticons()
         # doesn't separate words from\
         # adjacent punctuation (keeps emoticons & contractions)
+        self.words_and_emoticons = tokenize(text)
+        # lowercased once, every later stage looks tokens up by position in here
+        self.words_and_emoticons_lower = [w.lower() for w in self.words_and_emoticons]
         self.is_cap_diff = allcap_differential(self.words_and_emoticons)
+        # (start, end) token spans of the idioms and multi-word boosters in the text
+        self.idiom_spans = IDIOM_MATCHER.match(self.words_and_emoticons_lower)
+
+        self._offsets = None
 
-    def _words_plus_punc(self):
+    @property
+    def offsets(self):
         """
-        Returns mapping of form:
-        {
-            'cat,': 'cat',
-            ',cat': 'cat',
-        }
+        The (start, end) offsets of `words_and_emoticons` in `text`, computed on first access
         """
-        no_punc_text = REGEX_REMOVE_PUNCTUATION.sub('', self.text)
-        # removes punctuation (but loses emoticons & contractions)
-        words_only = no_punc_text.split()
-        # remove singletons
-        words_only = set(w for w in words_only if len(w) > 1)
-        # the product gives ('cat', ',') and (',', 'cat')
-        punc_before = {''.join(p): p[1] for p in product(PUNC_LIST, words_only)}
-        punc_after = {''.join(p): p[0] for p in product(words_only, PUNC_LIST)}
-        words_punc_dict = punc_before
-        words_punc_dict.update(punc_after)
-        return words_punc_dict
+        if self._offsets is None:
+            self._offsets = tokenize_with_offsets(self.text)[1]
+        return self._offsets
 
     def _words_and_emoticons(self):
         """
@@ -269,93 +292,82 @@ class SentiText(object):
         Leaves contractions and most emoticons
             Does not preserve punc-plus-letter emoticons (e.g. :D)
         """
-        wes = self.text.split()
-        words_punc_dict = self._words_plus_punc()
-        wes = [we for we in wes if len(we) > 1]
-        for i, we in enumerate(wes):
-            if we in words_punc_dict:
-                wes[i] = words_punc_dict[we]
-        return wes
+        return tokenize(self.text)
 
 
-class SentimentIntensityAnalyzer(object):
+class SentimentIntensityAnalyzer(BatchScoringMixin):
     """
     Give a sentiment intensity score to sentences.
     """
 
     def __init__(self, lexicon_file="GERVaderLexicon.txt", emoji_lexicon="emoji_utf8_lexicon.txt"):
-        _this_module_file_path_ = os.path.abspath(getsourcefile(lambda: 0))
-        lexicon_full_filepath = os.path.join(os.path.dirname(_this_module_file_path_), lexicon_file)
-        with open(lexicon_full_filepath, encoding='utf-8') as f:
-            self.lexicon_full_filepath = f.read()
-        self.lexicon = self.make_lex_dict()
+        # the dictionaries are loaded once per process (from the compiled artifact
+        # if available) and shared between analyzers, do not mutate them in place
+        self.lexicon_file = lexicon_file
+        self.emoji_lexicon = emoji_lexicon
+        self.lexicon, self.emojis = load_lexicons(lexicon_file, emoji_lexicon)
+        self.emoji_translator = EmojiTranslator.for_emojis(self.emojis)
+
+    def polarity_scores_vectorized(self, texts, chunksize=None):
+        """
+        Score a list of texts with the NumPy backend (see `vectorized`), for large batches
 
-        emoji_full_filepath = os.path.join(os.path.dirname(_this_module_file_path_), emoji_lexicon)
-        with open(emoji_full_filepath, encoding='utf-8') as f:
-            self.emoji_full_filepath = f.read()
-        self.emojis = self.make_emoji_dict()
+        The results match `polarity_scores` within `vectorized.TOLERANCE`.
+        """
+        from .vectorized import VECTOR_CHUNK_SIZE, VectorizedScorer
+        scorer = getattr(self, '_vectorized_scorer', None)
+        if scorer is None:
+            scorer = self._vectorized_scorer = VectorizedScorer(self)
+        return scorer.polarity_scores_batch(list(texts), chunksize=chunksize or VECTOR_CHUNK_SIZE)
 
     def make_lex_dict(self):
         """
         Convert lexicon file to a dictionary
         """
-        lex_dict = {}
-        for line in self.lexicon_full_filepath.split('\n'):
-            (word, measure) = line.strip().split('\t')[0:2]
-            lex_dict[word] = float(measure)
-        #for key,val in lex_dict.items():
-        #    print (key, "\t\t", val)
-        with open('./VaderGerman/vaderSentimentGerman/bin/outputmap.txt', 'w') as f:
-            print (lex_dict, file=f)
-        return lex_dict
+        with open(resolve_path(self.lexicon_file), encoding='utf-8') as f:
+            return parse_lexicon(f.read())
 
     def make_emoji_dict(self):
         """
         Convert emoji lexicon file to a dictionary
         """
-        emoji_dict = {}
-        for line in self.emoji_full_filepath.split('\n'):
-            (emoji, description) = line.strip().split('\t')[0:2]
-            emoji_dict[emoji] = description
-        return emoji_dict
+        with open(resolve_path(self.emoji_lexicon), encoding='utf-8') as f:
+            return parse_emoji_lexicon(f.read())
 
     def polarity_scores(self, text):
         """
         Return a float for sentiment strength based on the input text.
         Positive values are positive valence, negative value are negative
         valence.
+
+        Tokens are lowercased once and scored by position in a single pass.
+        Earlier versions looked every token up with `list.index`, which scored
+        repeated words (and repeated sentiments in the 'but' check) as if they
+        were at their first occurrence.
         """
-        # convert emojis to their textual descriptions
-        text_token_list = text.split()
-        text_no_emoji_lst = []
-        for token in text_token_list:
-            if token in self.emojis:
-                # get the textual description
-                description = self.emojis[token]
-                text_no_emoji_lst.append(description)
-            else:
-                text_no_emoji_lst.append(token)
-        text = " ".join(x for x in text_no_emoji_lst)
+        # convert emojis to their textual descriptions, also when they are attached to words
+        text = self.emoji_translator.translate(text)
 
         sentitext = SentiText(text)
 
         sentiments = []
         words_and_emoticons = sentitext.words_and_emoticons
-        for item in words_and_emoticons:
+        words_and_emoticons_lower = sentitext.words_and_emoticons_lower
+        last = len(words_and_emoticons) - 1
+        for i, item in enumerate(words_and_emoticons):
             valence = 0
-            i = words_and_emoticons.index(item)
+            item_lower = words_and_emoticons_lower[i]
             # check for vader_lexicon words that may be used as modifiers or negations
-            if item.lower() in BOOSTER_DICT:
+            if item_lower in BOOSTER_DICT:
                 sentiments.append(valence)
                 continue
-            if (i < len(words_and_emoticons) - 1 and item.lower() == "kind" and
-                    words_and_emoticons[i + 1].lower() == "of"):
+            if i < last and item_lower == "kind" and words_and_emoticons_lower[i + 1] == "of":
                 sentiments.append(valence)
                 continue
 
             sentiments = self.sentiment_valence(valence, sentitext, item, i, sentiments)
 
-        sentiments = self._but_check(words_and_emoticons, sentiments)
+        sentiments = self._but_check(words_and_emoticons_lower, sentiments)
 
         valence_dict = self.score_valence(sentiments, text)
 
@@ -364,19 +376,18 @@ class SentimentIntensityAnalyzer(object):
     def sentiment_valence(self, valence, sentitext, item, i, sentiments):
         is_cap_diff = sentitext.is_cap_diff
         words_and_emoticons = sentitext.words_and_emoticons
-		# change
-        item_lowercase = item.lower()
-        item_lowercase = item
-		# change
-        if item_lowercase not in self.lexicon:
-            item_lowercase = item.lower()
-			# change
-            if item_lowercase not in self.lexicon:
-                item_lowercase = item.capitalize()
-		# -------- Originale Fortsetzung
-        if item_lowercase in self.lexicon:
+        words_and_emoticons_lower = sentitext.words_and_emoticons_lower
+        lexicon = self.lexicon
+        # German nouns are capitalized, so look the word up as written first,
+        # then lowercased and finally capitalized
+        lexicon_item = item
+        if lexicon_item not in lexicon:
+            lexicon_item = words_and_emoticons_lower[i]
+            if lexicon_item not in lexicon:
+                lexicon_item = item.capitalize()
+        if lexicon_item in lexicon:
             # get the sentiment valence
-            valence = self.lexicon[item_lowercase]
+            valence = lexicon[lexicon_item]
             # check if sentiment laden word is in ALL CAPS (while others aren't)
             if item.isupper() and is_cap_diff:
                 if valence > 0:
@@ -388,106 +399,87 @@ class SentimentIntensityAnalyzer(object):
                 # dampen the scalar modifier of preceding words and emoticons
                 # (excluding the ones that immediately preceed the item) based
                 # on their distance from the current item.
-                if i > start_i and words_and_emoticons[i - (start_i + 1)].lower() not in self.lexicon:
-                    s = scalar_inc_dec(words_and_emoticons[i - (start_i + 1)], valence, is_cap_diff)
+                j = i - (start_i + 1)
+                if i > start_i and words_and_emoticons_lower[j] not in lexicon:
+                    s = scalar_inc_dec(words_and_emoticons[j], valence, is_cap_diff, words_and_emoticons_lower[j])
                     if start_i == 1 and s != 0:
                         s = s * 0.95
                     if start_i == 2 and s != 0:
                         s = s * 0.9
                     valence = valence + s
-                    valence = self._negation_check(valence, words_and_emoticons, start_i, i)
+                    valence = self._negation_check(valence, words_and_emoticons_lower, start_i, i)
                     if start_i == 2:
-                        valence = self._special_idioms_check(valence, words_and_emoticons, i)
+                        valence = self._special_idioms_check(valence, sentitext.idiom_spans, i)
 
-            valence = self._least_check(valence, words_and_emoticons, i)
+            valence = self._least_check(valence, words_and_emoticons_lower, i)
         sentiments.append(valence)
         return sentiments
 
-    def _least_check(self, valence, words_and_emoticons, i):
+    def _least_check(self, valence, words_and_emoticons_lower, i):
         # check for negation case using "least"
-        if i > 1 and words_and_emoticons[i - 1].lower() not in self.lexicon \
-                and words_and_emoticons[i - 1].lower() == "least":
-            if words_and_emoticons[i - 2].lower() != "at" and words_and_emoticons[i - 2].lower() != "very":
+        if i > 1 and words_and_emoticons_lower[i - 1] not in self.lexicon \
+                and words_and_emoticons_lower[i - 1] == "least":
+            if words_and_emoticons_lower[i - 2] != "at" and words_and_emoticons_lower[i - 2] != "very":
                 valence = valence * N_SCALAR
-        elif i > 0 and words_and_emoticons[i - 1].lower() not in self.lexicon \
-                and words_and_emoticons[i - 1].lower() == "least":
+        elif i > 0 and words_and_emoticons_lower[i - 1] not in self.lexicon \
+                and words_and_emoticons_lower[i - 1] == "least":
             valence = valence * N_SCALAR
         return valence
 
     @staticmethod
-    def _but_check(words_and_emoticons, sentiments):
+    def _but_check(words_and_emoticons_lower, sentiments):
         # check for modification in sentiment due to contrastive conjunction 'but'
-        words_and_emoticons_lower = [str(w).lower() for w in words_and_emoticons]
         if 'but' in words_and_emoticons_lower:
             bi = words_and_emoticons_lower.index('but')
-            for sentiment in sentiments:
-                si = sentiments.index(sentiment)
+            for si in range(len(sentiments)):
                 if si < bi:
-                    sentiments.pop(si)
-                    sentiments.insert(si, sentiment * 0.5)
+                    sentiments[si] = sentiments[si] * 0.5
                 elif si > bi:
-                    sentiments.pop(si)
-                    sentiments.insert(si, sentiment * 1.5)
+                    sentiments[si] = sentiments[si] * 1.5
         return sentiments
 
     @staticmethod
-    def _special_idioms_check(valence, words_and_emoticons, i):
-        words_and_emoticons_lower = [str(w).lower() for w in words_and_emoticons]
-        onezero = "{0} {1}".format(words_and_emoticons_lower[i - 1], words_and_emoticons_lower[i])
-
-        twoonezero = "{0} {1} {2}".format(words_and_emoticons_lower[i - 2],
-                                          words_and_emoticons_lower[i - 1], words_and_emoticons_lower[i])
-
-        twoone = "{0} {1}".format(words_and_emoticons_lower[i - 2], words_and_emoticons_lower[i - 1])
-
-        threetwoone = "{0} {1} {2}".format(words_and_emoticons_lower[i - 3],
-                                           words_and_emoticons_lower[i - 2], words_and_emoticons_lower[i - 1])
-
-        threetwo = "{0} {1}".format(words_and_emoticons_lower[i - 3], words_and_emoticons_lower[i - 2])
-
-        sequences = [onezero, twoonezero, twoone, threetwoone, threetwo]
-
-        for seq in sequences:
-            if seq in SPECIAL_CASE_IDIOMS:
-                valence = SPECIAL_CASE_IDIOMS[seq]
+    def _special_idioms_check(valence, idiom_spans, i):
+        if not idiom_spans:
+            return valence
+
+        # idioms ending at or right before the item, the first one found sets the valence
+        for span in ((i - 1, i + 1), (i - 2, i + 1), (i - 2, i), (i - 3, i), (i - 3, i - 1)):
+            values = idiom_spans.get(span)
+            if values is not None and values[0] is not None:
+                valence = values[0]
                 break
 
-        if len(words_and_emoticons_lower) - 1 > i:
-            zeroone = "{0} {1}".format(words_and_emoticons_lower[i], words_and_emoticons_lower[i + 1])
-            if zeroone in SPECIAL_CASE_IDIOMS:
-                valence = SPECIAL_CASE_IDIOMS[zeroone]
-        if len(words_and_emoticons_lower) - 1 > i + 1:
-            zeroonetwo = "{0} {1} {2}".format(words_and_emoticons_lower[i], words_and_emoticons_lower[i + 1],
-                                              words_and_emoticons_lower[i + 2])
-            if zeroonetwo in SPECIAL_CASE_IDIOMS:
-                valence = SPECIAL_CASE_IDIOMS[zeroonetwo]
+        # idioms starting at the item override it
+        for span in ((i, i + 2), (i, i + 3)):
+            values = idiom_spans.get(span)
+            if values is not None and values[0] is not None:
+                valence = values[0]
 
         # check for booster/dampener bi-grams such as 'sort of' or 'kind of'
-        n_grams = [threetwoone, threetwo, twoone]
-        for n_gram in n_grams:
-            if n_gram in BOOSTER_DICT:
-                valence = valence + BOOSTER_DICT[n_gram]
+        for span in ((i - 3, i), (i - 3, i - 1), (i - 2, i)):
+            values = idiom_spans.get(span)
+            if values is not None and values[1] is not None:
+                valence = valence + values[1]
         return valence
 
     @staticmethod
     def _sentiment_laden_idioms_check(valence, senti_text_lower):
         # Future Work
         # check for sentiment laden idioms that don't contain a lexicon word
-        idioms_valences = []
-        for idiom in SENTIMENT_LADEN_IDIOMS:
-            if idiom in senti_text_lower:
-                print(idiom, senti_text_lower)
-                valence = SENTIMENT_LADEN_IDIOMS[idiom]
-                idioms_valences.append(valence)
-        if len(idioms_valences) > 0:
-            valence = sum(idioms_valences) / float(len(idioms_valences))
+        tokens = senti_text_lower.split()
+        idioms = {
+            tuple(tokens[start:end]): values[0]
+            for (start, end), values in SENTIMENT_LADEN_IDIOM_MATCHER.match(tokens).items()
+        }
+        if idioms:
+            valence = sum(idioms.values()) / float(len(idioms))
         return valence
 
     @staticmethod
-    def _negation_check(valence, words_and_emoticons, start_i, i):
-        words_and_emoticons_lower = [str(w).lower() for w in words_and_emoticons]
+    def _negation_check(valence, words_and_emoticons_lower, start_i, i):
         if start_i == 0:
-            if negated([words_and_emoticons_lower[i - (start_i + 1)]]):  # 1 word preceding lexicon word (w/o stopwords)
+            if is_negation(words_and_emoticons_lower[i - (start_i + 1)]):  # 1 word preceding lexicon word (w/o stopwords)
                 valence = valence * N_SCALAR
         if start_i == 1:
             if words_and_emoticons_lower[i - 2] == "never" and \
@@ -497,7 +489,7 @@ class SentimentIntensityAnalyzer(object):
             elif words_and_emoticons_lower[i - 2] == "without" and \
                     words_and_emoticons_lower[i - 1] == "doubt":
                 valence = valence
-            elif negated([words_and_emoticons_lower[i - (start_i + 1)]]):  # 2 words preceding the lexicon word position
+            elif is_negation(words_and_emoticons_lower[i - (start_i + 1)]):  # 2 words preceding the lexicon word position
                 valence = valence * N_SCALAR
         if start_i == 2:
             if words_and_emoticons_lower[i - 3] == "never" and \
@@ -507,7 +499,7 @@ class SentimentIntensityAnalyzer(object):
             elif words_and_emoticons_lower[i - 3] == "without" and \
                     (words_and_emoticons_lower[i - 2] == "doubt" or words_and_emoticons_lower[i - 1] == "doubt"):
                 valence = valence
-            elif negated([words_and_emoticons_lower[i - (start_i + 1)]]):  # 3 words preceding the lexicon word position
+            elif is_negation(words_and_emoticons_lower[i - (start_i + 1)]):  # 3 words preceding the lexicon word position
                 valence = valence * N_SCALAR
         return valence
 
@@ -645,14 +637,14 @@ if __name__ == '__main__':
     print("\n\n Demo Done!")
 
 
-def entry(inputfile, directoryname, sentimentset="positive"):
-    analyzer = SentimentIntensityAnalyzer()
-    outdirectory = "./results/"+directoryname+"/"+sentimentset+"/"
-    no_right = 0
-    no_wrong_neutral = 0
-    no_wrong = 0
-    no_wrong_in_neutral_out_pos = 0
-    no_wrong_in_neutral_out_neg = 0
+def entry(inputfile, directoryname, sentimentset="positive", workers=1):
+    """
+    Score the rows of one label and write them by outcome into ./results/directoryname/sentimentset/
+
+    Use `evaluation.evaluate` to evaluate all labels in one pass.
+    """
+    outdirectory = os.path.join("./results", directoryname, sentimentset)
+    os.makedirs(outdirectory, exist_ok=True)
 
     outfilename_neutral = 'GERVADER__wrong_neutral.tsv'
     outfilename_wrong = 'GERVADER__wrong.tsv'
@@ -660,106 +652,64 @@ def entry(inputfile, directoryname, sentimentset="positive"):
         outfilename_neutral = 'GERVADER__wrong_pos.tsv'
         outfilename_wrong = 'GERVADER__wrong_neg.tsv'
 
-    sum = 0
-    with open(inputfile, encoding="utf-8") as tsvfile, open(outdirectory+'GERVADER_right.tsv', 'w', encoding="utf-8") as right, open(outdirectory+outfilename_neutral, 'w', encoding="utf-8") as wrong_neutral, open(outdirectory+outfilename_wrong, 'w', encoding="utf-8") as wrong:
-        tsvfile = csv.reader(tsvfile, delimiter='\t')
+    with open(os.path.join(outdirectory, 'GERVADER_right.tsv'), 'w', encoding="utf-8") as right, open(os.path.join(outdirectory, outfilename_neutral), 'w', encoding="utf-8") as wrong_neutral, open(os.path.join(outdirectory, outfilename_wrong), 'w', encoding="utf-8") as wrong:
         right = csv.writer(right, delimiter='\t', lineterminator='\n')
         wrong = csv.writer(wrong, delimiter='\t', lineterminator='\n')
         wrong_neutral = csv.writer(wrong_neutral, delimiter='\t', lineterminator='\n')
-        for row in tsvfile:
-            if row[1] != sentimentset:
-                continue
-            vs = analyzer.polarity_scores(row[2])
-            score = vs['compound']
-            if score >= 0.05:
-                score = 'positive'
-            elif score <= -0.05:
-                score = 'negative'
-            else:
-                score = 'neutral'
 
-            if score == row[1]:
-                right.writerow([row[2], row[1], vs['compound'], str(vs)])
-                no_right += 1
+        def write_row(label, text, vs, score):
+            if score == label:
+                writer = right
+            elif score == "neutral" or (sentimentset == "neutral" and score == "positive"):
+                writer = wrong_neutral
             else:
-                if score == "neutral":
-                    wrong_neutral.writerow([row[2], row[1], vs['compound'], str(vs)])
-                    no_wrong_neutral += 1
-                else:
-                    if sentimentset == "neutral":
-                        if score == "positive":
-                            no_wrong_in_neutral_out_pos += 1
-                            wrong_neutral.writerow([row[2], row[1], vs['compound'], str(vs)])
-                        else:
-                            no_wrong_in_neutral_out_neg += 1
-                            wrong.writerow([row[2], row[1], vs['compound'], str(vs)])
-                    else:
-                        wrong.writerow([row[2], row[1], vs['compound'], str(vs)])
-                        no_wrong += 1
-            sum += 1
+                writer = wrong
+            writer.writerow([text, label, vs['compound'], str(vs)])
+
+        report = evaluate(inputfile, workers=workers, thresholds=[], labels=[sentimentset], on_row=write_row)
 
+    predictions = report['confusion'][sentimentset]
     print("")
     print("-Stats-"+sentimentset+"--")
-    print("Sum: {}".format(sum))
-    print("Correct: " + str(no_right))
+    print("Sum: {}".format(report['documents']))
+    print("Correct: " + str(predictions[sentimentset]))
     if not sentimentset == "neutral":
-        print("Wrong: " + str(no_wrong))
-        print("Wrong(neutral): " + str(no_wrong_neutral))
+        print("Wrong: " + str(sum(count for label, count in predictions.items() if label not in (sentimentset, "neutral"))))
+        print("Wrong(neutral): " + str(predictions["neutral"]))
     else:
-        print("Wrong(pos): " + str(no_wrong_in_neutral_out_pos))
-        print("Wrong(neg): " + str(no_wrong_in_neutral_out_neg))
+        print("Wrong(pos): " + str(predictions["positive"]))
+        print("Wrong(neg): " + str(predictions["negative"]))
     print("")
+    return report
 
-def sentimentAll(inputfile, directoryname):
-    analyzer = SentimentIntensityAnalyzer()
-    outdirectory = "./results/mode_All/"+directoryname+"/"
-    no_positive = 0
-    no_neutral = 0
-    no_negative = 0
-    label_positive = 0
-    label_neutral = 0
-    label_negative = 0
-    label_unknown = 0
-    sum = 0
-    with open(inputfile, encoding="utf-8") as tsvfile, open(outdirectory+'GERVADER_positive.tsv', 'w', encoding="utf-8") as positive, open(outdirectory+'GERVADER__neutral.tsv', 'w', encoding="utf-8") as neutral, open(outdirectory+'GERVADER__negative.tsv', 'w', encoding="utf-8") as negative:
-        tsvfile = csv.reader(tsvfile, delimiter='\t')
-        positive = csv.writer(positive, delimiter='\t', lineterminator='\n')
-        negative = csv.writer(negative, delimiter='\t', lineterminator='\n')
-        neutral = csv.writer(neutral, delimiter='\t', lineterminator='\n')
-        for row in tsvfile:
-            vs = analyzer.polarity_scores(row[2])
-            score = vs['compound']
-            if score >= 0.05:
-                score = 'positive'
-                positive.writerow([row[2], row[1], vs['compound'], str(vs)])
-                no_positive += 1
-            elif score <= -0.05:
-                score = 'negative'
-                negative.writerow([row[2], row[1], vs['compound'], str(vs)])
-                no_negative += 1
-            else:
-                score = 'neutral'
-                neutral.writerow([row[2], row[1], vs['compound'], str(vs)])
-                no_neutral += 1
-            sum += 1
-            if row[1] == "positive":
-                label_positive += 1
-            elif row[1] == "neutral":
-                label_neutral += 1
-            elif row[1] == "negative":
-                label_negative += 1
-            else:
-                label_unknown += 1
+def sentimentAll(inputfile, directoryname, workers=1):
+    """
+    Score all rows and write them by predicted label into ./results/mode_All/directoryname/
+    """
+    outdirectory = os.path.join("./results/mode_All", directoryname)
+    os.makedirs(outdirectory, exist_ok=True)
+
+    with open(os.path.join(outdirectory, 'GERVADER_positive.tsv'), 'w', encoding="utf-8") as positive, open(os.path.join(outdirectory, 'GERVADER__neutral.tsv'), 'w', encoding="utf-8") as neutral, open(os.path.join(outdirectory, 'GERVADER__negative.tsv'), 'w', encoding="utf-8") as negative:
+        writers = {
+            'positive': csv.writer(positive, delimiter='\t', lineterminator='\n'),
+            'neutral': csv.writer(neutral, delimiter='\t', lineterminator='\n'),
+            'negative': csv.writer(negative, delimiter='\t', lineterminator='\n'),
+        }
+
+        def write_row(label, text, vs, score):
+            writers[score].writerow([text, label, vs['compound'], str(vs)])
 
+        report = evaluate(inputfile, workers=workers, thresholds=[], on_row=write_row)
 
     print("")
     print("-Rated Positive, Neutral, Negative:--")
-    print("Sum: "+str(sum))
-    print("Positive: " + str(no_positive))
-    print("Neutral: " + str(no_neutral))
-    print("Negative: " + str(no_negative))
+    print("Sum: "+str(report['documents']))
+    print("Positive: " + str(report['predictions']['positive']))
+    print("Neutral: " + str(report['predictions']['neutral']))
+    print("Negative: " + str(report['predictions']['negative']))
     print("-Dataset Read Labels-")
-    print("Positive: " + str(label_positive))
-    print("Neutral: " + str(label_neutral))
-    print("Negative: " + str(label_negative))
-    print("Unknown: " + str(label_unknown))
+    print("Positive: " + str(report['labels']['positive']))
+    print("Neutral: " + str(report['labels']['neutral']))
+    print("Negative: " + str(report['labels']['negative']))
+    print("Unknown: " + str(report['labels']['unknown']))
+    return report
@@ -0,0 +1,307 @@
+# coding: utf-8
+"""
+NumPy scoring backend for large batches.
+
+Texts are still split and tokenized one by one, but every token is then
+encoded to an integer ID of a vocabulary which holds the lexicon valence
+and the booster, negation and capitalization properties of the token. A
+chunk of texts becomes a padded (texts x tokens) ID matrix and the rules of
+`polarity_scores` run on whole columns: the booster, negation and
+cap-emphasis windows are shifted copies of the matrix, the 'but' check,
+`normalize`, `_sift_sentiment_scores` and the punctuation amplifiers are
+array operations. Texts are sorted by length before they are chunked, so
+little padding is scored.
+
+Sums are taken with `cumsum` in token order, the same order `polarity_scores`
+adds them in, so the results agree with the pure Python analyzer within
+TOLERANCE (in practice they are identical). Texts containing a word of the
+English special case idioms (e.g. 'the shit', 'kiss of death') are scored
+by the pure Python analyzer.
+
+NumPy is optional, install it to use this backend:
+
+    analyzer = SentimentIntensityAnalyzer()
+    scores = analyzer.polarity_scores_vectorized(texts)
+"""
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+from .tokenizer import tokenize
+from . import vaderSentimentGER
+from .vaderSentimentGER import BOOSTER_DICT, C_INCR, N_SCALAR, is_negation
+
+# largest difference to `polarity_scores` of any of the returned scores
+TOLERANCE = 1e-4
+
+# texts per padded matrix
+VECTOR_CHUNK_SIZE = 2048
+
+# the vocabulary is dropped once it holds this many tokens, bounds the memory of endless streams
+MAX_VOCABULARY = 1000000
+
+# flags of the words some rules look for
+KIND, OF, LEAST, AT_VERY, NEVER, SO_THIS, WITHOUT, DOUBT, BUT, IDIOM = (1 << bit for bit in range(10))
+FLAG_WORDS = {
+    "kind": KIND, "of": OF, "least": LEAST, "at": AT_VERY, "very": AT_VERY, "never": NEVER,
+    "so": SO_THIS, "this": SO_THIS, "without": WITHOUT, "doubt": DOUBT, "but": BUT,
+}
+
+# (empirically derived mean sentiment intensity rating increase for exclamation and question marks)
+EP_INCR = 0.292
+QM_INCR = 0.18
+QM_MAX = 0.96
+
+
+def has_idiom(text):
+    """
+    Determine if the tokens of a text contain one of the phrases `_special_idioms_check` looks for
+    """
+    return bool(vaderSentimentGER.IDIOM_MATCHER.match([token.lower() for token in tokenize(text)]))
+
+
+def _shift(matrix, k, fill):
+    """
+    Shift the columns of a matrix right by k, so column i holds the value of column i - k
+    """
+    shifted = np.empty_like(matrix)
+    shifted[:, :k] = fill
+    shifted[:, k:] = matrix[:, :-k]
+    return shifted
+
+
+class TokenVocabulary(object):
+    """
+    Integer IDs of tokens as written, with the properties the scoring rules need per ID
+    """
+
+    def __init__(self, lexicon):
+        self.lexicon = lexicon
+        self.clear()
+
+    def clear(self):
+        # whitespace separated part of a text -> IDs of its tokens
+        self.word_ids = {}
+        # ID 0 pads the matrices
+        self.ids = {}
+        self.valence = [0.0]
+        self.has_valence = [False]
+        self.in_lexicon = [False]
+        self.booster = [0.0]
+        self.is_booster = [False]
+        self.is_upper = [False]
+        self.is_negation = [False]
+        self.flags = [0]
+        self._arrays = None
+
+    def __len__(self):
+        return len(self.valence)
+
+    def add(self, token):
+        """
+        Return the ID of a token, adding it to the vocabulary if it is new
+        """
+        lexicon = self.lexicon
+        lower = token.lower()
+        # same lookup order as `sentiment_valence`: as written, lowercased, capitalized
+        item = token if token in lexicon else lower if lower in lexicon else token.capitalize()
+
+        token_id = self.ids[token] = len(self.valence)
+        self.valence.append(lexicon.get(item, 0.0))
+        self.has_valence.append(item in lexicon)
+        self.in_lexicon.append(lower in lexicon)
+        self.booster.append(BOOSTER_DICT.get(lower, 0.0))
+        self.is_booster.append(lower in BOOSTER_DICT)
+        self.is_upper.append(token.isupper())
+        self.is_negation.append(is_negation(lower))
+        self.flags.append(FLAG_WORDS.get(lower, 0) | (IDIOM if lower in vaderSentimentGER.IDIOM_MATCHER.words else 0))
+        self._arrays = None
+        return token_id
+
+    def encode_word(self, word):
+        """
+        Return the IDs of the tokens of a whitespace separated part of a text
+        """
+        ids = self.ids
+        encoded = self.word_ids[word] = tuple(ids.get(token) or self.add(token) for token in tokenize(word))
+        return encoded
+
+    def encode(self, words):
+        """
+        Return the token IDs of the whitespace separated parts of a text
+        """
+        word_ids = self.word_ids
+        ids = []
+        for word in words:
+            encoded = word_ids.get(word)
+            if encoded is None:
+                encoded = self.encode_word(word)
+            ids.extend(encoded)
+        return ids
+
+    def arrays(self):
+        """
+        The properties as arrays indexed by ID, rebuilt after tokens were added
+        """
+        if self._arrays is None:
+            self._arrays = {
+                'valence': np.array(self.valence, dtype=np.float64),
+                'has_valence': np.array(self.has_valence, dtype=bool),
+                'in_lexicon': np.array(self.in_lexicon, dtype=bool),
+                'booster': np.array(self.booster, dtype=np.float64),
+                'is_booster': np.array(self.is_booster, dtype=bool),
+                'is_upper': np.array(self.is_upper, dtype=bool),
+                'is_negation': np.array(self.is_negation, dtype=bool),
+                'flags': np.array(self.flags, dtype=np.int64),
+            }
+        return self._arrays
+
+
+class VectorizedScorer(object):
+    """
+    Scores batches of texts like `polarity_scores` of the wrapped analyzer, with NumPy
+    """
+
+    def __init__(self, analyzer, max_vocabulary=MAX_VOCABULARY):
+        if np is None:
+            raise ImportError("The vectorized backend needs numpy, install it with `pip install numpy`")
+        self.analyzer = analyzer
+        self.emoji_translator = analyzer.emoji_translator
+        self.vocabulary = TokenVocabulary(analyzer.lexicon)
+        self.max_vocabulary = max_vocabulary
+
+    def _prepare(self, text):
+        """
+        Return the text, its token IDs and the number of exclamation and question marks after emoji translation
+        """
+        translated = self.emoji_translator.translate(text)
+        return text, self.vocabulary.encode(translated.split()), translated.count("!"), translated.count("?")
+
+    def polarity_scores_batch(self, texts, chunksize=VECTOR_CHUNK_SIZE):
+        """
+        Score a list of texts, results are returned in input order
+        """
+        if len(self.vocabulary) > self.max_vocabulary:
+            self.vocabulary.clear()
+
+        prepared = [self._prepare(text) for text in texts]
+        order = sorted(range(len(prepared)), key=lambda index: len(prepared[index][1]))
+
+        results = [None] * len(prepared)
+        for start in range(0, len(order), chunksize):
+            indexes = order[start:start + chunksize]
+            chunk = [prepared[index] for index in indexes]
+            for index, scores in zip(indexes, self._score_chunk(chunk)):
+                results[index] = scores
+        return results
+
+    def _score_chunk(self, chunk):
+        vocabulary = self.vocabulary.arrays()
+        rows = len(chunk)
+        width = max(len(ids) for _, ids, _, _ in chunk)
+        if width == 0:
+            return [{"neg": 0.0, "neu": 0.0, "pos": 0.0, "compound": 0.0} for _ in chunk]
+
+        lengths = np.array([len(ids) for _, ids, _, _ in chunk])
+        matrix = np.zeros((rows, width), dtype=np.int64)
+        for row, (_, ids, _, _) in enumerate(chunk):
+            matrix[row, :len(ids)] = ids
+        position = np.arange(width)[np.newaxis, :]
+        mask = position < lengths[:, np.newaxis]
+
+        flags = vocabulary['flags'][matrix]
+        is_upper = vocabulary['is_upper'][matrix]
+        in_lexicon = vocabulary['in_lexicon'][matrix]
+        booster = vocabulary['booster'][matrix]
+        is_booster = vocabulary['is_booster'][matrix]
+        is_neg = vocabulary['is_negation'][matrix]
+
+        def flag(name, k=0):
+            has = (flags & name) != 0
+            return _shift(has, k, False) if k else has
+
+        # some but not all tokens are ALL CAPS
+        allcaps = is_upper.sum(axis=1)
+        is_cap_diff = ((allcaps > 0) & (allcaps < lengths))[:, np.newaxis]
+
+        valence = vocabulary['valence'][matrix]
+        valence = np.where(is_upper & is_cap_diff, np.where(valence > 0, valence + C_INCR, valence - C_INCR), valence)
+
+        for k, dampening in ((0, 1.0), (1, 0.95), (2, 0.9)):
+            applies = (position > k) & ~_shift(in_lexicon, k + 1, True)
+
+            # `scalar_inc_dec` of the word k + 1 before
+            scalar = np.where(valence < 0, -1.0, 1.0) * _shift(booster, k + 1, 0.0)
+            cap_booster = _shift(is_booster & is_upper, k + 1, False) & is_cap_diff
+            scalar = np.where(cap_booster, np.where(valence > 0, scalar + C_INCR, scalar - C_INCR), scalar)
+            valence = np.where(applies, valence + scalar * dampening, valence)
+
+            # `_negation_check`
+            negated = _shift(is_neg, k + 1, False)
+            if k == 0:
+                factor = np.where(negated, N_SCALAR, 1.0)
+            elif k == 1:
+                factor = np.where(flag(NEVER, 2) & flag(SO_THIS, 1), 1.25,
+                                  np.where(flag(WITHOUT, 2) & flag(DOUBT, 1), 1.0,
+                                           np.where(negated, N_SCALAR, 1.0)))
+            else:
+                factor = np.where((flag(NEVER, 3) & flag(SO_THIS, 2)) | flag(SO_THIS, 1), 1.25,
+                                  np.where(flag(WITHOUT, 3) & (flag(DOUBT, 2) | flag(DOUBT, 1)), 1.0,
+                                           np.where(negated, N_SCALAR, 1.0)))
+            valence = np.where(applies, valence * factor, valence)
+
+        # `_least_check`
+        least_before = flag(LEAST, 1) & ~_shift(in_lexicon, 1, True)
+        least = least_before & (((position > 1) & ~flag(AT_VERY, 2)) | (position == 1))
+        valence = np.where(least, valence * N_SCALAR, valence)
+
+        # boosters and 'kind' of 'kind of' are neutral, so are words without valence
+        kind_of = flag(KIND) & np.concatenate([flag(OF)[:, 1:], np.zeros((rows, 1), dtype=bool)], axis=1)
+        scored = vocabulary['has_valence'][matrix] & ~is_booster & ~kind_of & mask
+        sentiments = np.where(scored, valence, 0.0)
+
+        # `_but_check`
+        is_but = flag(BUT) & mask
+        has_but = is_but.any(axis=1)[:, np.newaxis]
+        but_index = is_but.argmax(axis=1)[:, np.newaxis]
+        sentiments = np.where(has_but & (position < but_index), sentiments * 0.5, sentiments)
+        sentiments = np.where(has_but & (position > but_index), sentiments * 1.5, sentiments)
+
+        # `score_valence`, cumsum adds in token order like the pure Python implementation
+        sum_s = np.cumsum(sentiments, axis=1)[:, -1]
+        ep_count = np.minimum([ep_count for _, _, ep_count, _ in chunk], 4)
+        qm_count = np.array([qm_count for _, _, _, qm_count in chunk])
+        amplifier = ep_count * EP_INCR + np.where(qm_count > 1, np.where(qm_count <= 3, qm_count * QM_INCR, QM_MAX), 0.0)
+        sum_s = np.where(sum_s > 0, sum_s + amplifier, np.where(sum_s < 0, sum_s - amplifier, sum_s))
+        compound = np.clip(sum_s / np.sqrt(sum_s * sum_s + 15), -1.0, 1.0)
+
+        # `_sift_sentiment_scores`
+        pos_sum = np.cumsum(np.where(sentiments > 0, sentiments + 1, 0.0), axis=1)[:, -1]
+        neg_sum = np.cumsum(np.where(sentiments < 0, sentiments - 1, 0.0), axis=1)[:, -1]
+        neu_count = ((sentiments == 0) & mask).sum(axis=1)
+        pos_larger = pos_sum > np.fabs(neg_sum)
+        neg_larger = pos_sum < np.fabs(neg_sum)
+        pos_sum = np.where(pos_larger, pos_sum + amplifier, pos_sum)
+        neg_sum = np.where(neg_larger, neg_sum - amplifier, neg_sum)
+
+        total = pos_sum + np.fabs(neg_sum) + neu_count
+        with np.errstate(invalid='ignore', divide='ignore'):
+            pos = np.fabs(pos_sum / total)
+            neg = np.fabs(neg_sum / total)
+            neu = np.fabs(neu_count / total)
+
+        idioms = ((flags & IDIOM) != 0).any(axis=1)
+        polarity_scores = self.analyzer.polarity_scores
+        results = []
+        for row, (text, ids, _, _) in enumerate(chunk):
+            if idioms[row] and has_idiom(self.emoji_translator.translate(text)):
+                results.append(polarity_scores(text))
+            elif not ids:
+                results.append({"neg": 0.0, "neu": 0.0, "pos": 0.0, "compound": 0.0})
+            else:
+                results.append({"neg": round(float(neg[row]), 3),
+                                "neu": round(float(neu[row]), 3),
+                                "pos": round(float(pos[row]), 3),
+                                "compound": round(float(compound[row]), 4)})
+        return results
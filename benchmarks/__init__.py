@@ -0,0 +1,4 @@
+"""
+Benchmarks for the NLP hot paths, run them from the repository root, e.g.
+`python -m benchmarks.bench_lexicon`
+"""
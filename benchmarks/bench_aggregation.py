@@ -0,0 +1,52 @@
+"""
+Benchmark the aggregation of the entities of one document
+
+Compares the keyed aggregation with the former loop which compared every entity with all
+entities collected so far, for documents with an increasing number of entities.
+"""
+
+import random
+import timeit
+
+from collections import namedtuple
+
+from helpers.aggregation import aggregate_entities
+
+REPEAT = 5
+
+Sentiment = namedtuple('Sentiment', ['score'])
+Entity = namedtuple('Entity', ['name', 'sentiment'])
+
+def legacy_aggregate(entities):
+    """
+    The formatting loop the controller used before, kept here as the benchmark reference
+    """
+    entities_formatted = []
+    for entity in entities:
+        entity = {"value": entity.name, "score": entity.sentiment.score, "count": 1}
+        new_entity = True
+
+        for entity_already_included in entities_formatted:
+            if entity_already_included["value"] == entity["value"]:
+                entity_already_included["count"] += entity["count"]
+                new_entity = False
+
+        if new_entity:
+            entities_formatted.append(entity)
+    return entities_formatted
+
+def run():
+    rng = random.Random(0)
+    print('{:<10} {:>14} {:>14}'.format('entities', 'legacy us', 'keyed us'))
+    for size in [10, 100, 1000, 5000]:
+        entities = [Entity('entity {}'.format(rng.randrange(size // 2 + 1)), Sentiment(rng.uniform(-1, 1))) for _ in range(size)]
+        number = max(3, 20000 // size)
+        timings = [
+            min(timeit.repeat(lambda: func(entities), number=number, repeat=REPEAT)) / number
+            for func in (legacy_aggregate, aggregate_entities)
+        ]
+        print('{:<10} {:>14.1f} {:>14.1f}'.format(size, timings[0] * 1e6, timings[1] * 1e6))
+    return 0
+
+if __name__ == '__main__':
+    exit(run())
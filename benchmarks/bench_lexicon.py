@@ -0,0 +1,56 @@
+"""
+Benchmark lexicon loading and analyzer construction of the german VADER analyzer
+
+Compares parsing the text lexicons with loading the compiled artifact and shows the
+construction time of analyzers once the lexicons were loaded by the process.
+"""
+
+import timeit
+
+from VaderGerman.vaderSentimentGerman import lexicon
+from VaderGerman.vaderSentimentGerman.vaderSentimentGER import SentimentIntensityAnalyzer
+
+REPEAT = 5
+NUMBER = 5
+
+def best_of(func, number=NUMBER):
+    """
+    Run `func` `number` times for `REPEAT` rounds and return the best time per call
+
+    :param func func: The function to benchmark
+    :param int number: Calls per round
+    :return: Seconds per call
+    :rtype: float
+    """
+    return min(timeit.repeat(func, number=number, repeat=REPEAT)) / number
+
+def cold_construction():
+    """
+    Construct an analyzer as the first one in a process would
+    """
+    lexicon._LOADED_LEXICONS.clear()
+    return SentimentIntensityAnalyzer()
+
+def run():
+    lexicon_path = lexicon.resolve_path(lexicon.DEFAULT_LEXICON_FILE)
+    emoji_path = lexicon.resolve_path(lexicon.DEFAULT_EMOJI_LEXICON_FILE)
+
+    if not lexicon.check_compiled(lexicon.DEFAULT_COMPILED_FILE, lexicon_path, emoji_path):
+        print('Compiled lexicon missing or stale, run `python -m VaderGerman.vaderSentimentGerman.lexicon` first')
+        return 1
+
+    results = {
+        'text parse': best_of(lambda: lexicon.load_text(lexicon_path, emoji_path)),
+        'compiled load': best_of(lambda: lexicon.load_compiled(lexicon.DEFAULT_COMPILED_FILE)),
+        'cold construction': best_of(cold_construction),
+        'warm construction': best_of(SentimentIntensityAnalyzer, number=1000),
+    }
+
+    for name, seconds in results.items():
+        print('{:<20} {:>10.3f} ms'.format(name, seconds * 1000))
+    print('{:<20} {:>10.1f}x'.format('load speedup', results['text parse'] / results['compiled load']))
+    print('{:<20} {:>10.1f}x'.format('warm speedup', results['text parse'] / results['warm construction']))
+    return 0
+
+if __name__ == '__main__':
+    exit(run())
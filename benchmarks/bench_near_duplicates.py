@@ -0,0 +1,61 @@
+"""
+Benchmark the near-duplicate index at millions of entries
+
+Reports the insert rate, the latency of lookups which find a near-duplicate and of lookups
+which miss, and the resident memory of the index. The number of entries can be passed as the
+first argument, e.g. `python -m benchmarks.bench_near_duplicates 2000000`.
+"""
+
+import random
+import resource
+import sys
+import time
+
+from helpers.near_duplicates import FINGERPRINT_BITS, NearDuplicateIndex, fingerprint_text
+
+LOOKUPS = 20000
+NAMESPACES = [('de', 'keyword {}'.format(i)) for i in range(50)]
+TEXT = "Die neue Folge war wirklich großartig, ich freue mich schon auf nächste Woche https://t.co/abc123"
+
+def max_rss_mib():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def flip_bits(fingerprint, count, rng):
+    for bit in rng.sample(range(FINGERPRINT_BITS), count):
+        fingerprint ^= 1 << bit
+    return fingerprint
+
+def run(entries=1000000, threshold=0.95):
+    rng = random.Random(0)
+    index = NearDuplicateIndex(threshold=threshold, max_entries=entries)
+    fingerprints = [(rng.choice(NAMESPACES), rng.getrandbits(FINGERPRINT_BITS)) for _ in range(entries)]
+    rss_before = max_rss_mib()
+
+    start = time.perf_counter()
+    for namespace, fingerprint in fingerprints:
+        index.add(namespace, fingerprint, fingerprint)
+    insert_seconds = time.perf_counter() - start
+
+    samples = rng.sample(fingerprints, LOOKUPS)
+    near = [(namespace, flip_bits(fingerprint, index.max_distance, rng)) for namespace, fingerprint in samples]
+    misses = [(rng.choice(NAMESPACES), rng.getrandbits(FINGERPRINT_BITS)) for _ in range(LOOKUPS)]
+
+    print('entries {}, threshold {}, max distance {} bits, {} bands'.format(entries, threshold, index.max_distance, len(index.bands)))
+    print('{:<12} {:>12}'.format('insert', '{:.1f} us'.format(insert_seconds / entries * 1e6)))
+    for name, queries in (('lookup hit', near), ('lookup miss', misses)):
+        start = time.perf_counter()
+        found = [index.lookup(namespace, fingerprint) for namespace, fingerprint in queries]
+        seconds = time.perf_counter() - start
+        print('{:<12} {:>12} {:>10}'.format(
+            name, '{:.1f} us'.format(seconds / len(queries) * 1e6),
+            '{:.0%} found'.format(sum(1 for value in found if value is not None) / len(queries))))
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        fingerprint_text(TEXT)
+    print('{:<12} {:>12}'.format('fingerprint', '{:.1f} us'.format((time.perf_counter() - start) / 1000 * 1e6)))
+    print('{:<12} {:>12}'.format('memory', '{:.0f} MiB'.format(max_rss_mib() - rss_before)))
+    return 0
+
+if __name__ == '__main__':
+    exit(run(*[int(sys.argv[1])] if len(sys.argv) > 1 else []))
@@ -0,0 +1,69 @@
+"""
+Benchmark SentiText tokenization per document
+
+Compares the single pass tokenizer with the former punctuation/word product lookup,
+reporting wall time and the peak of memory allocated while tokenizing one document.
+"""
+
+import re
+import string
+import timeit
+import tracemalloc
+
+from itertools import product
+
+from VaderGerman.vaderSentimentGerman.tokenizer import PUNC_LIST, tokenize, tokenize_with_offsets
+
+REPEAT = 5
+
+REGEX_REMOVE_PUNCTUATION = re.compile('[%s]' % re.escape(string.punctuation))
+
+DOCUMENTS = {
+    'short': "Das ist toll!! :-) Oder etwa nicht?",
+    'medium': "Die Sendung war gestern, ehrlich gesagt, ziemlich bloed... aber die Musik: super! " * 5,
+    'long': "Ich liebe euch, aber Deutsch ist eine wirklich schlechte Sprache für die Stimmungsanalyse! " * 60,
+}
+
+def legacy_tokenize(text):
+    """
+    The tokenizer SentiText used before, kept here as the benchmark reference
+
+    :param str text: The text to tokenize
+    :return: The tokens
+    :rtype: list
+    """
+    words_only = set(w for w in REGEX_REMOVE_PUNCTUATION.sub('', text).split() if len(w) > 1)
+    words_punc_dict = {''.join(p): p[1] for p in product(PUNC_LIST, words_only)}
+    words_punc_dict.update({''.join(p): p[0] for p in product(words_only, PUNC_LIST)})
+    wes = [we for we in text.split() if len(we) > 1]
+    return [words_punc_dict.get(we, we) for we in wes]
+
+def peak_allocation(func, text):
+    """
+    Measure the peak of memory allocated while calling `func(text)`
+
+    :param func func: The tokenizer
+    :param str text: The document
+    :return: Bytes
+    :rtype: int
+    """
+    tracemalloc.start()
+    try:
+        func(text)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def run():
+    print('{:<8} {:<8} {:>8} {:>12} {:>12}'.format('doc', 'impl', 'tokens', 'us/doc', 'peak KiB'))
+    for name, text in DOCUMENTS.items():
+        assert legacy_tokenize(text) == tokenize(text) == tokenize_with_offsets(text)[0]
+        for impl, func in (('legacy', legacy_tokenize), ('single', tokenize), ('offsets', tokenize_with_offsets)):
+            number = max(20, 200000 // len(text))
+            seconds = min(timeit.repeat(lambda: func(text), number=number, repeat=REPEAT)) / number
+            print('{:<8} {:<8} {:>8} {:>12.1f} {:>12.1f}'.format(
+                name, impl, len(tokenize(text)), seconds * 1e6, peak_allocation(func, text) / 1024))
+    return 0
+
+if __name__ == '__main__':
+    exit(run())
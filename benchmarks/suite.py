@@ -0,0 +1,290 @@
+"""
+Benchmark suite for the NLP hot paths with saved baselines and a regression check
+
+Every case runs on fixed inputs, so results of two runs on the same machine are comparable:
+
+    python -m benchmarks.suite --save          # measure and store the baseline
+    python -m benchmarks.suite                 # measure and compare with the baseline
+    python -m benchmarks.suite -k polarity     # only run cases containing `polarity`
+
+A case regresses if it got slower than its baseline by more than the threshold (20% by
+default), the suite then exits with 1. Baselines depend on the machine, so they are not
+checked in, save one before starting performance work. Cases whose dependencies are not
+installed are skipped.
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+REPEAT = 5
+BATCH_SIZE = 10000
+DEFAULT_THRESHOLD = 0.2
+DEFAULT_BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+
+TEXTS = {
+    'de': {
+        'short': "Das ist toll!! :-) Oder etwa nicht?",
+        'medium': "Die Sendung war gestern, ehrlich gesagt, ziemlich schlecht... aber die Musik: super! " * 5,
+        'long': "Ich liebe euch, aber Deutsch ist eine wirklich schlechte Sprache für die Stimmungsanalyse! " * 60,
+    },
+    'en': {
+        'short': "This is great!! :-) Or is it not?",
+        'medium': "The show yesterday was, honestly, pretty bad... but the music: awesome! " * 5,
+        'long': "I love you all, but English is not a very easy language for sentiment analysis! " * 60,
+    },
+}
+
+CASES = {}
+
+def case(name):
+    """
+    Register a benchmark case, the decorated function sets the case up and returns the callable to time
+
+    :param str name: The name of the case
+    """
+    def register(setup):
+        CASES[name] = setup
+        return setup
+    return register
+
+def measure(func):
+    """
+    Time a callable, the calls per round are scaled until a round takes at least 0.2 seconds
+    and the best round of REPEAT rounds is used
+
+    :param func func: The callable to time
+    :return: Seconds per call
+    :rtype: float
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=REPEAT, number=number)) / number
+
+@case('lexicon_load_de_cold')
+def lexicon_load_de_cold():
+    from VaderGerman.vaderSentimentGerman import lexicon
+    from VaderGerman.vaderSentimentGerman.vaderSentimentGER import SentimentIntensityAnalyzer
+
+    def construct():
+        lexicon._LOADED_LEXICONS.clear()
+        return SentimentIntensityAnalyzer()
+    return construct
+
+@case('lexicon_load_de_warm')
+def lexicon_load_de_warm():
+    from VaderGerman.vaderSentimentGerman.vaderSentimentGER import SentimentIntensityAnalyzer
+    return SentimentIntensityAnalyzer
+
+@case('lexicon_load_en')
+def lexicon_load_en():
+    from helpers.vader import SentimentIntensityAnalyzer
+    return SentimentIntensityAnalyzer
+
+def sentitext_case(size):
+    def setup():
+        from VaderGerman.vaderSentimentGerman.vaderSentimentGER import SentiText
+        text = TEXTS['de'][size]
+        return lambda: SentiText(text)
+    return setup
+
+def polarity_case(language, size):
+    def setup():
+        from helpers.vader import SentimentIntensityAnalyzer, SentimentIntensityAnalyzerGerman
+        analyzer = SentimentIntensityAnalyzerGerman() if language == 'de' else SentimentIntensityAnalyzer()
+        text = TEXTS[language][size]
+        return lambda: analyzer.polarity_scores(text)
+    return setup
+
+for _size in ['short', 'medium', 'long']:
+    case('sentitext_de_{}'.format(_size))(sentitext_case(_size))
+    for _language in ['de', 'en']:
+        case('polarity_scores_{}_{}'.format(_language, _size))(polarity_case(_language, _size))
+
+def batch_case(vectorized):
+    def setup():
+        from VaderGerman.vaderSentimentGerman.vaderSentimentGER import SentimentIntensityAnalyzer
+        analyzer = SentimentIntensityAnalyzer()
+        texts = [text for _ in range(BATCH_SIZE // 3) for text in TEXTS['de'].values()][:BATCH_SIZE]
+        if vectorized:
+            analyzer.polarity_scores_vectorized(texts[:1]) # fails with ImportError without numpy
+            return lambda: analyzer.polarity_scores_vectorized(texts)
+        return lambda: analyzer.polarity_scores_batch(texts)
+    return setup
+
+case('polarity_scores_batch_de_10k')(batch_case(False))
+case('polarity_scores_vectorized_de_10k')(batch_case(True))
+
+class ResponseMock():
+    """
+    A response of the mocked Google Cloud Language client with every field the processor reads
+    """
+    def __init__(self):
+        sentiment = type('Sentiment', (), {'score': 0.4})()
+        self.document_sentiment = sentiment
+        self.entities = [type('Entity', (), {'name': 'entity {}'.format(i % 7), 'sentiment': sentiment})() for i in range(20)]
+        self.categories = [type('Category', (), {'name': '/News', 'confidence': 0.8})()]
+
+class LanguageClientMock():
+    """
+    A Google Cloud Language client answering every request instantly
+    """
+    def __init__(self, *args, **kwargs):
+        self.response = ResponseMock()
+
+    def analyze_sentiment(self, document=None):
+        return self.response
+
+    def analyze_entity_sentiment(self, document=None):
+        return self.response
+
+    def classify_text(self, document=None):
+        return self.response
+
+    def annotate_text(self, document=None, features=None):
+        return self.response
+
+def create_processor():
+    """
+    Create a processor with a mocked client and without quota, caches or pre-filter
+    """
+    from unittest.mock import patch
+
+    from processor import GoogleCloudLanguageProcessor
+    from helpers.eligibility import EligibilityFilter
+    from helpers.rate_limiter import InMemoryBackend, RateLimiter
+
+    with patch('processor.language.LanguageServiceClient', LanguageClientMock), \
+            patch('processor.create_result_cache', return_value=None), \
+            patch('processor.create_near_duplicate_index', return_value=None):
+        return GoogleCloudLanguageProcessor(
+            rate_limiter=RateLimiter(InMemoryBackend(), 10 ** 12, burst=10 ** 12),
+            eligibility_filter=EligibilityFilter({}),
+        )
+
+@case('processor_process_google')
+def processor_process_google():
+    processor = create_processor()
+    text = TEXTS['en']['medium']
+    return lambda: processor.process(text, 'keyword', 'zh')
+
+@case('processor_process_vader')
+def processor_process_vader():
+    processor = create_processor()
+    text = TEXTS['de']['medium']
+    return lambda: processor.process(text, 'keyword', 'de')
+
+class CollectionMock():
+    """
+    A mongo collection which accepts every write
+    """
+    def update_one(self, query, update, upsert=False):
+        return type('UpdateResult', (), {'modified_count': 1})()
+
+    def find(self, query, projection=None):
+        return []
+
+    def find_one(self, query, projection=None):
+        return {'_id': query['_id'], 'language': 'de'}
+
+class CrawlMock():
+    """
+    A crawl result as the common library casts it
+    """
+    def __init__(self):
+        self._id = 'crawl'
+        self.keyword_ref = 'keyword'
+        self.keyword_string = 'keyword'
+        self.text = TEXTS['de']['medium']
+
+@case('controller_process_crawl')
+def controller_process_crawl():
+    from unittest.mock import MagicMock, patch
+
+    import controller
+
+    mongo_controller = MagicMock()
+    mongo_controller.get_keyword_by_id.return_value = type('Keyword', (), {'language': 'de'})()
+
+    environment = {'MONGO_CONNECTION_STRING': 'mongodb://localhost:27017', 'MONGO_DB_NAME': 'benchmark'}
+
+    with patch.dict(os.environ, environment), \
+            patch('controller.MongoController', return_value=mongo_controller), \
+            patch('controller.get_database', return_value={controller.CRAWLS_COLLECTION: CollectionMock(), controller.KEYWORDS_COLLECTION: CollectionMock()}), \
+            patch('controller.GoogleCloudLanguageProcessor', create_processor):
+        instance = controller.Controller()
+
+    crawl = CrawlMock()
+    return lambda: instance._Controller__process_crawl(crawl)
+
+def run_cases(names):
+    """
+    Run benchmark cases
+
+    :param list names: The cases to run
+    :return: Seconds per call by case, skipped cases are missing
+    :rtype: dict
+    """
+    results = {}
+    for name in names:
+        try:
+            func = CASES[name]()
+        except ImportError as ex:
+            print('{:<34} skipped ({})'.format(name, ex))
+            continue
+        results[name] = measure(func)
+    return results
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare results with a baseline
+
+    :param dict results: Seconds per call by case
+    :param dict baseline: Seconds per call by case of the baseline
+    :param float threshold: The relative slowdown a case may have
+    :return: Tuples of case, seconds, baseline seconds (None if missing) and if it regressed
+    :rtype: list
+    """
+    rows = []
+    for name, seconds in results.items():
+        reference = baseline.get(name)
+        regressed = reference is not None and seconds > reference * (1 + threshold)
+        rows.append((name, seconds, reference, regressed))
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the NLP hot paths')
+    parser.add_argument('-k', dest='pattern', default='', help='Only run cases whose name contains this')
+    parser.add_argument('--save', action='store_true', help='Store the results as the new baseline')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE_FILE, help='The baseline file')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='Allowed relative slowdown')
+    args = parser.parse_args(argv)
+
+    results = run_cases([name for name in CASES if args.pattern in name])
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    rows = compare(results, baseline, args.threshold)
+    print('{:<34} {:>12} {:>12} {:>8}'.format('case', 'us/call', 'baseline', 'change'))
+    for name, seconds, reference, regressed in rows:
+        change = '' if reference is None else '{:+.0%}'.format(seconds / reference - 1)
+        print('{:<34} {:>12.1f} {:>12} {:>8}{}'.format(
+            name, seconds * 1e6, '' if reference is None else '{:.1f}'.format(reference * 1e6), change,
+            '  REGRESSION' if regressed else ''))
+
+    if args.save:
+        baseline.update(results)
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(baseline, baseline_file, indent=2, sort_keys=True)
+        print('Saved baseline to {}'.format(args.baseline))
+        return 0
+
+    return 1 if any(regressed for _, _, _, regressed in rows) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -8,14 +8,32 @@ and 600 non-prediction requests per minute per project. These quotas apply colle
 """
 
 import os
-import time
+import asyncio
 
-from threading import Thread
+from concurrent.futures import ThreadPoolExecutor
 
 from common.mongo.controller import MongoController
+from common.mongo.data_types.crawling.crawl_result import CrawlResult
+from common.mongo.data_types.crawling.keyword import Keyword
 from common.utils.logging import DEFAULT_LOGGER, LogTypes
 
 from processor import GoogleCloudLanguageProcessor
+from helpers.aggregation import aggregate_categories, aggregate_entities
+from helpers.async_runner import AsyncCrawlRunner
+from helpers.crawl_writer import CRAWLS_COLLECTION, PROCESSED_QUERY, CrawlResultWriter
+from helpers.metrics import METRICS
+from helpers.keyword_cache import KEYWORDS_COLLECTION, KeywordCache, KeywordLoader
+from helpers.mongo import get_database
+from helpers.pipeline import CrawlPipeline
+from helpers.stream import STREAM_TOKENS_COLLECTION, CrawlStreamRunner, ResumeTokenStore
+
+GOOGLE_REQUESTS_PER_MIN = 600
+ANALYSIS_WORKERS = int(os.environ.get('ANALYSIS_WORKERS', 16)) # Threads analyzing crawls in `run_full`
+ASYNC_CONCURRENCY = int(os.environ.get('ASYNC_CONCURRENCY', 32)) # Crawls processed at once by `run_full_async`
+STREAM_BATCH_SIZE = int(os.environ.get('STREAM_BATCH_SIZE', 50)) # Maximum number of crawls `run_stream` processes at once
+BATCH_ANALYSIS_WORKERS = int(os.environ.get('BATCH_ANALYSIS_WORKERS', 8)) # Threads analyzing the crawls of `run_crawl_batch`
+ENTITY_SCORE_REDUCTION = os.environ.get('ENTITY_SCORE_REDUCTION', 'mean') # mean / max of the scores of an entity found multiple times
+CATEGORY_CONFIDENCE_REDUCTION = os.environ.get('CATEGORY_CONFIDENCE_REDUCTION', 'max') # mean / max of the confidences of a category
 
 class Controller():
     """
@@ -25,58 +43,111 @@ class Controller():
         """
         Initialise the Processor
         """
-        self.MAX_REQUESTS_PER_MIN = 600 / 3 # 600 requests per minute, each process sends 3 requests
-
         # Mongo
         mongo_connection_string = os.environ['MONGO_CONNECTION_STRING']
         mongo_db_name = os.environ['MONGO_DB_NAME']
 
         self.processor = GoogleCloudLanguageProcessor()
+        self.MAX_REQUESTS_PER_MIN = GOOGLE_REQUESTS_PER_MIN / self.processor.requests_per_process
         self.mongo_controller = MongoController(mongo_connection_string, mongo_db_name)
+        self.result_writer = CrawlResultWriter(get_database()[CRAWLS_COLLECTION])
+        keyword_loader = KeywordLoader(self.mongo_controller, get_database()[KEYWORDS_COLLECTION], Keyword.from_dict)
+        self.keyword_cache = KeywordCache(keyword_loader.load_one, keyword_loader.load_many)
 
-    def __process_crawl(self, crawl):
+    def is_healthy(self):
         """
-        Process a crawl result
+        Check if the connections held by the controller are still usable
 
-        :param CrawlResult crawl: The to be processed crawl result
+        :return: If the mongo server answered a ping
+        :rtype: boolean
+        """
+        try:
+            self.mongo_controller.client.admin.command('ping')
+        except Exception as ex:
+            DEFAULT_LOGGER.log('Controller health check failed', LogTypes.ERROR.value, ex)
+            return False
+        return True
+
+    def close(self):
+        """
+        Close all connections held by the controller
         """
-        keyword = self.mongo_controller.get_keyword_by_id(crawl.keyword_ref, cast=True)
+        try:
+            self.mongo_controller.client.close()
+        except Exception as ex:
+            DEFAULT_LOGGER.log('Failed to close the mongo connection', LogTypes.ERROR.value, ex)
+
+        try:
+            self.processor.close()
+        except Exception as ex:
+            DEFAULT_LOGGER.log('Failed to close the Google Cloud Language client', LogTypes.ERROR.value, ex)
 
-        score, entities, categories = self.processor.process(crawl.text, crawl.keyword_string, keyword.language)
+    def __analyze_crawl(self, crawl):
+        """
+        Run the NLP analysis of a crawl result
 
-        entities_formatted = []
-        for entity in entities:
-            entity = {"value": entity.name, "score": entity.sentiment.score, "count": 1}
-            new_entity = True
+        :param CrawlResult crawl: The to be processed crawl result
+        :return: Score, formatted entities and formatted categories
+        :rtype: Tuple with 3 slots
+        """
+        with METRICS.trace(crawl._id):
+            with METRICS.timed('keyword_lookup'):
+                keyword = self.keyword_cache.get(crawl.keyword_ref)
 
-            for entity_already_included in entities_formatted:
-                if entity_already_included["value"] == entity["value"]:
-                    entity_already_included["count"] += entity["count"]
-                    new_entity = False
+            score, entities, categories = self.processor.process(crawl.text, crawl.keyword_string, keyword.language)
 
-            if new_entity:
-                entities_formatted.append(entity)
+            with METRICS.timed('aggregate'):
+                entities_formatted = aggregate_entities(entities, ENTITY_SCORE_REDUCTION)
+                categories_formatted = aggregate_categories(categories, CATEGORY_CONFIDENCE_REDUCTION)
 
-        categories_formatted = []
-        for category in categories:
-            category = {"value": category.name, "confidence": category.confidence, "count": 1}
-            new_category = True
+        return (score, entities_formatted, categories_formatted)
 
-            for category_already_included in categories_formatted:
-                if category_already_included["value"] == category["value"]:
-                    category_already_included["count"] += category["count"]
-                    new_category = False
+    def __store_result(self, crawl, result):
+        """
+        Write the analysis result of a crawl result to mongo with a single update
 
-            if new_category:
-                categories_formatted.append(category)
+        :param CrawlResult crawl: The processed crawl result
+        :param tuple result: The result of `__analyze_crawl`
+        :return: The result of the update or None if there was no score
+        """
+        score, entities_formatted, categories_formatted = result
 
-        self.mongo_controller.set_entities_crawl(crawl._id, entities_formatted)
-        self.mongo_controller.set_categories_crawl(crawl._id, categories_formatted)
+        with METRICS.timed('write'):
+            update_result = self.result_writer.write(crawl._id, score, entities_formatted, categories_formatted)
+        METRICS.increment('nlp_crawls_written_total', help_text='Crawl results written to mongo', outcome='success')
 
         if score is not None:
-            return self.mongo_controller.set_score_crawl(crawl._id, score)
+            return update_result
         return None
 
+    def __store_results(self, items):
+        """
+        Write the analysis results of multiple crawl results to mongo with a single bulk write
+
+        :param list items: Tuples of the processed crawl result and the result of `__analyze_crawl`
+        :return: The reports of all crawls which failed to be written
+        :rtype: list
+        """
+        with METRICS.timed('write_batch'):
+            reports = self.result_writer.write_many([(crawl._id,) + tuple(result) for crawl, result in items])
+
+        failed = [report for report in reports if report.error is not None]
+        METRICS.increment('nlp_crawls_written_total', len(reports) - len(failed), help_text='Crawl results written to mongo', outcome='success')
+        METRICS.increment('nlp_crawls_written_total', len(failed), help_text='Crawl results written to mongo', outcome='error')
+        for report in failed:
+            DEFAULT_LOGGER.log('Failed to write results of crawl {}: {}'.format(report.crawl_id, report.error), log_type=LogTypes.ERROR.value)
+
+        return failed
+
+    def __process_crawl(self, crawl):
+        """
+        Process a crawl result
+
+        :param CrawlResult crawl: The to be processed crawl result
+        """
+        with METRICS.trace(crawl._id):
+            return self.__store_result(crawl, self.__analyze_crawl(crawl))
+
     def run_single_crawl(self, crawl):
         """
         Process a single input crawl
@@ -84,25 +155,108 @@ class Controller():
         :param CrawlResult crawl: The to be processed crawl result
         """
         return self.__process_crawl(crawl)
-    
-    def run_full(self):
+
+    def run_crawl_batch(self, crawls, analysis_workers=BATCH_ANALYSIS_WORKERS):
+        """
+        Process a batch of crawls: their keywords are loaded with a single query, the crawls
+        are analyzed concurrently and all results are written with a single bulk write
+
+        :param list crawls: The to be processed crawl results
+        :param int analysis_workers: The number of threads analyzing crawls
+        :return: If each crawl was processed, in input order
+        :rtype: list
+        """
+        if not crawls:
+            return []
+
+        self.keyword_cache.prefetch({crawl.keyword_ref for crawl in crawls})
+
+        def analyze(crawl):
+            try:
+                return self.__analyze_crawl(crawl)
+            except Exception as ex: # A failing crawl should not fail the whole batch
+                DEFAULT_LOGGER.log('Failed to analyze crawl {}'.format(crawl._id), LogTypes.ERROR.value, ex)
+                return None
+
+        with ThreadPoolExecutor(max_workers=min(analysis_workers, len(crawls))) as executor:
+            results = list(executor.map(analyze, crawls))
+
+        items = [(crawl, result) for crawl, result in zip(crawls, results) if result is not None]
+        failed = {report.crawl_id for report in self.__store_results(items)} if items else set()
+
+        return [
+            result is not None and result[0] is not None and crawl._id not in failed
+            for crawl, result in zip(crawls, results)
+        ]
+
+    def run_full(self, analysis_workers=ANALYSIS_WORKERS):
+        """
+        Process all unprocessed crawls with a staged pipeline: the next page of crawls is fetched
+        while the current one is analyzed and results are written while new ones are analyzed.
+        The quota is enforced by the rate limiter of the processor
+
+        :param int analysis_workers: The number of threads analyzing crawls
+        :return: The number of processed crawls
+        :rtype: int
+        """
+        pipeline = CrawlPipeline(
+            self.__get_unprocessed_crawls,
+            self.__analyze_crawl,
+            self.__store_results,
+            analysis_workers=analysis_workers,
+            page_size=int(self.MAX_REQUESTS_PER_MIN),
+        )
+        return pipeline.run()
+
+    def __get_unprocessed_crawls(self, limit):
+        """
+        Fetch crawl results which still have to be processed and load all of their keywords
+        which are not cached yet with a single query
+
+        :param int limit: The maximum number of crawl results
+        :return: The crawl results
+        :rtype: list
+        """
+        with METRICS.timed('mongo_read'):
+            crawls = self.mongo_controller.get_unprocessed_crawls(limit, cast=True)
+        with METRICS.timed('keyword_prefetch'):
+            self.keyword_cache.prefetch({crawl.keyword_ref for crawl in crawls})
+        return crawls
+
+    def run_full_async(self, concurrency=ASYNC_CONCURRENCY):
         """
-        Fetch all crawls which have to be processed and process them in batches of MAX_REQUESTS_AT_ONCE
+        Process all unprocessed crawls with the asyncio engine, a new crawl is started as soon
+        as one of the `concurrency` running crawls is done
+
+        :param int concurrency: The maximum number of crawls processed at once
+        :return: The number of processed crawls
+        :rtype: int
         """
-        crawls = ['Placeholder']
+        runner = AsyncCrawlRunner(
+            self.__get_unprocessed_crawls,
+            self.__process_crawl,
+            concurrency=concurrency,
+            page_size=int(self.MAX_REQUESTS_PER_MIN),
+        )
+        return asyncio.run(runner.run())
 
-        while crawls:
-            threads = []
-            crawls = self.mongo_controller.get_unprocessed_crawls(self.MAX_REQUESTS_PER_MIN, cast=True)
+    def run_stream(self, batch_size=STREAM_BATCH_SIZE):
+        """
+        Process crawls as soon as they are inserted by following a change stream of the crawl
+        collection, falls back to adaptive polling if change streams are not available
 
-            for crawl in crawls:
-                thread = Thread(target=self.__process_crawl, args=(crawl,))
-                thread.start()
-                threads.append(thread)
-                
-            for thread in threads:
-                thread.join()
+        :param int batch_size: The maximum number of crawls processed at once
+        :return: The number of processed crawls
+        :rtype: int
+        """
+        runner = CrawlStreamRunner(
+            self.result_writer.collection,
+            ResumeTokenStore(get_database()[STREAM_TOKENS_COLLECTION], 'processor'),
+            self.__get_unprocessed_crawls,
+            self.run_crawl_batch,
+            CrawlResult.from_dict,
+            processed_query=PROCESSED_QUERY,
+            batch_size=batch_size,
+        )
+        return runner.run()
 
-            DEFAULT_LOGGER.log('Sleeping for one minute...', log_type=LogTypes.INFO.value)
-            time.sleep(60) # Ensure that the quota limit is not being exceeded
-            
@@ -0,0 +1,106 @@
+"""
+This module aggregates entities and categories which occur multiple times
+
+Items are keyed by their normalized name, so every item is looked up once instead of being
+compared with every item collected so far. The formatted output is the one stored in mongo,
+`{"value": name, <field>: number, "count": occurrences}`, and formatted items can be fed back
+in to aggregate the results of a whole batch.
+"""
+
+MEAN = 'mean'
+MAX = 'max'
+REDUCTIONS = [MEAN, MAX]
+
+def normalize_name(name):
+    """
+    Normalize a name so case and whitespace variants are aggregated together
+
+    :param str name: The name of an entity or category
+    :rtype: str
+    """
+    return ' '.join(name.split()).lower()
+
+class Aggregator():
+    """
+    Counts items by name and reduces their numbers to the mean or the maximum
+    """
+    def __init__(self, field, reduction=MEAN):
+        """
+        :param str field: The name of the number in the formatted output, e.g. `score`
+        :param str reduction: One of REDUCTIONS
+        """
+        if reduction not in REDUCTIONS:
+            raise ValueError('Unknown reduction {}, use one of {}'.format(reduction, REDUCTIONS))
+
+        self.field = field
+        self.reduction = reduction
+        self.items = {} # normalized name -> [first name, sum or max of the numbers, count]
+
+    def add(self, name, number, count=1):
+        """
+        Add occurrences of an item
+
+        :param str name: The name of the item, the first spelling is kept
+        :param float number: The score or confidence of the occurrences, for a mean over `count` occurrences
+        :param int count: The number of occurrences
+        """
+        key = normalize_name(name)
+        item = self.items.get(key)
+
+        if item is None:
+            self.items[key] = [name, number * count if self.reduction == MEAN else number, count]
+            return
+
+        if self.reduction == MEAN:
+            item[1] += number * count
+        elif number > item[1]:
+            item[1] = number
+        item[2] += count
+
+    def add_formatted(self, items):
+        """
+        Add formatted items, e.g. the results of other crawls of a batch
+
+        :param list items: Dicts with value, number and count as returned by `formatted`
+        """
+        for item in items:
+            self.add(item['value'], item[self.field], item['count'])
+
+    def formatted(self):
+        """
+        Get the aggregated items in the order they were first added
+
+        :rtype: list
+        """
+        return [
+            {'value': name, self.field: number / count if self.reduction == MEAN else number, 'count': count}
+            for name, number, count in self.items.values()
+        ]
+
+def aggregate_entities(entities, reduction=MEAN):
+    """
+    Aggregate the entities of Google's response
+
+    :param list entities: Entities with name and sentiment score
+    :param str reduction: How the sentiment scores of an entity are reduced
+    :return: The formatted entities
+    :rtype: list
+    """
+    aggregator = Aggregator('score', reduction)
+    for entity in entities:
+        aggregator.add(entity.name, entity.sentiment.score)
+    return aggregator.formatted()
+
+def aggregate_categories(categories, reduction=MAX):
+    """
+    Aggregate the categories of Google's response
+
+    :param list categories: Categories with name and confidence
+    :param str reduction: How the confidences of a category are reduced
+    :return: The formatted categories
+    :rtype: list
+    """
+    aggregator = Aggregator('confidence', reduction)
+    for category in categories:
+        aggregator.add(category.name, category.confidence)
+    return aggregator.formatted()
@@ -0,0 +1,84 @@
+"""
+This module provides an asyncio engine which processes all unprocessed crawls continuously
+
+Instead of processing lock-step batches where the slowest request holds up the whole batch,
+a new crawl is started as soon as any running one finishes. At most `concurrency` crawls are
+processed at once and the rate limiter of the processor paces the Google requests, so the
+throughput is bound by the quota and not by the slowest request.
+
+The pinned google-cloud-language client has no asyncio interface, so the blocking calls
+run on a thread pool owned by the runner and are awaited from the event loop.
+"""
+
+import asyncio
+
+from concurrent.futures import ThreadPoolExecutor
+
+from common.utils.logging import DEFAULT_LOGGER, LogTypes
+
+from helpers.crawl_feed import CrawlFeed
+
+class AsyncCrawlRunner():
+    """
+    Feeds unprocessed crawls to a bounded number of concurrent processing tasks
+    """
+    def __init__(self, fetch, process, concurrency=32, page_size=200):
+        """
+        :param func fetch: Returns up to `page_size` unprocessed crawl results, `fetch(page_size)`
+        :param func process: Processes a single crawl result, `process(crawl)`
+        :param int concurrency: The maximum number of crawls processed at once
+        :param int page_size: The number of crawls fetched at once
+        """
+        self.feed = CrawlFeed(fetch, page_size)
+        self.process = process
+        self.concurrency = concurrency
+
+        self.processed = 0
+        self.failed = 0
+
+    async def __process(self, executor, semaphore, crawl):
+        try:
+            await asyncio.get_running_loop().run_in_executor(executor, self.process, crawl)
+            self.feed.finish(crawl._id)
+            self.processed += 1
+        except Exception as ex:
+            self.feed.finish(crawl._id, failed=True)
+            self.failed += 1
+            DEFAULT_LOGGER.log('Failed to process crawl {}'.format(crawl._id), LogTypes.ERROR.value, ex)
+        finally:
+            semaphore.release()
+
+    async def run(self):
+        """
+        Process crawls until a fetch returns no crawl which was not already started in this run,
+        see `CrawlFeed`. If a fetch only returns running crawls the runner waits for one of them
+        to finish before fetching again
+
+        :return: The number of processed crawls
+        :rtype: int
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        running = set()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency + 1) as executor:
+            while True:
+                crawls = await loop.run_in_executor(executor, self.feed.next_page)
+
+                if not crawls:
+                    if not running:
+                        break
+                    await asyncio.wait(set(running), return_when=asyncio.FIRST_COMPLETED)
+                    continue
+
+                for crawl in crawls:
+                    await semaphore.acquire()
+                    task = loop.create_task(self.__process(executor, semaphore, crawl))
+                    running.add(task)
+                    task.add_done_callback(running.discard)
+
+            if running:
+                await asyncio.wait(set(running))
+
+        DEFAULT_LOGGER.log('Processed {} crawls, {} failed'.format(self.processed, self.failed), log_type=LogTypes.INFO.value)
+        return self.processed
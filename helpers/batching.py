@@ -0,0 +1,60 @@
+"""
+This module dispatches crawls to the processor in batches
+
+Every `process-crawl` message costs a broker round trip, a deserialization and a task
+bookkeeping cycle. Producers can chunk their crawls and send `process-crawl-batch` tasks
+instead. With a batch size of 1 the single crawl task is sent, so producers can switch over
+gradually by raising PROCESS_CRAWL_BATCH_SIZE.
+"""
+
+import os
+
+from itertools import islice
+
+from common.celery import queues
+
+PROCESS_CRAWL_BATCH_SIZE = int(os.environ.get('PROCESS_CRAWL_BATCH_SIZE', 50))
+
+TASK_PROCESS_CRAWL = 'process-crawl'
+TASK_PROCESS_CRAWL_BATCH = 'process-crawl-batch'
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+def chunk_crawls(crawl_dicts, size=PROCESS_CRAWL_BATCH_SIZE):
+    """
+    Chunk a stream of crawl dicts into lists, the stream is consumed lazily
+
+    :param iterable crawl_dicts: The crawl dicts
+    :param int size: The maximum number of crawls per chunk
+    :return: Lists of up to `size` crawl dicts
+    :rtype: generator
+    """
+    if size < 1:
+        raise ValueError('The batch size has to be at least 1, got {}'.format(size))
+    return _chunks(crawl_dicts, size)
+
+def dispatch_crawls(app, crawl_dicts, batch_size=PROCESS_CRAWL_BATCH_SIZE):
+    """
+    Send crawls to the processor, in batches if `batch_size` is larger than 1
+
+    :param Celery app: The Celery app of the producer
+    :param iterable crawl_dicts: The crawl dicts, e.g. `CrawlResult.to_json()`
+    :param int batch_size: The maximum number of crawls per task
+    :return: The async results of the sent tasks
+    :rtype: list
+    """
+    if batch_size == 1:
+        return [
+            app.send_task(TASK_PROCESS_CRAWL, args=[crawl_dict], queue=queues['processor'])
+            for crawl_dict in crawl_dicts
+        ]
+
+    return [
+        app.send_task(TASK_PROCESS_CRAWL_BATCH, args=[chunk], queue=queues['processor'])
+        for chunk in chunk_crawls(crawl_dicts, batch_size)
+    ]
@@ -0,0 +1,96 @@
+"""
+This module keeps one controller alive for the lifetime of a worker process
+
+Building a controller opens a mongo connection, a gRPC channel to the Google Cloud
+Language API and loads both VADER lexicons. Doing that for every task costs more than
+the actual processing, so the controller is created once per worker process and reused.
+"""
+
+import os
+import time
+
+from threading import RLock
+
+from common.utils.logging import DEFAULT_LOGGER, LogTypes
+
+from controller import Controller
+
+HEALTH_CHECK_INTERVAL = int(os.environ.get('CONTROLLER_HEALTH_CHECK_INTERVAL', 60)) # Seconds
+
+class ControllerPool():
+    """
+    Holds a single controller per process and takes care of its lifecycle
+    """
+    def __init__(self, factory=Controller, health_check_interval=HEALTH_CHECK_INTERVAL):
+        """
+        :param func factory: Creates a new controller
+        :param int health_check_interval: Seconds between two health checks of the controller
+        """
+        self.factory = factory
+        self.health_check_interval = health_check_interval
+
+        self.controller = None
+        self.last_health_check = 0
+        self.lock = RLock()
+
+    def open(self):
+        """
+        Create the controller if there is none yet
+
+        :return: The controller of this process
+        :rtype: Controller
+        """
+        with self.lock:
+            if self.controller is None:
+                DEFAULT_LOGGER.log('Creating worker controller (pid {})'.format(os.getpid()), log_type=LogTypes.INFO.value)
+                self.controller = self.factory()
+                self.last_health_check = time.monotonic()
+            return self.controller
+
+    def acquire(self):
+        """
+        Get the controller of this process, it is health checked every `health_check_interval`
+        seconds and rebuilt if the check fails
+
+        :return: A usable controller
+        :rtype: Controller
+        """
+        with self.lock:
+            if self.controller is not None and time.monotonic() - self.last_health_check >= self.health_check_interval:
+                self.last_health_check = time.monotonic()
+                if not self.controller.is_healthy():
+                    self.invalidate()
+            return self.open()
+
+    def release_failed(self):
+        """
+        Health check the controller after a task failed and drop it if it is broken
+        """
+        with self.lock:
+            if self.controller is None:
+                return
+
+            self.last_health_check = time.monotonic()
+            if not self.controller.is_healthy():
+                self.invalidate()
+
+    def invalidate(self):
+        """
+        Close and drop the current controller, the next `acquire` creates a new one
+        """
+        with self.lock:
+            if self.controller is not None:
+                DEFAULT_LOGGER.log('Dropping worker controller (pid {})'.format(os.getpid()), log_type=LogTypes.INFO.value)
+                self.controller.close()
+                self.controller = None
+
+    def close(self):
+        """
+        Close the controller on worker shutdown
+        """
+        with self.lock:
+            if self.controller is not None:
+                self.controller.close()
+                self.controller = None
+
+CONTROLLER_POOL = ControllerPool()
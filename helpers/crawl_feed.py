@@ -0,0 +1,107 @@
+"""
+This module hands out unprocessed crawls page by page to the engines processing them
+
+Crawls stay unprocessed in mongo until their results are written, so every fetch also returns
+the crawls which were already handed out in this pass: the running ones, the failed ones and
+finished ones which still match, e.g. written without a score or whose write did not land yet.
+Those are excluded by fetching as many more crawls as are excluded and dropping them from the
+page, so crawls which stay unprocessed at the head of the backlog do not hide the ones behind
+them. A fetch which returns no crawl that was not seen yet is the end of the backlog, unless
+crawls are still running.
+"""
+
+import time
+
+from threading import Lock
+
+class CrawlFeed():
+    """
+    Pages of unprocessed crawls without the ones which are running or failed
+    """
+    def __init__(self, fetch, page_size, retry_failed_after=None):
+        """
+        :param func fetch: Returns up to `limit` unprocessed crawl results in a stable order, `fetch(limit)`
+        :param int page_size: The maximum number of crawls handed out at once
+        :param float retry_failed_after: Seconds before a failed crawl is handed out again by `restart`, None never retries
+        """
+        self.fetch = fetch
+        self.page_size = page_size
+        self.retry_failed_after = retry_failed_after
+
+        self.started = set()
+        self.running = set()
+        self.failed = {} # crawl id -> monotonic time of the failure
+        self.lock = Lock()
+
+    @property
+    def in_flight(self):
+        """
+        The number of crawls handed out which did not finish yet
+
+        :rtype: int
+        """
+        with self.lock:
+            return len(self.running)
+
+    @property
+    def failures(self):
+        """
+        The number of crawls which failed and were not handed out again yet
+
+        :rtype: int
+        """
+        with self.lock:
+            return len(self.failed)
+
+    def __excluded(self):
+        """
+        The ids of the crawls a page must not contain, all crawls handed out in this pass and
+        the failed ones, the caller holds the lock
+        """
+        if self.retry_failed_after is not None:
+            now = time.monotonic()
+            for crawl_id in [crawl_id for crawl_id, failed_at in self.failed.items() if now - failed_at >= self.retry_failed_after]:
+                del self.failed[crawl_id]
+        return self.started | set(self.failed)
+
+    def next_page(self):
+        """
+        Fetch the next crawls which were not handed out yet, they count as running until they finish
+
+        :return: Up to `page_size` crawl results, an empty list if there are no new ones
+        :rtype: list
+        """
+        with self.lock:
+            excluded = self.__excluded()
+            limit = self.page_size + len(excluded)
+
+        crawls = self.fetch(limit)
+
+        with self.lock:
+            new_crawls = [crawl for crawl in crawls if crawl._id not in excluded][:self.page_size]
+            for crawl in new_crawls:
+                self.started.add(crawl._id)
+                self.running.add(crawl._id)
+        return new_crawls
+
+    def finish(self, crawl_id, failed=False):
+        """
+        Mark a crawl as finished, a failed crawl is excluded from the following pages
+
+        :param ObjectId crawl_id: The id of the crawl
+        :param boolean failed: If the crawl failed and is still unprocessed
+        """
+        with self.lock:
+            self.running.discard(crawl_id)
+            if failed:
+                self.failed[crawl_id] = time.monotonic()
+            else:
+                self.failed.pop(crawl_id, None)
+
+    def restart(self):
+        """
+        Start a new pass over the unprocessed crawls, crawls which were handed out are handed
+        out again if they are still unprocessed, except the failed ones until `retry_failed_after` passed
+        """
+        with self.lock:
+            self.started = set(self.running)
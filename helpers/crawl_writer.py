@@ -0,0 +1,93 @@
+"""
+This module writes processing results to the crawl collection
+
+The MongoController of the common library sets entities, categories and score with one
+update each. Here all fields of a crawl are set with a single update, and the results
+of a batch are flushed with a single unordered bulk write. The collection and the fields
+are the ones `set_entities_crawl`, `set_categories_crawl` and `set_score_crawl` write,
+test/test_crawl_writer.py checks them against the MongoController of the common library.
+"""
+
+import os
+
+from collections import namedtuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+CRAWLS_COLLECTION = os.environ.get('MONGO_CRAWLS_COLLECTION', 'crawls')
+
+FIELD_ENTITIES = 'entities'
+FIELD_CATEGORIES = 'categories'
+FIELD_SCORE = 'score'
+
+# Matches crawls which already have results
+PROCESSED_QUERY = {FIELD_ENTITIES: {'$exists': True}}
+
+# The outcome of writing one crawl result, `error` is None if it was written
+WriteReport = namedtuple('WriteReport', ['crawl_id', 'error'])
+
+def build_update(score, entities, categories):
+    """
+    Build the update setting all processing results of a crawl
+
+    :param float score: The sentiment score, it is not set if it is None
+    :param list entities: The formatted entities
+    :param list categories: The formatted categories
+    :return: The update document
+    :rtype: dict
+    """
+    fields = {FIELD_ENTITIES: entities, FIELD_CATEGORIES: categories}
+    if score is not None:
+        fields[FIELD_SCORE] = score
+    return {'$set': fields}
+
+class CrawlResultWriter():
+    """
+    Writes processing results with one round trip per crawl or per batch
+    """
+    def __init__(self, collection):
+        """
+        :param Collection collection: The crawl collection
+        """
+        self.collection = collection
+
+    def write(self, crawl_id, score, entities, categories):
+        """
+        Set all processing results of a single crawl with one update
+
+        :param ObjectId crawl_id: The id of the crawl
+        :return: The result of the update
+        :rtype: UpdateResult
+        """
+        return self.collection.update_one({'_id': crawl_id}, build_update(score, entities, categories))
+
+    def write_many(self, results):
+        """
+        Set the processing results of many crawls with a single unordered bulk write,
+        a failing update does not stop the others
+
+        :param list results: Tuples of crawl id, score, entities and categories
+        :return: One report per result, in input order
+        :rtype: list
+        """
+        if not results:
+            return []
+
+        operations = [
+            UpdateOne({'_id': crawl_id}, build_update(score, entities, categories))
+            for crawl_id, score, entities, categories in results
+        ]
+
+        errors = {}
+        try:
+            self.collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as ex:
+            errors = {error['index']: error.get('errmsg', 'write failed') for error in ex.details.get('writeErrors', [])}
+
+            write_concern_errors = ex.details.get('writeConcernErrors', [])
+            if write_concern_errors:
+                message = write_concern_errors[0].get('errmsg', 'write concern failed')
+                errors = {index: errors.get(index, message) for index in range(len(results))}
+
+        return [WriteReport(result[0], errors.get(index)) for index, result in enumerate(results)]
@@ -2,20 +2,26 @@
 This file hanldes all decorators used in this project
 """
 
-from controller import Controller
+from functools import wraps
+
+from helpers.controller_pool import CONTROLLER_POOL
 
 def inject_controller(func):
     """
-    This function is a decorator wrapper to inject a controller to a function
-    and close the controller and connection after function execution
+    This function is a decorator wrapper to inject the controller of the worker process
+    to a function. If the function fails the controller is health checked and rebuilt if needed
 
     :param func func: The function the decorator is applied to
     """
+    @wraps(func)
     def inject(*args, **kwargs):
-        controller = Controller()
+        controller = CONTROLLER_POOL.acquire()
 
-        result = func(*args, **kwargs, controller=controller)
+        try:
+            result = func(*args, **kwargs, controller=controller)
+        except Exception:
+            CONTROLLER_POOL.release_failed()
+            raise
 
         return result
     return inject
-        
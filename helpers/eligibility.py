@@ -0,0 +1,104 @@
+"""
+This module decides which Google Cloud Language features can succeed for a text
+
+Classification needs a minimum number of tokens, not every feature supports every language
+and some texts are empty once links are removed. Requests for those texts fail, are logged and
+swallowed but still use up quota, so they are skipped before they are sent. The rules are the
+per feature support matrix in `config/feature_support.json`:
+
+    {"<feature>": {"languages": [...] or null for all languages, "min_tokens": <int>}}
+"""
+
+import os
+import re
+
+from threading import Lock
+
+from common.utils.read_json import read_json
+
+# Skip requests which cannot succeed, set to false to send all requests
+ELIGIBILITY_FILTER = os.environ.get('GOOGLE_NLP_ELIGIBILITY_FILTER', 'true').lower() == 'true'
+
+REGEX_LINKS = re.compile(r'https?://\S+|www\.\S+|@\w+')
+REGEX_TOKEN = re.compile(r'[a-zA-Z0-9]+')
+
+def count_tokens(text):
+    """
+    Count the tokens Google gets to see, links and mentions are not counted since
+    the cleanup in `GoogleCloudLanguageProcessor.process` leaves only fragments of them
+
+    :param str text: The raw text
+    :rtype: int
+    """
+    return len(REGEX_TOKEN.findall(REGEX_LINKS.sub(' ', text)))
+
+class EligibilityFilter():
+    """
+    Checks texts against the support matrix and counts the requests it saved
+    """
+    def __init__(self, rules):
+        """
+        :param dict rules: The support matrix by feature, features without rules are always eligible
+        """
+        self.rules = rules
+        self.saved = {feature: 0 for feature in rules}
+        self.lock = Lock()
+
+    def is_eligible(self, feature, tokens, language):
+        """
+        :param str feature: The client method, e.g. `classify_text`
+        :param int tokens: The number of tokens of the text, see `count_tokens`
+        :param str language: The language of the text, unknown languages are left to Google
+        :rtype: boolean
+        """
+        rule = self.rules.get(feature)
+        if rule is None:
+            return True
+
+        if tokens < rule.get('min_tokens', 1):
+            return False
+
+        languages = rule.get('languages')
+        return not languages or not language or language in languages
+
+    def eligible_features(self, text, language, features):
+        """
+        Filter the features which can succeed for a text, the skipped ones are counted as saved requests
+
+        :param str text: The raw text
+        :param str language: The language of the text
+        :param list features: The features which would be requested
+        :return: The eligible features
+        :rtype: set
+        """
+        tokens = count_tokens(text)
+        eligible = {feature for feature in features if self.is_eligible(feature, tokens, language)}
+
+        skipped = [feature for feature in features if feature not in eligible]
+        if skipped:
+            with self.lock:
+                for feature in skipped:
+                    self.saved[feature] = self.saved.get(feature, 0) + 1
+        return eligible
+
+    @property
+    def stats(self):
+        """
+        The number of skipped requests per feature in this process
+
+        :rtype: dict
+        """
+        with self.lock:
+            return dict(self.saved)
+
+def create_eligibility_filter(enabled=ELIGIBILITY_FILTER):
+    """
+    Create the filter configured by `config/feature_support.json`
+
+    :param boolean enabled: If requests should be filtered, defaults to GOOGLE_NLP_ELIGIBILITY_FILTER
+    :return: The filter or None if it is not enabled
+    :rtype: EligibilityFilter
+    """
+    if not enabled:
+        return None
+    return EligibilityFilter(read_json('./config/feature_support.json'))
@@ -0,0 +1,276 @@
+"""
+This module scores exported datasets with the VADER analyzers, without mongo and Google
+
+Records are streamed from JSONL, CSV or TSV files, routed to the analyzer of their language
+column and written out incrementally with the VADER scores appended. Chunks of records are
+scored by a process pool using all cores, at most two chunks per worker are in flight so
+inputs of any size are scored in bounded memory. Malformed records, whose text or language is
+not a string, are logged and counted as unscored, lines which are not JSON objects are not written.
+
+    python run.py score-file tweets.jsonl scored.jsonl --language-column lang --default-language de
+"""
+
+import argparse
+import csv
+import json
+import os
+import reprlib
+import sys
+import time
+
+from common.utils.logging import DEFAULT_LOGGER, LogTypes
+
+from helpers.vader import get_analyzers
+from VaderGerman.vaderSentimentGerman.batch import chunks, imap_chunks
+
+FORMATS = ['jsonl', 'csv', 'tsv']
+EXTENSIONS = {'.jsonl': 'jsonl', '.json': 'jsonl', '.ndjson': 'jsonl', '.csv': 'csv', '.tsv': 'tsv', '.tab': 'tsv'}
+DELIMITERS = {'csv': ',', 'tsv': '\t'}
+
+SCORE_KEYS = ['neg', 'neu', 'pos', 'compound']
+SCORE_COLUMNS = ['vader_{}'.format(key) for key in SCORE_KEYS]
+
+CHUNK_SIZE = 1000 # Records sent to a worker per task
+PROGRESS_INTERVAL = 10 # Seconds between two progress logs
+
+# The analyzers of a pool worker, set once by the pool initializer
+_worker_analyzers = None
+
+def create_analyzers():
+    """
+    :return: The VADER analyzers by language
+    :rtype: dict
+    """
+    return get_analyzers()
+
+def _init_worker(analyzers):
+    global _worker_analyzers
+    _worker_analyzers = analyzers
+
+def score_items(analyzers, items):
+    """
+    Score a chunk of texts with the analyzer of their language
+
+    :param dict analyzers: The analyzers by language
+    :param list items: Tuples of language and text, None for malformed records
+    :return: The VADER scores, None for malformed records, unsupported languages and missing texts
+    :rtype: list
+    """
+    results = []
+    for item in items:
+        analyzer = analyzers.get(item[0]) if item is not None else None
+        results.append(analyzer.polarity_scores(item[1]) if analyzer is not None and item[1] else None)
+    return results
+
+def _score_chunk(items):
+    return score_items(_worker_analyzers, items)
+
+def record_item(record, text_column='text', language_column='language', default_language=None):
+    """
+    Get the language and text of a record
+
+    :param dict record: The record
+    :param str text_column: The column holding the text
+    :param str language_column: The column holding the language
+    :param str default_language: The language of records without a language
+    :return: A tuple of language and text or None if the record is not an object or its text or language is not a string
+    :rtype: tuple
+    """
+    if not isinstance(record, dict):
+        return None
+
+    language = record.get(language_column)
+    text = record.get(text_column)
+    if not isinstance(language, (str, type(None))) or not isinstance(text, (str, type(None))):
+        return None
+    return language or default_language, text
+
+def detect_format(path, file_format=None):
+    """
+    Get the format of a file by its extension unless it is given
+
+    :param str path: The path of the file
+    :param str file_format: One of FORMATS or None
+    :rtype: str
+    """
+    if file_format:
+        return file_format
+
+    file_format = EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if file_format is None:
+        raise ValueError('Unknown format of {}, pass one of {}'.format(path, FORMATS))
+    return file_format
+
+def read_records(file, file_format):
+    """
+    Lazily read records from a file
+
+    :param file file: The opened input file
+    :param str file_format: One of FORMATS
+    :return: The records, None for JSONL lines which are not valid JSON
+    :rtype: generator
+    """
+    if file_format == 'jsonl':
+        for number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as ex:
+                DEFAULT_LOGGER.log('Skipping line {} which is not valid JSON'.format(number), LogTypes.ERROR.value, ex)
+                yield None
+        return
+
+    csv.field_size_limit(2 ** 31 - 1) # Exported texts can be longer than the default limit
+    yield from csv.DictReader(file, delimiter=DELIMITERS[file_format])
+
+class RecordWriter():
+    """
+    Writes records with their scores
+
+    The columns of CSV and TSV files are fixed by the header, which is written with the first
+    record. Keys which only later records of a JSONL input have are not written, each dropped
+    key is logged once and collected in `dropped_columns`.
+    """
+    def __init__(self, file, file_format):
+        """
+        :param file file: The opened output file
+        :param str file_format: One of FORMATS
+        """
+        self.file = file
+        self.file_format = file_format
+        self.writer = None
+        self.dropped_columns = []
+
+    def write(self, record, scores):
+        """
+        :param dict record: The input record
+        :param dict scores: The VADER scores or None
+        """
+        scored = dict(record)
+        for key, column in zip(SCORE_KEYS, SCORE_COLUMNS):
+            scored[column] = scores[key] if scores is not None else None
+
+        if self.file_format == 'jsonl':
+            self.file.write(json.dumps(scored, ensure_ascii=False) + '\n')
+            return
+
+        if self.writer is None:
+            fieldnames = list(record) + [column for column in SCORE_COLUMNS if column not in record]
+            self.writer = csv.DictWriter(self.file, fieldnames, delimiter=DELIMITERS[self.file_format], extrasaction='ignore')
+            self.writer.writeheader()
+
+        for key in scored:
+            if key not in self.writer.fieldnames and key not in self.dropped_columns:
+                self.dropped_columns.append(key)
+                DEFAULT_LOGGER.log('Dropping column {} which the first record does not have'.format(key), LogTypes.ERROR.value)
+        self.writer.writerow(scored)
+
+def iter_scored(records, text_column='text', language_column='language', default_language=None, workers=None, chunksize=CHUNK_SIZE):
+    """
+    Lazily score records in input order
+
+    :param iterable records: The records, see `read_records`
+    :param str text_column: The column holding the text
+    :param str language_column: The column holding the language
+    :param str default_language: The language of records without a language
+    :param int workers: Processes scoring chunks, None uses all cores and 1 scores in this process
+    :param int chunksize: Records per task of a worker
+    :return: Tuples of record and scores, None if the record could not be scored
+    :rtype: generator
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    position = 0
+
+    def items(chunk):
+        nonlocal position
+        result = []
+        for record in chunk:
+            position += 1
+            item = record_item(record, text_column, language_column, default_language)
+            if item is None and record is not None:
+                DEFAULT_LOGGER.log('Skipping malformed record {}: {}'.format(position, reprlib.repr(record)), log_type=LogTypes.ERROR.value)
+            result.append(item)
+        return result
+
+    analyzers = create_analyzers()
+
+    if workers <= 1:
+        for chunk in chunks(records, chunksize):
+            yield from zip(chunk, score_items(analyzers, items(chunk)))
+        return
+
+    for chunk, results in imap_chunks(_score_chunk, chunks(records, chunksize), workers, _init_worker, (analyzers,), arguments=items):
+        yield from zip(chunk, results)
+
+def score_file(input_path, output_path, input_format=None, output_format=None, **kwargs):
+    """
+    Score all records of a file and write them with their scores, `-` reads stdin or writes stdout
+
+    :param str input_path: The input file
+    :param str output_path: The output file
+    :param str input_format: One of FORMATS, detected by the extension if None
+    :param str output_format: One of FORMATS, detected by the extension, the input format if it is unknown
+    :param kwargs: See `iter_scored`
+    :return: The number of records, the number of records which could not be scored, the skipped ones among them and the documents per second
+    :rtype: dict
+    """
+    input_format = detect_format(input_path, input_format) if input_path != '-' else (input_format or 'jsonl')
+    output_format = output_format or EXTENSIONS.get(os.path.splitext(output_path)[1].lower()) or input_format
+
+    input_file = sys.stdin if input_path == '-' else open(input_path, newline='' if input_format != 'jsonl' else None, encoding='utf-8')
+    output_file = sys.stdout if output_path == '-' else open(output_path, 'w', newline='' if output_format != 'jsonl' else None, encoding='utf-8')
+
+    count = 0
+    unscored = 0
+    skipped = 0
+    started_at = last_progress_at = time.monotonic()
+
+    try:
+        writer = RecordWriter(output_file, output_format)
+        for record, scores in iter_scored(read_records(input_file, input_format), **kwargs):
+            count += 1
+            unscored += scores is None
+            if not isinstance(record, dict):
+                skipped += 1
+                continue
+            writer.write(record, scores)
+
+            if time.monotonic() - last_progress_at >= PROGRESS_INTERVAL:
+                last_progress_at = time.monotonic()
+                DEFAULT_LOGGER.log('Scored {} documents, {:.0f} docs/s'.format(count, count / (last_progress_at - started_at)), log_type=LogTypes.INFO.value)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+
+    seconds = time.monotonic() - started_at
+    stats = {'documents': count, 'unscored': unscored, 'skipped': skipped, 'seconds': seconds, 'documents_per_second': count / seconds if seconds else 0.0}
+    DEFAULT_LOGGER.log('Scored {documents} documents in {seconds:.1f}s ({documents_per_second:.0f} docs/s), {unscored} could not be scored, {skipped} were skipped'.format(**stats), log_type=LogTypes.INFO.value)
+    return stats
+
+def main(argv=None):
+    """
+    The `score-file` mode of run.py
+    """
+    parser = argparse.ArgumentParser(prog='run.py score-file', description='Score a JSONL, CSV or TSV file with VADER')
+    parser.add_argument('input', help='The input file, - reads stdin')
+    parser.add_argument('output', help='The output file, - writes stdout')
+    parser.add_argument('--text-column', default='text')
+    parser.add_argument('--language-column', default='language')
+    parser.add_argument('--default-language', default=None, help='The language of records without a language, e.g. de')
+    parser.add_argument('--input-format', choices=FORMATS)
+    parser.add_argument('--output-format', choices=FORMATS)
+    parser.add_argument('--workers', type=int, default=None, help='Scoring processes, all cores by default')
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    return score_file(
+        args.input, args.output,
+        input_format=args.input_format, output_format=args.output_format,
+        text_column=args.text_column, language_column=args.language_column, default_language=args.default_language,
+        workers=args.workers, chunksize=args.chunksize,
+    )
@@ -0,0 +1,128 @@
+"""
+This module provides a cache for the keywords crawls refer to
+
+Most crawls of a batch share a handful of keywords, so keywords are cached with a TTL and LRU
+eviction and all keywords of a batch can be loaded with a single `$in` query up front. Edits of
+a keyword are seen by running processes once its cached copy expired after KEYWORD_CACHE_TTL.
+
+Keywords loaded in batches are cast with the keyword type of the common library, so the cache
+only holds the objects `get_keyword_by_id` of the common MongoController returns.
+"""
+
+import os
+
+from threading import Lock
+
+from cachetools import TTLCache
+
+KEYWORDS_COLLECTION = os.environ.get('MONGO_KEYWORDS_COLLECTION', 'keywords')
+
+KEYWORD_CACHE_SIZE = int(os.environ.get('KEYWORD_CACHE_SIZE', 1024))
+KEYWORD_CACHE_TTL = int(os.environ.get('KEYWORD_CACHE_TTL', 300)) # Seconds
+
+class KeywordLoader():
+    """
+    Loads keywords, multiple keywords with a single `$in` query
+    """
+    def __init__(self, mongo_controller, collection, cast):
+        """
+        :param MongoController mongo_controller: The controller of the common library
+        :param Collection collection: The keyword collection
+        :param func cast: Converts a keyword document to a keyword, `cast(document)`, e.g. `Keyword.from_dict`
+        """
+        self.mongo_controller = mongo_controller
+        self.collection = collection
+        self.cast = cast
+
+    def load_one(self, keyword_id):
+        """
+        :param ObjectId keyword_id: The id of the keyword
+        :return: The keyword or None if it does not exist
+        """
+        return self.mongo_controller.get_keyword_by_id(keyword_id, cast=True)
+
+    def load_many(self, keyword_ids):
+        """
+        Load multiple keywords with a single `$in` query and cast them like `load_one`
+
+        :param iterable keyword_ids: The ids of the keywords
+        :return: The keywords by id, missing keywords are left out
+        :rtype: dict
+        """
+        return {document['_id']: self.cast(document) for document in self.collection.find({'_id': {'$in': list(keyword_ids)}})}
+
+class KeywordCache():
+    """
+    TTL and LRU bound cache of keywords by id
+    """
+    def __init__(self, load_one, load_many=None, maxsize=KEYWORD_CACHE_SIZE, ttl=KEYWORD_CACHE_TTL):
+        """
+        :param func load_one: Loads a single keyword by id, `load_one(keyword_id)`
+        :param func load_many: Loads multiple keywords and returns them by id, `load_many(keyword_ids)`
+        :param int maxsize: The maximum number of cached keywords, the least recently used one is evicted first
+        :param int ttl: Seconds a keyword is cached
+        """
+        self.load_one = load_one
+        self.load_many = load_many
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.lock = Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, keyword_id):
+        """
+        Get a keyword, it is loaded if it is not cached
+
+        :param ObjectId keyword_id: The id of the keyword
+        :return: The keyword or None if it does not exist
+        """
+        with self.lock:
+            keyword = self.cache.get(keyword_id)
+            if keyword is not None:
+                self.hits += 1
+                return keyword
+            self.misses += 1
+
+        keyword = self.load_one(keyword_id)
+
+        if keyword is not None:
+            with self.lock:
+                self.cache[keyword_id] = keyword
+        return keyword
+
+    def prefetch(self, keyword_ids):
+        """
+        Load all keywords which are not cached yet with a single `load_many` call
+
+        :param iterable keyword_ids: The ids of the keywords which are about to be used
+        """
+        if self.load_many is None:
+            return
+
+        with self.lock:
+            missing = {keyword_id for keyword_id in keyword_ids if keyword_id not in self.cache}
+        if not missing:
+            return
+
+        keywords = self.load_many(missing)
+
+        with self.lock:
+            for keyword_id, keyword in keywords.items():
+                self.cache[keyword_id] = keyword
+
+    def invalidate(self, keyword_id):
+        """
+        Drop a keyword from the cache, e.g. after it was updated
+
+        :param ObjectId keyword_id: The id of the keyword
+        """
+        with self.lock:
+            self.cache.pop(keyword_id, None)
+
+    def clear(self):
+        """
+        Drop all cached keywords
+        """
+        with self.lock:
+            self.cache.clear()
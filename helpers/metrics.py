@@ -0,0 +1,332 @@
+"""
+This module records latency and throughput of every processing stage
+
+Stages (mongo reads, keyword lookups, quota waits, every Google request, VADER scoring and
+writes) are timed into histograms labeled by stage, outcome and language, events like cache
+hits are counted. The metrics of a process can be exported
+
+    - in the Prometheus text format over a local HTTP endpoint, METRICS_PORT
+    - as periodic log snapshots, e.g. for Celery workers, METRICS_LOG_INTERVAL
+
+With METRICS_TRACE=true every crawl additionally logs a trace with the timing of each of its stages.
+"""
+
+import os
+import time
+
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from threading import Lock, Thread, local
+
+from common.utils.logging import DEFAULT_LOGGER, LogTypes
+
+METRICS_PORT = os.environ.get('METRICS_PORT') # Serve /metrics on this port if set
+METRICS_LOG_INTERVAL = os.environ.get('METRICS_LOG_INTERVAL') # Seconds between log snapshots if set
+METRICS_TRACE = os.environ.get('METRICS_TRACE', 'false').lower() == 'true'
+
+LATENCY_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+
+STAGE_SECONDS = 'nlp_stage_duration_seconds'
+STAGE_SECONDS_HELP = 'Duration of the processing stages'
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = [
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    ]
+    return '{' + ','.join(escaped) + '}'
+
+def _format_number(value):
+    value = float(value)
+    if value != value:
+        return 'NaN'
+    if value in (float('inf'), float('-inf')):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value) if value != int(value) else str(int(value))
+
+class Histogram():
+    """
+    Cumulative latency histogram of one label set
+    """
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # The last one counts observations above all buckets
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """
+        Estimate a quantile by the upper bound of the bucket it falls into
+
+        :param float q: The quantile, e.g. 0.95
+        :rtype: float
+        """
+        target = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets + [float('inf')], self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return float('inf')
+
+class Trace():
+    """
+    The timings of the stages of one crawl
+    """
+    def __init__(self, name):
+        self.name = name
+        self.started_at = time.perf_counter()
+        self.spans = []
+
+    def add(self, stage, seconds, outcome):
+        self.spans.append((stage, seconds, outcome))
+
+    def format(self):
+        total = time.perf_counter() - self.started_at
+        spans = ' '.join(
+            '{}={:.1f}ms{}'.format(stage, seconds * 1000, '' if outcome == 'success' else '({})'.format(outcome))
+            for stage, seconds, outcome in self.spans
+        )
+        return 'Trace {} total={:.1f}ms {}'.format(self.name, total * 1000, spans)
+
+class MetricsRegistry():
+    """
+    Counters and histograms of this process
+    """
+    def __init__(self, trace=METRICS_TRACE):
+        """
+        :param boolean trace: Log a trace with the stage timings of every crawl
+        """
+        self.trace_enabled = trace
+        self.counters = {} # name -> {labels: value}
+        self.histograms = {} # name -> {labels: Histogram}
+        self.help = {}
+        self.lock = Lock()
+        self.context = local()
+
+    def __labels(self, labels):
+        context = getattr(self.context, 'labels', {})
+        merged = dict(context, **labels)
+        return tuple(sorted((name, 'unknown' if value is None else value) for name, value in merged.items()))
+
+    def increment(self, name, value=1, help_text='', **labels):
+        """
+        Increment a counter
+
+        :param str name: The name of the counter, should end with `_total`
+        :param float value: The increment
+        :param str help_text: The description of the counter
+        """
+        key = self.__labels(labels)
+        with self.lock:
+            self.help.setdefault(name, help_text)
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, help_text='', **labels):
+        """
+        Add an observation to a histogram
+
+        :param str name: The name of the histogram
+        :param float value: The observed value, e.g. seconds
+        :param str help_text: The description of the histogram
+        """
+        key = self.__labels(labels)
+        with self.lock:
+            self.help.setdefault(name, help_text)
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def labels(self, **labels):
+        """
+        Add labels to all metrics recorded by this thread within the block, e.g. the language of a crawl
+        """
+        previous = getattr(self.context, 'labels', {})
+        self.context.labels = dict(previous, **labels)
+        try:
+            yield
+        finally:
+            self.context.labels = previous
+
+    @contextmanager
+    def timed(self, stage, **labels):
+        """
+        Time a stage, the outcome is `error` if the block raises
+
+        :param str stage: The name of the stage, e.g. `classify_text`
+        """
+        outcome = 'success'
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            outcome = 'error'
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            self.observe(STAGE_SECONDS, seconds, STAGE_SECONDS_HELP, stage=stage, outcome=outcome, **labels)
+
+            trace = getattr(self.context, 'trace', None)
+            if trace is not None:
+                trace.add(stage, seconds, outcome)
+
+    @contextmanager
+    def trace(self, name):
+        """
+        Collect the stages timed by this thread within the block and log them as one trace,
+        does nothing if tracing is disabled or a trace is already running
+
+        :param str name: The name of the trace, e.g. the id of the crawl
+        """
+        if not self.trace_enabled or getattr(self.context, 'trace', None) is not None:
+            yield
+            return
+
+        self.context.trace = Trace(name)
+        try:
+            yield
+        finally:
+            trace, self.context.trace = self.context.trace, None
+            DEFAULT_LOGGER.log(trace.format(), log_type=LogTypes.INFO.value)
+
+    def render(self):
+        """
+        Render all metrics in the Prometheus text format
+
+        :rtype: str
+        """
+        lines = []
+        with self.lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append('# HELP {} {}'.format(name, self.help.get(name, '')))
+                lines.append('# TYPE {} counter'.format(name))
+                for labels, value in sorted(series.items()):
+                    lines.append('{}{} {}'.format(name, _format_labels(labels), _format_number(value)))
+
+            for name, series in sorted(self.histograms.items()):
+                lines.append('# HELP {} {}'.format(name, self.help.get(name, '')))
+                lines.append('# TYPE {} histogram'.format(name))
+                for labels, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + ['+Inf'], histogram.counts):
+                        cumulative += count
+                        le = bound if bound == '+Inf' else _format_number(bound)
+                        lines.append('{}_bucket{} {}'.format(name, _format_labels(labels + (('le', le),)), cumulative))
+                    lines.append('{}_sum{} {}'.format(name, _format_labels(labels), repr(histogram.sum)))
+                    lines.append('{}_count{} {}'.format(name, _format_labels(labels), histogram.count))
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        """
+        Summarize all metrics in one line per series for logs
+
+        :rtype: list
+        """
+        lines = []
+        with self.lock:
+            for name, series in sorted(self.counters.items()):
+                for labels, value in sorted(series.items()):
+                    lines.append('{}{} {}'.format(name, _format_labels(labels), _format_number(value)))
+            for name, series in sorted(self.histograms.items()):
+                for labels, histogram in sorted(series.items()):
+                    lines.append('{}{} count={} mean={:.1f}ms p95<={}ms'.format(
+                        name, _format_labels(labels), histogram.count,
+                        histogram.sum / histogram.count * 1000, _format_number(histogram.quantile(0.95) * 1000)))
+        return lines
+
+    def reset(self):
+        """
+        Drop all recorded metrics
+        """
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+METRICS = MetricsRegistry()
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """
+    Serves the metrics of the registry of the server at /metrics
+    """
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+
+        body = self.server.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Scrapes should not flood the logs
+
+class MetricsServer(ThreadingMixIn, HTTPServer):
+    """
+    HTTP server answering every scrape on its own thread
+    """
+    daemon_threads = True
+
+def start_http_server(port, host='127.0.0.1', registry=METRICS):
+    """
+    Serve the metrics in the Prometheus text format from a background thread
+
+    :param int port: The port, 0 picks a free one
+    :param str host: The interface to listen on, only local by default
+    :return: The server, its address is `server.server_address`
+    :rtype: MetricsServer
+    """
+    server = MetricsServer((host, port), MetricsHandler)
+    server.registry = registry
+    Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    DEFAULT_LOGGER.log('Serving metrics on {}:{}/metrics'.format(*server.server_address), log_type=LogTypes.INFO.value)
+    return server
+
+def start_log_snapshots(interval, registry=METRICS):
+    """
+    Log a snapshot of the metrics every `interval` seconds from a background thread
+
+    :param float interval: Seconds between two snapshots
+    :return: The thread
+    :rtype: Thread
+    """
+    def log_snapshots():
+        while True:
+            time.sleep(interval)
+            try:
+                lines = registry.snapshot()
+            except Exception as ex:
+                DEFAULT_LOGGER.log('Could not take a metrics snapshot', LogTypes.ERROR.value, ex)
+                continue
+            if lines:
+                DEFAULT_LOGGER.log('Metrics (pid {}):\n{}'.format(os.getpid(), '\n'.join(lines)), log_type=LogTypes.INFO.value)
+
+    thread = Thread(target=log_snapshots, name='metrics-log', daemon=True)
+    thread.start()
+    return thread
+
+def start_exporters(http=True):
+    """
+    Start the exporters configured by METRICS_PORT and METRICS_LOG_INTERVAL
+
+    :param boolean http: Start the HTTP endpoint, Celery workers share one port so they only log snapshots
+    """
+    if http and METRICS_PORT:
+        start_http_server(int(METRICS_PORT))
+    if METRICS_LOG_INTERVAL:
+        start_log_snapshots(float(METRICS_LOG_INTERVAL))
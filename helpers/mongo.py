@@ -0,0 +1,24 @@
+"""
+This module provides direct access to the mongo database for the features the
+common MongoController does not cover, e.g. quota buckets and bulk writes
+"""
+
+import os
+
+from pymongo import MongoClient
+
+_clients = {}
+
+def get_database():
+    """
+    Get the project database, the client is created once per process because
+    pymongo clients must not be shared across a fork
+
+    :return: The database named by MONGO_DB_NAME
+    :rtype: pymongo.database.Database
+    """
+    pid = os.getpid()
+    if pid not in _clients:
+        _clients.clear()
+        _clients[pid] = MongoClient(os.environ['MONGO_CONNECTION_STRING'], connect=False)
+    return _clients[pid][os.environ['MONGO_DB_NAME']]
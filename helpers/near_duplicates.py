@@ -0,0 +1,208 @@
+"""
+This module provides an index of near-duplicate texts based on 64 bit SimHash fingerprints
+
+Many crawls are the same post with a different link, mention or emoji. Their fingerprints differ
+in only a few bits, so the entities and categories of an already analyzed representative can be
+reused. Two fingerprints are similar if `1 - hamming distance / 64` reaches the threshold.
+
+Lookups use the pigeonhole principle: with at most k differing bits, splitting the fingerprint
+into k + 1 bands leaves at least one band identical. Every band is an exact match table, so only
+the entries sharing a band are compared instead of the whole index. The index is bounded, the
+least recently used entries are evicted first.
+"""
+
+import hashlib
+import os
+import re
+
+from collections import OrderedDict
+from threading import Lock
+
+from helpers.result_cache import CachedCategory, CachedEntity, CachedSentiment
+
+FINGERPRINT_BITS = 64
+MIN_FEATURES = 5 # Shorter texts differ too much by a single word to be fingerprinted reliably
+
+# Disabled if unset, e.g. 0.95 allows 3 of 64 bits to differ
+NEAR_DUPLICATE_THRESHOLD = os.environ.get('NEAR_DUPLICATE_THRESHOLD')
+NEAR_DUPLICATE_MAX_ENTRIES = int(os.environ.get('NEAR_DUPLICATE_MAX_ENTRIES', 1000000))
+
+REGEX_NOISE = re.compile(r'https?://\S+|www\.\S+|@\w+')
+REGEX_WORD = re.compile(r'\w+')
+
+def text_features(text):
+    """
+    Get the features of a text, links and mentions are dropped and
+    emojis and punctuation do not produce words
+
+    :param str text: The raw text
+    :return: Words and word bigrams
+    :rtype: list
+    """
+    words = REGEX_WORD.findall(REGEX_NOISE.sub(' ', text).lower())
+    return words + [words[i] + ' ' + words[i + 1] for i in range(len(words) - 1)]
+
+def simhash(features):
+    """
+    Compute the 64 bit SimHash of features, every feature has the same weight
+
+    :param list features: The features of a text
+    :rtype: int
+    """
+    hashes = [hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest() for feature in features]
+    half = len(hashes) / 2
+
+    # Count the set bits of every position column wise, the columns of the bit strings
+    # are counted in C which is a lot faster than shifting every hash 64 times
+    bits = [format(int.from_bytes(value, 'little'), '064b') for value in hashes]
+    return int(''.join('1' if column.count('1') > half else '0' for column in zip(*bits)), 2)
+
+def fingerprint_text(text):
+    """
+    Fingerprint a text
+
+    :param str text: The raw text
+    :return: The fingerprint or None if the text is too short
+    :rtype: int
+    """
+    features = text_features(text)
+    if len(features) < MIN_FEATURES:
+        return None
+    return simhash(features)
+
+def similarity(fingerprint, other):
+    """
+    :return: The share of equal bits of two fingerprints
+    :rtype: float
+    """
+    return 1 - bin(fingerprint ^ other).count('1') / FINGERPRINT_BITS
+
+def compact_result(score, entities, categories):
+    """
+    Convert a processing result to the lightweight tuples of the result cache,
+    Google's response objects are too large to keep millions of them
+
+    :return: Score, entities and categories
+    :rtype: Tuple with 3 slots
+    """
+    return (
+        score,
+        [CachedEntity(entity.name, CachedSentiment(entity.sentiment.score)) for entity in entities],
+        [CachedCategory(category.name, category.confidence) for category in categories],
+    )
+
+class NearDuplicateIndex():
+    """
+    Incremental, size bounded SimHash index mapping fingerprints to the result of their representative
+    """
+    def __init__(self, threshold=0.95, max_entries=NEAR_DUPLICATE_MAX_ENTRIES):
+        """
+        :param float threshold: The minimum similarity of a near-duplicate
+        :param int max_entries: The maximum number of indexed representatives
+        """
+        if not 0 < threshold <= 1:
+            raise ValueError('The threshold has to be in (0, 1], got {}'.format(threshold))
+
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_distance = int((1 - threshold) * FINGERPRINT_BITS + 1e-9)
+
+        # k + 1 bands of (nearly) equal width cover all 64 bits
+        band_count = self.max_distance + 1
+        widths = [FINGERPRINT_BITS // band_count + (1 if i < FINGERPRINT_BITS % band_count else 0) for i in range(band_count)]
+        self.bands = []
+        shift = 0
+        for width in widths:
+            self.bands.append((shift, (1 << width) - 1))
+            shift += width
+
+        self.entries = OrderedDict() # (namespace, fingerprint) -> value, in least recently used order
+        self.tables = [{} for _ in self.bands] # band value -> list of (namespace, fingerprint)
+        self.lock = Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __band_keys(self, fingerprint):
+        return [(fingerprint >> shift) & mask for shift, mask in self.bands]
+
+    def lookup(self, namespace, fingerprint):
+        """
+        Find the most similar indexed fingerprint of a namespace
+
+        :param namespace: Only entries added with the same namespace match, e.g. language and keyword
+        :param int fingerprint: The fingerprint of the new text
+        :return: The value of the representative or None
+        """
+        best_entry = None
+        best_distance = self.max_distance + 1
+
+        with self.lock:
+            for table, band_key in zip(self.tables, self.__band_keys(fingerprint)):
+                for entry in table.get(band_key, ()):
+                    if entry[0] != namespace:
+                        continue
+                    distance = bin(entry[1] ^ fingerprint).count('1')
+                    if distance < best_distance:
+                        best_entry, best_distance = entry, distance
+
+            if best_entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.entries.move_to_end(best_entry)
+            return self.entries[best_entry]
+
+    def add(self, namespace, fingerprint, value):
+        """
+        Index a representative, the least recently used one is evicted if the index is full
+
+        :param namespace: See `lookup`
+        :param int fingerprint: The fingerprint of the representative
+        :param value: The value returned for its near-duplicates
+        """
+        entry = (namespace, fingerprint)
+
+        with self.lock:
+            if entry in self.entries:
+                self.entries[entry] = value
+                self.entries.move_to_end(entry)
+                return
+
+            self.entries[entry] = value
+            for table, band_key in zip(self.tables, self.__band_keys(fingerprint)):
+                table.setdefault(band_key, []).append(entry)
+
+            while len(self.entries) > self.max_entries:
+                self.__remove(self.entries.popitem(last=False)[0])
+
+    def __remove(self, entry):
+        for table, band_key in zip(self.tables, self.__band_keys(entry[1])):
+            bucket = table[band_key]
+            bucket.remove(entry)
+            if not bucket:
+                del table[band_key]
+
+    def clear(self):
+        """
+        Drop all indexed representatives
+        """
+        with self.lock:
+            self.entries.clear()
+            for table in self.tables:
+                table.clear()
+
+def create_near_duplicate_index():
+    """
+    Create the index configured by NEAR_DUPLICATE_THRESHOLD
+
+    :return: The index or None if near-duplicate detection is disabled
+    :rtype: NearDuplicateIndex
+    """
+    if not NEAR_DUPLICATE_THRESHOLD:
+        return None
+    return NearDuplicateIndex(float(NEAR_DUPLICATE_THRESHOLD))
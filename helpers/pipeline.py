@@ -0,0 +1,146 @@
+"""
+This module provides a staged pipeline which fetches, analyzes and writes crawls concurrently
+
+    fetch (1 thread) -> analyze queue -> analyze (n threads) -> write queue -> write (1 thread)
+
+The producer fetches the next page of unprocessed crawls while the current one is analyzed and
+the writer stores results while new ones are analyzed, so mongo latency overlaps with Google
+latency instead of adding to it. Both queues are bounded, a slow stage blocks the stage before it.
+"""
+
+import queue
+
+from threading import Condition, Thread
+
+from common.utils.logging import DEFAULT_LOGGER, LogTypes
+
+from helpers.crawl_feed import CrawlFeed
+
+_DONE = object() # Tells a stage that no more items will follow
+
+class CrawlPipeline():
+    """
+    Processes all unprocessed crawls in three connected stages
+    """
+    def __init__(self, fetch, analyze, write, analysis_workers=16, page_size=200, write_batch_size=50):
+        """
+        :param func fetch: Returns up to `page_size` unprocessed crawl results, `fetch(page_size)`
+        :param func analyze: Analyzes a crawl result and returns its result, `analyze(crawl)`
+        :param func write: Stores a list of (crawl, result) tuples and returns reports with the `crawl_id` of the ones it failed to store, `write(items)`
+        :param int analysis_workers: The number of threads analyzing crawls
+        :param int page_size: The number of crawls fetched at once
+        :param int write_batch_size: The maximum number of results passed to a single `write` call
+        """
+        self.feed = CrawlFeed(fetch, page_size)
+        self.analyze = analyze
+        self.write = write
+        self.analysis_workers = analysis_workers
+        self.write_batch_size = write_batch_size
+
+        self.analyze_queue = queue.Queue(maxsize=page_size)
+        self.write_queue = queue.Queue(maxsize=page_size)
+
+        self.in_flight_changed = Condition()
+
+        self.processed = 0
+        self.failed = 0
+
+    def __finish(self, crawl_ids, failed=False):
+        with self.in_flight_changed:
+            for crawl_id in crawl_ids:
+                self.feed.finish(crawl_id, failed=failed)
+            if failed:
+                self.failed += len(crawl_ids)
+            else:
+                self.processed += len(crawl_ids)
+            self.in_flight_changed.notify_all()
+
+    def __produce(self):
+        """
+        Fetch pages of unprocessed crawls until a fetch returns no crawl which was not already
+        started in this run, see `CrawlFeed`
+        """
+        while True:
+            try:
+                crawls = self.feed.next_page()
+            except Exception as ex:
+                DEFAULT_LOGGER.log('Failed to fetch unprocessed crawls', LogTypes.ERROR.value, ex)
+                break
+
+            if not crawls:
+                with self.in_flight_changed:
+                    if self.feed.in_flight == 0:
+                        break
+                    self.in_flight_changed.wait() # Fetch again once a running crawl was written
+                continue
+
+            for crawl in crawls:
+                self.analyze_queue.put(crawl)
+
+        for _ in range(self.analysis_workers):
+            self.analyze_queue.put(_DONE)
+
+    def __analyze(self):
+        while True:
+            crawl = self.analyze_queue.get()
+            if crawl is _DONE:
+                return
+
+            try:
+                result = self.analyze(crawl)
+            except Exception as ex:
+                DEFAULT_LOGGER.log('Failed to analyze crawl {}'.format(crawl._id), LogTypes.ERROR.value, ex)
+                self.__finish([crawl._id], failed=True)
+                continue
+
+            self.write_queue.put((crawl, result))
+
+    def __write(self):
+        done = False
+
+        while not done:
+            items = [self.write_queue.get()]
+            while len(items) < self.write_batch_size:
+                try:
+                    items.append(self.write_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if items[-1] is _DONE:
+                items.pop()
+                done = True
+            if not items:
+                continue
+
+            crawl_ids = [crawl._id for crawl, _ in items]
+            try:
+                failed = {report.crawl_id for report in self.write(items) or []}
+                self.__finish([crawl_id for crawl_id in crawl_ids if crawl_id not in failed])
+                self.__finish([crawl_id for crawl_id in crawl_ids if crawl_id in failed], failed=True)
+            except Exception as ex:
+                DEFAULT_LOGGER.log('Failed to write {} crawl results'.format(len(items)), LogTypes.ERROR.value, ex)
+                self.__finish(crawl_ids, failed=True)
+
+    def run(self):
+        """
+        Run all stages until every unprocessed crawl went through the pipeline
+
+        :return: The number of processed crawls
+        :rtype: int
+        """
+        producer = Thread(target=self.__produce, name='pipeline-fetch')
+        analyzers = [Thread(target=self.__analyze, name='pipeline-analyze-{}'.format(i)) for i in range(self.analysis_workers)]
+        writer = Thread(target=self.__write, name='pipeline-write')
+
+        for thread in [producer, writer] + analyzers:
+            thread.start()
+
+        producer.join()
+        for analyzer in analyzers:
+            analyzer.join()
+
+        self.write_queue.put(_DONE)
+        writer.join()
+
+        DEFAULT_LOGGER.log('Processed {} crawls, {} failed'.format(self.processed, self.failed), log_type=LogTypes.INFO.value)
+        return self.processed
@@ -0,0 +1,271 @@
+"""
+This module provides a token bucket rate limiter for the Google Cloud Language quota
+
+All processes which talk to Google (Celery workers and `run.py full`) take their permits
+from the same buckets, which are stored in mongo by default. Every request takes a token from
+the bucket of the whole project, requests of a feature with a lower quota of its own additionally
+take one from the bucket of the feature.
+Buckets in mongo are refilled by the clock of the mongo server, so the hosts sharing them
+do not need synchronized clocks. If the shared backend fails the limiter keeps going with in-process buckets until it recovers.
+
+Google NLP Quota:
+Link: https://cloud.google.com/natural-language/quotas
+"""
+
+import os
+import time
+import calendar
+
+from threading import Lock
+
+from common.utils.logging import DEFAULT_LOGGER, LogTypes
+from common.utils.read_json import read_json
+
+PROJECT_BUCKET = 'project'
+FALLBACK_RETRY_INTERVAL = 60 # Seconds before the shared backend is tried again after a failure
+CLOCK_SYNC_INTERVAL = 300 # Seconds before the offset to the clock of the mongo server is measured again
+
+class InMemoryBackend():
+    """
+    Token buckets which are only shared by the threads of this process
+    """
+    def __init__(self):
+        self.buckets = {}
+        self.lock = Lock()
+
+    def take(self, key, capacity, rate, tokens=1):
+        """
+        Take tokens from a bucket if it holds enough of them
+
+        :param str key: The bucket
+        :param float capacity: The maximum number of tokens the bucket holds
+        :param float rate: Tokens added to the bucket per second
+        :param int tokens: The number of tokens to take
+        :return: 0 if the tokens were taken, otherwise the seconds until they will be available
+        :rtype: float
+        """
+        with self.lock:
+            now = time.time()
+            level, updated_at = self.buckets.get(key, (capacity, now))
+            level = min(capacity, level + max(0, now - updated_at) * rate)
+
+            if level >= tokens:
+                self.buckets[key] = (level - tokens, now)
+                return 0.0
+
+            self.buckets[key] = (level, now)
+            return (tokens - level) / rate
+
+    def refund(self, key, capacity, tokens=1):
+        """
+        Put tokens which were taken but not used back into a bucket
+
+        :param str key: The bucket
+        :param float capacity: The maximum number of tokens the bucket holds
+        :param int tokens: The number of tokens to put back
+        """
+        with self.lock:
+            if key in self.buckets:
+                level, updated_at = self.buckets[key]
+                self.buckets[key] = (min(capacity, level + tokens), updated_at)
+
+class MongoBackend():
+    """
+    Token buckets stored in a mongo collection and shared by all processes, every bucket is
+    one document which is updated with compare and swap so concurrent takes never overdraw it.
+    Times are taken from the clock of the mongo server: its offset to the local clock is
+    measured periodically, so the hosts sharing the buckets may have skewed clocks
+    """
+    def __init__(self, collection, max_attempts=20, clock_sync_interval=CLOCK_SYNC_INTERVAL):
+        """
+        :param Collection collection: The collection storing one document per bucket
+        :param int max_attempts: Attempts per take before contention is reported as a wait
+        :param float clock_sync_interval: Seconds before the offset to the server clock is measured again
+        """
+        self.collection = collection
+        self.max_attempts = max_attempts
+        self.clock_sync_interval = clock_sync_interval
+
+        self.clock_offset = 0.0
+        self.clock_synced_at = None
+
+    def now(self):
+        """
+        The current time of the mongo server, derived from the local clock and the measured offset
+
+        :return: Seconds since the epoch
+        :rtype: float
+        """
+        if self.clock_synced_at is None or time.monotonic() - self.clock_synced_at >= self.clock_sync_interval:
+            sent_at = time.time()
+            server_time = self.collection.database.command('isMaster')['localTime']
+            received_at = time.time()
+
+            server_seconds = calendar.timegm(server_time.utctimetuple()) + server_time.microsecond / 10 ** 6
+            self.clock_offset = server_seconds - (sent_at + received_at) / 2 # Assume the reply took half the round trip
+            self.clock_synced_at = time.monotonic()
+
+        return time.time() + self.clock_offset
+
+    def take(self, key, capacity, rate, tokens=1):
+        """
+        See `InMemoryBackend.take`
+        """
+        from pymongo.errors import DuplicateKeyError
+
+        for _ in range(self.max_attempts):
+            now = self.now()
+            bucket = self.collection.find_one({'_id': key})
+
+            if bucket is None:
+                try:
+                    self.collection.insert_one({'_id': key, 'tokens': float(capacity), 'updated_at': now})
+                except DuplicateKeyError:
+                    pass # Another process created the bucket first
+                continue
+
+            level = min(capacity, bucket['tokens'] + max(0, now - bucket['updated_at']) * rate)
+            if level < tokens:
+                return (tokens - level) / rate
+
+            result = self.collection.update_one(
+                {'_id': key, 'tokens': bucket['tokens'], 'updated_at': bucket['updated_at']},
+                {'$set': {'tokens': level - tokens, 'updated_at': max(now, bucket['updated_at'])}}
+            )
+            if result.modified_count == 1:
+                return 0.0
+
+        return 1 / rate # Too much contention, back off for one token
+
+    def refund(self, key, capacity, tokens=1):
+        """
+        See `InMemoryBackend.refund`, the level is capped at the capacity by the next take
+        """
+        self.collection.update_one({'_id': key}, {'$inc': {'tokens': float(tokens)}})
+
+class RateLimiter():
+    """
+    Blocks callers until the quota of the requested feature allows another request
+    """
+    def __init__(self, backend, requests_per_minute, feature_limits=None, burst=10, fallback_backend=None, namespace='google-nlp'):
+        """
+        :param backend: The backend storing the buckets, see `InMemoryBackend`
+        :param float requests_per_minute: The quota of the whole project
+        :param dict feature_limits: Requests per minute per feature, features without a limit lower than
+            `requests_per_minute` only use the project bucket
+        :param float burst: The number of requests which may be sent at once
+        :param fallback_backend: The backend used while `backend` fails
+        :param str namespace: Prefix of all bucket keys
+        """
+        self.backend = backend
+        self.fallback_backend = fallback_backend or InMemoryBackend()
+        self.requests_per_minute = requests_per_minute
+        # A feature bucket which is not lower than the project bucket never binds, it would only cost round trips
+        self.feature_limits = {
+            feature: limit for feature, limit in (feature_limits or {}).items() if limit < requests_per_minute
+        }
+        self.burst = burst
+        self.namespace = namespace
+
+        self.backend_failed_at = None
+
+    def __call_backend(self, method, bucket, requests_per_minute, *args):
+        key = '{}:{}'.format(self.namespace, bucket)
+        capacity = min(self.burst, requests_per_minute)
+
+        if self.backend_failed_at is None or time.monotonic() - self.backend_failed_at >= FALLBACK_RETRY_INTERVAL:
+            try:
+                result = getattr(self.backend, method)(key, capacity, *args)
+                self.backend_failed_at = None
+                return result
+            except Exception as ex:
+                DEFAULT_LOGGER.log('Rate limiter backend failed, using in-process buckets', LogTypes.ERROR.value, ex)
+                self.backend_failed_at = time.monotonic()
+
+        return getattr(self.fallback_backend, method)(key, capacity, *args)
+
+    def __take(self, bucket, requests_per_minute):
+        return self.__call_backend('take', bucket, requests_per_minute, requests_per_minute / 60)
+
+    def __refund(self, bucket, requests_per_minute):
+        self.__call_backend('refund', bucket, requests_per_minute)
+
+    def __wait(self, bucket, requests_per_minute, deadline):
+        while True:
+            wait = self.__take(bucket, requests_per_minute)
+            if wait <= 0:
+                return True
+
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+    def acquire(self, feature, timeout=None):
+        """
+        Wait for a permit to send one request of a feature
+
+        :param str feature: The API feature, e.g. `classify_text`
+        :param float timeout: Seconds to wait at most, None waits until a permit is granted
+        :return: If the permit was granted
+        :rtype: boolean
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        if feature in self.feature_limits:
+            if not self.__wait(feature, self.feature_limits[feature], deadline):
+                return False
+
+        if not self.__wait(PROJECT_BUCKET, self.requests_per_minute, deadline):
+            if feature in self.feature_limits: # The request is not sent, another one may use the feature token
+                self.__refund(feature, self.feature_limits[feature])
+            return False
+        return True
+
+def create_backend(name):
+    """
+    Create a rate limiter backend by name
+
+    :param str name: One of BACKENDS
+    :return: The backend
+    """
+    return BACKENDS[name]()
+
+def create_mongo_backend():
+    """
+    Create the shared backend, buckets are stored in the `quota_buckets` collection
+    """
+    from helpers.mongo import get_database
+    return MongoBackend(get_database()['quota_buckets'])
+
+BACKENDS = {
+    'memory': InMemoryBackend,
+    'mongo': create_mongo_backend,
+}
+
+_rate_limiter = None
+
+def get_rate_limiter():
+    """
+    Get the rate limiter of this process, configured by `config/google_quota.json`
+
+    The backend is picked by the GOOGLE_QUOTA_BACKEND env var and defaults to mongo
+    if a mongo connection is configured
+
+    :rtype: RateLimiter
+    """
+    global _rate_limiter
+
+    if _rate_limiter is None:
+        quota = read_json('./config/google_quota.json')
+        default_backend = 'mongo' if 'MONGO_CONNECTION_STRING' in os.environ else 'memory'
+
+        _rate_limiter = RateLimiter(
+            create_backend(os.environ.get('GOOGLE_QUOTA_BACKEND', default_backend)),
+            quota['requests_per_minute'],
+            feature_limits=quota.get('features'),
+            burst=quota.get('burst', 10),
+        )
+    return _rate_limiter
@@ -0,0 +1,202 @@
+"""
+This module provides a persistent cache of NLP results keyed by the content they were computed from
+
+Retweets and syndicated posts produce many crawls with the same cleaned text, the results of the
+first one are stored in a SQLite file and reused for all copies instead of asking Google again.
+The key is a hash of the normalized text, the language and the keyword, since the keyword decides
+which entities are filtered out. Entries expire after a TTL and the least recently used entries
+are evicted once the cache holds more than `max_entries`.
+
+The cache is opt-in, set NLP_CACHE_PATH to the path of the SQLite file to enable it.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from collections import namedtuple
+from threading import Lock
+
+NLP_CACHE_PATH = os.environ.get('NLP_CACHE_PATH')
+NLP_CACHE_MAX_ENTRIES = int(os.environ.get('NLP_CACHE_MAX_ENTRIES', 100000))
+NLP_CACHE_TTL = int(os.environ.get('NLP_CACHE_TTL', 7 * 24 * 60 * 60)) # Seconds
+
+EVICTION_FRACTION = 0.1 # Share of the entries removed at once when the cache is full
+
+# Lightweight versions of the Google result classes, with the attributes the controller reads
+CachedSentiment = namedtuple('CachedSentiment', ['score'])
+CachedEntity = namedtuple('CachedEntity', ['name', 'sentiment'])
+CachedCategory = namedtuple('CachedCategory', ['name', 'confidence'])
+
+def cache_key(text, language, keyword_string):
+    """
+    Build the key of a text, whitespace differences do not change the key
+
+    :param str text: The cleaned text
+    :param str language: The language of the text
+    :param str keyword_string: The keyword which was used to get the text
+    :return: The hex sha256 digest
+    :rtype: str
+    """
+    normalized = ' '.join(text.split())
+    content = '\0'.join([language or '', keyword_string.lower(), normalized])
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def serialize_result(score, entities, categories):
+    """
+    Serialize a processing result, only the attributes the controller reads are kept
+
+    :rtype: str
+    """
+    return json.dumps({
+        'score': score,
+        'entities': [[entity.name, entity.sentiment.score] for entity in entities],
+        'categories': [[category.name, category.confidence] for category in categories],
+    })
+
+def deserialize_result(value):
+    """
+    Deserialize a processing result stored by `serialize_result`
+
+    :return: Score, entities and categories
+    :rtype: Tuple with 3 slots
+    """
+    result = json.loads(value)
+    entities = [CachedEntity(name, CachedSentiment(score)) for name, score in result['entities']]
+    categories = [CachedCategory(name, confidence) for name, confidence in result['categories']]
+    return (result['score'], entities, categories)
+
+class ResultCache():
+    """
+    SQLite backed cache of processing results, shared by all processes using the same file
+    """
+    def __init__(self, path, max_entries=NLP_CACHE_MAX_ENTRIES, ttl=NLP_CACHE_TTL):
+        """
+        :param str path: The path of the SQLite file
+        :param int max_entries: The maximum number of cached results
+        :param int ttl: Seconds a result is reused
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = Lock()
+
+        self.connection = None
+        self.pid = None
+        self.writes_since_eviction = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __connect(self):
+        """
+        Get the connection of this process, a forked process opens its own one
+        """
+        if self.connection is None or self.pid != os.getpid():
+            self.connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS results ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+            )
+            self.connection.execute('CREATE INDEX IF NOT EXISTS results_accessed_at ON results (accessed_at)')
+            self.pid = os.getpid()
+        return self.connection
+
+    def get(self, key):
+        """
+        Get a cached result
+
+        :param str key: The key built by `cache_key`
+        :return: Score, entities and categories or None if nothing valid is cached
+        :rtype: Tuple with 3 slots
+        """
+        now = time.time()
+
+        with self.lock:
+            connection = self.__connect()
+            row = connection.execute('SELECT value, created_at FROM results WHERE key = ?', (key,)).fetchone()
+
+            if row is None or now - row[1] >= self.ttl:
+                if row is not None:
+                    connection.execute('DELETE FROM results WHERE key = ?', (key,))
+                self.misses += 1
+                return None
+
+            connection.execute('UPDATE results SET accessed_at = ? WHERE key = ?', (now, key))
+            self.hits += 1
+
+        return deserialize_result(row[0])
+
+    def set(self, key, score, entities, categories):
+        """
+        Cache a result, evicting the least recently used results if the cache is full
+
+        :param str key: The key built by `cache_key`
+        """
+        now = time.time()
+        value = serialize_result(score, entities, categories)
+
+        with self.lock:
+            connection = self.__connect()
+            connection.execute(
+                'INSERT OR REPLACE INTO results (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)',
+                (key, value, now, now)
+            )
+
+            # Counting all rows on every write is wasteful, check the size every few writes
+            self.writes_since_eviction += 1
+            if self.writes_since_eviction >= max(1, int(self.max_entries * EVICTION_FRACTION)):
+                self.writes_since_eviction = 0
+                self.__evict(connection, now)
+
+    def __evict(self, connection, now):
+        expired = connection.execute('DELETE FROM results WHERE created_at <= ?', (now - self.ttl,)).rowcount
+        self.evictions += expired
+
+        count = connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+        if count > self.max_entries:
+            excess = count - self.max_entries + int(self.max_entries * EVICTION_FRACTION)
+            evicted = connection.execute(
+                'DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY accessed_at LIMIT ?)', (excess,)
+            ).rowcount
+            self.evictions += evicted
+
+    def clear(self):
+        """
+        Drop all cached results
+        """
+        with self.lock:
+            self.__connect().execute('DELETE FROM results')
+
+    def close(self):
+        """
+        Close the connection of this process
+        """
+        with self.lock:
+            if self.connection is not None and self.pid == os.getpid():
+                self.connection.close()
+            self.connection = None
+
+    @property
+    def stats(self):
+        """
+        The hit, miss and eviction counters of this process
+
+        :rtype: dict
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+def create_result_cache():
+    """
+    Create the result cache configured by NLP_CACHE_PATH
+
+    :return: The cache or None if caching is disabled
+    :rtype: ResultCache
+    """
+    if not NLP_CACHE_PATH:
+        return None
+    return ResultCache(NLP_CACHE_PATH)
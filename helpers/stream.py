@@ -0,0 +1,274 @@
+"""
+This module follows newly inserted crawls and processes them within seconds
+
+A mongo change stream delivers every inserted crawl as soon as it was written. Crawls are
+processed in small batches and the resume token of the last processed change is stored in
+mongo, so a restarted processor continues where it stopped. Crawls which already have results
+are skipped, so changes replayed after a crash between writing results and storing the token
+are not analyzed again.
+
+Change streams need a replica set. Without one the runner falls back to polling for
+unprocessed crawls, the poll interval grows while polls come back empty and shrinks as
+soon as crawls show up again. Crawls which failed are not polled again for a while, so they
+neither use up the quota on every poll nor keep the interval at its minimum.
+
+Crawls which fail while following the change stream are retried by draining the unprocessed
+crawls every `retry_failed_after` seconds. Until no failed crawl is left the resume token is not
+moved past them, so a restarted processor replays them instead of losing them.
+"""
+
+import time
+
+from threading import Event
+
+from common.utils.logging import DEFAULT_LOGGER, LogTypes
+
+from helpers.crawl_feed import CrawlFeed
+
+STREAM_TOKENS_COLLECTION = 'stream_tokens'
+INSERTED_CRAWLS = [{'$match': {'operationType': 'insert'}}]
+
+# Codes of the errors opening a change stream fails with if the server does not support them:
+# not a replica set, unknown $changeStream stage (before 3.6) and command not supported
+CHANGE_STREAMS_UNSUPPORTED = {40573, 40324, 115}
+
+class ChangeStreamsUnavailable(Exception):
+    """
+    The database does not support change streams
+    """
+
+class ResumeTokenStore():
+    """
+    Stores the resume token of a change stream in mongo
+    """
+    def __init__(self, collection, name):
+        """
+        :param Collection collection: The collection storing one document per stream
+        :param str name: The name of the stream
+        """
+        self.collection = collection
+        self.name = name
+
+    def load(self):
+        """
+        :return: The stored resume token or None
+        :rtype: dict
+        """
+        document = self.collection.find_one({'_id': self.name})
+        return document['token'] if document else None
+
+    def save(self, token):
+        """
+        :param dict token: The resume token of the last processed change, None removes it
+        """
+        if token is None:
+            self.collection.delete_one({'_id': self.name})
+        else:
+            self.collection.update_one({'_id': self.name}, {'$set': {'token': token, 'updated_at': time.time()}}, upsert=True)
+
+class CrawlStreamRunner():
+    """
+    Processes inserted crawls from a change stream, or by adaptive polling if change streams are not available
+    """
+    def __init__(self, collection, token_store, fetch, process_batch, cast, processed_query=None,
+                 batch_size=50, max_batch_wait=1.0, min_poll_interval=1.0, max_poll_interval=60.0, retry_failed_after=600.0):
+        """
+        :param Collection collection: The crawl collection, None only polls
+        :param ResumeTokenStore token_store: Stores the position in the change stream
+        :param func fetch: Returns up to `limit` unprocessed crawl results, `fetch(limit)`, see `CrawlFeed`
+        :param func process_batch: Processes a list of crawl results and returns if each one was processed, `process_batch(crawls)`
+        :param func cast: Converts a crawl document to a crawl result, `cast(document)`
+        :param dict processed_query: Matches crawls which already have results, see `helpers.crawl_writer.PROCESSED_QUERY`
+        :param int batch_size: The maximum number of crawls processed at once
+        :param float max_batch_wait: Seconds a received crawl waits for more crawls to fill its batch
+        :param float min_poll_interval: Seconds between polls while crawls keep coming in
+        :param float max_poll_interval: Seconds between polls at most, while polls come back empty
+        :param float retry_failed_after: Seconds before a crawl which failed is fetched again by a poll or a retry
+        """
+        self.collection = collection
+        self.token_store = token_store
+        self.feed = CrawlFeed(fetch, batch_size, retry_failed_after=retry_failed_after)
+        self.process_batch = process_batch
+        self.cast = cast
+        self.processed_query = processed_query
+        self.batch_size = batch_size
+        self.max_batch_wait = max_batch_wait
+        self.min_poll_interval = min_poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.retry_failed_after = retry_failed_after
+
+        self.stop_event = Event()
+        self.processed = 0
+
+    def stop(self):
+        """
+        Stop the runner after the current batch
+        """
+        self.stop_event.set()
+
+    def __unprocessed(self, crawls):
+        """
+        Drop crawls which already have results, e.g. replayed changes or crawls processed by a task
+        """
+        if not crawls or self.collection is None or self.processed_query is None:
+            return crawls
+
+        query = dict(self.processed_query, _id={'$in': [crawl._id for crawl in crawls]})
+        processed = {document['_id'] for document in self.collection.find(query, {'_id': 1})}
+        return [crawl for crawl in crawls if crawl._id not in processed]
+
+    def __process(self, crawls):
+        """
+        :return: The ids of the crawls which failed
+        :rtype: set
+        """
+        crawls = self.__unprocessed(crawls)
+        if not crawls:
+            return set()
+
+        results = self.process_batch(crawls)
+        failed = set() if results is None else {crawl._id for crawl, result in zip(crawls, results) if not result}
+        self.processed += len(crawls) - len(failed)
+        return failed
+
+    def drain(self):
+        """
+        Process unprocessed crawls until none are left, except the ones which failed recently
+
+        :return: The number of crawls which were fetched
+        :rtype: int
+        """
+        count = 0
+        self.feed.restart()
+
+        while not self.stop_event.is_set():
+            crawls = self.feed.next_page()
+            if not crawls:
+                break
+
+            try:
+                failed = self.__process(crawls)
+            except Exception:
+                for crawl in crawls:
+                    self.feed.finish(crawl._id, failed=True)
+                raise
+
+            for crawl in crawls:
+                self.feed.finish(crawl._id, failed=crawl._id in failed)
+            count += len(crawls)
+        return count
+
+    def __watch(self, token):
+        """
+        Open the change stream, errors of servers without change streams are raised as `ChangeStreamsUnavailable`
+        """
+        from pymongo.errors import OperationFailure
+
+        try:
+            return self.collection.watch(INSERTED_CRAWLS, resume_after=token, max_await_time_ms=int(self.max_batch_wait * 1000))
+        except OperationFailure as ex:
+            if ex.code in CHANGE_STREAMS_UNSUPPORTED:
+                raise ChangeStreamsUnavailable(str(ex)) from ex
+            raise
+
+    def follow_changes(self):
+        """
+        Process inserted crawls from the change stream until the runner is stopped.
+        Without a stored resume token, unprocessed crawls inserted before the stream was opened are drained first
+
+        :raises ChangeStreamsUnavailable: If the database does not support change streams
+        """
+        from pymongo.errors import OperationFailure
+
+        token = self.token_store.load()
+
+        try:
+            stream = self.__watch(token)
+        except OperationFailure:
+            if token is None:
+                raise
+            # The token is not part of the oplog anymore, start over and drain what was missed
+            DEFAULT_LOGGER.log('Resume token expired, draining unprocessed crawls', log_type=LogTypes.ERROR.value)
+            self.token_store.save(None)
+            token = None
+            stream = self.__watch(None)
+
+        DEFAULT_LOGGER.log('Following inserted crawls', log_type=LogTypes.INFO.value)
+
+        with stream:
+            if token is None:
+                self.drain()
+
+            changes = []
+            first_change_at = None
+            unsaved_token = None # The token of the last processed change while failed crawls are left
+            retry_at = None
+
+            def save(token):
+                nonlocal unsaved_token
+                if self.feed.failures:
+                    unsaved_token = token
+                else:
+                    self.token_store.save(token)
+                    unsaved_token = None
+
+            while not self.stop_event.is_set():
+                change = stream.try_next()
+                if change is not None:
+                    changes.append(change)
+                    first_change_at = first_change_at or time.monotonic()
+
+                full = len(changes) >= self.batch_size
+                waited = first_change_at is not None and time.monotonic() - first_change_at >= self.max_batch_wait
+                if changes and (full or waited or change is None):
+                    crawls = [self.cast(change['fullDocument']) for change in changes]
+                    failed = self.__process(crawls)
+                    for crawl in crawls:
+                        self.feed.finish(crawl._id, failed=crawl._id in failed)
+                    if failed and retry_at is None:
+                        retry_at = time.monotonic() + self.retry_failed_after
+
+                    save(changes[-1]['_id'])
+                    changes = []
+                    first_change_at = None
+
+                if not changes and retry_at is not None and time.monotonic() >= retry_at:
+                    DEFAULT_LOGGER.log('Retrying {} failed crawls'.format(self.feed.failures), log_type=LogTypes.INFO.value)
+                    self.drain()
+                    retry_at = time.monotonic() + self.retry_failed_after if self.feed.failures else None
+                    if unsaved_token is not None:
+                        save(unsaved_token)
+
+    def poll(self):
+        """
+        Process unprocessed crawls by polling until the runner is stopped, the interval
+        doubles with every empty poll and drops back to the minimum once crawls show up
+        """
+        DEFAULT_LOGGER.log('Polling for unprocessed crawls', log_type=LogTypes.INFO.value)
+        interval = self.min_poll_interval
+
+        while not self.stop_event.is_set():
+            if self.drain():
+                interval = self.min_poll_interval
+            else:
+                interval = min(interval * 2, self.max_poll_interval)
+            self.stop_event.wait(interval)
+
+    def run(self):
+        """
+        Follow the change stream, or poll if the database does not support change streams
+
+        :return: The number of processed crawls
+        :rtype: int
+        """
+        if self.collection is None:
+            self.poll()
+        else:
+            try:
+                self.follow_changes()
+            except ChangeStreamsUnavailable as ex: # e.g. a standalone server instead of a replica set
+                DEFAULT_LOGGER.log('Change streams are not available, falling back to polling', LogTypes.ERROR.value, ex)
+                self.poll()
+
+        DEFAULT_LOGGER.log('Processed {} crawls'.format(self.processed), log_type=LogTypes.INFO.value)
+        return self.processed
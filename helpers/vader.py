@@ -0,0 +1,80 @@
+"""
+This module provides the VADER analyzers used by the processor with a shared batch scoring API
+
+Every process creates its analyzers once and shares them between all processors. Celery workers
+can preload them in the master process before the worker processes are forked (PRELOAD_ANALYZERS),
+the lexicons are then loaded once and the pages holding them are shared by all worker processes.
+"""
+
+import gc
+import os
+import time
+
+from threading import Lock
+
+from common.utils.logging import DEFAULT_LOGGER, LogTypes
+
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer as VaderSentimentIntensityAnalyzer
+from VaderGerman.vaderSentimentGerman.batch import BatchScoringMixin
+from VaderGerman.vaderSentimentGerman.vaderSentimentGER import SentimentIntensityAnalyzer as SentimentIntensityAnalyzerGerman
+
+PRELOAD_ANALYZERS = os.environ.get('PRELOAD_ANALYZERS', 'false').lower() == 'true'
+
+class SentimentIntensityAnalyzer(BatchScoringMixin, VaderSentimentIntensityAnalyzer):
+    """
+    The english VADER analyzer with `polarity_scores_batch` and `iter_polarity_scores`
+    """
+
+ANALYZER_CLASSES = {'en': SentimentIntensityAnalyzer, 'de': SentimentIntensityAnalyzerGerman}
+
+_analyzers = {}
+_analyzers_lock = Lock()
+
+def get_analyzer(language):
+    """
+    Get the VADER analyzer of a language shared by this process, it is created on first use
+
+    :param str language: The language of the text
+    :return: The analyzer or None if VADER does not support the language
+    :rtype: SentimentIntensityAnalyzer
+    """
+    analyzer_class = ANALYZER_CLASSES.get(language)
+    if analyzer_class is None:
+        return None
+
+    with _analyzers_lock:
+        analyzer = _analyzers.get(language)
+        if analyzer is None:
+            analyzer = _analyzers[language] = analyzer_class()
+        return analyzer
+
+def get_analyzers():
+    """
+    :return: The shared analyzers by language
+    :rtype: dict
+    """
+    return {language: get_analyzer(language) for language in ANALYZER_CLASSES}
+
+def preload_analyzers(freeze=True):
+    """
+    Create the shared analyzers of all languages before worker processes are forked.
+    The objects which exist afterwards are moved to the permanent generation of the garbage
+    collector (Python 3.7+), so collections in the forked processes do not write to, and
+    thereby copy, the pages holding the lexicons
+
+    :param boolean freeze: Freeze all objects after loading
+    :return: The shared analyzers by language
+    :rtype: dict
+    """
+    started_at = time.perf_counter()
+    analyzers = get_analyzers()
+
+    frozen = freeze and hasattr(gc, 'freeze')
+    if frozen:
+        gc.collect()
+        gc.freeze()
+
+    DEFAULT_LOGGER.log('Preloaded VADER analyzers in {:.0f}ms (pid {}{})'.format(
+        (time.perf_counter() - started_at) * 1000, os.getpid(), ', frozen {} objects'.format(gc.get_freeze_count()) if frozen else ''
+    ), log_type=LogTypes.INFO.value)
+    return analyzers
@@ -2,16 +2,33 @@
 This module provides the processor to process gathered data using googles NLP
 """
 
+import os
 import re
 
+from google.api_core import exceptions
 from google.cloud import language
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-from VaderGerman.vaderSentimentGerman.vaderSentimentGER import SentimentIntensityAnalyzer as SentimentIntensityAnalyzerGerman
 
 from common.utils.logging import DEFAULT_LOGGER, LogTypes
 from common.utils.read_json import read_json
 
+from helpers.eligibility import ELIGIBILITY_FILTER, create_eligibility_filter
+from helpers.metrics import METRICS
+from helpers.near_duplicates import compact_result, create_near_duplicate_index, fingerprint_text
+from helpers.rate_limiter import get_rate_limiter
+from helpers.result_cache import cache_key, create_result_cache
+from helpers.vader import get_analyzer
+
 VADER_SUPPORTED_LANGUAGES = ["en", "de"]
+GOOGLE_FEATURES = ["analyze_sentiment", "analyze_entity_sentiment", "classify_text"]
+
+# Send one annotateText request per text instead of one request per feature
+COMBINED_REQUESTS = os.environ.get('GOOGLE_NLP_COMBINED_REQUESTS', 'false').lower() == 'true'
+
+# Errors of an exhausted quota, separate requests would fail the same way
+QUOTA_ERRORS = (exceptions.ResourceExhausted, exceptions.TooManyRequests)
+
+# Score near-duplicates with VADER instead of reusing the score of their representative
+NEAR_DUPLICATE_VADER = os.environ.get('NEAR_DUPLICATE_VADER', 'true').lower() == 'true'
 
 class GoogleCloudLanguageProcessor:
     """
@@ -24,15 +41,82 @@ class GoogleCloudLanguageProcessor:
     entity_types = read_json('./config/entity_types.json')
     entity_blacklist = read_json('./config/entity_blacklist.json')
 
-    def __init__(self):
+    def __init__(self, combined_requests=COMBINED_REQUESTS, rate_limiter=None, result_cache=None, near_duplicates=None, near_duplicate_vader=NEAR_DUPLICATE_VADER, eligibility_filter=None):
         """
         Establish a connection to the Google Cloud Language API Server
+
+        :param boolean combined_requests: Get all features with a single annotateText request
+        :param RateLimiter rate_limiter: Grants the permits for every request, defaults to the limiter shared by all processes
+        :param ResultCache result_cache: Reuses the results of identical texts, defaults to the cache configured by NLP_CACHE_PATH
+        :param NearDuplicateIndex near_duplicates: Reuses the results of similar texts, defaults to the index configured by NEAR_DUPLICATE_THRESHOLD
+        :param boolean near_duplicate_vader: Score near-duplicates with VADER if it supports their language
+        :param EligibilityFilter eligibility_filter: Skips requests which cannot succeed, defaults to the rules of `config/feature_support.json`.
+            Combined requests always use the rules, a single unsupported feature fails the whole annotateText request
         """
+        self.combined_requests = combined_requests
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.result_cache = result_cache if result_cache is not None else create_result_cache()
+        self.near_duplicates = near_duplicates if near_duplicates is not None else create_near_duplicate_index()
+        self.near_duplicate_vader = near_duplicate_vader
+        self.eligibility_filter = eligibility_filter or create_eligibility_filter(enabled=ELIGIBILITY_FILTER or combined_requests)
         self.client = language.LanguageServiceClient()
-        self.vader_analyzer = SentimentIntensityAnalyzer()
-        self.vader_analyzer_german = SentimentIntensityAnalyzerGerman()
+        self.vader_analyzer = get_analyzer('en')
+        self.vader_analyzer_german = get_analyzer('de')
         DEFAULT_LOGGER.log('Connected to Google Cloud Language API', log_type=LogTypes.INFO.value)
 
+    def close(self):
+        """
+        Close the gRPC channel of the Google Cloud Language client and the result cache
+        """
+        if self.result_cache is not None:
+            self.result_cache.close()
+
+        transport = getattr(self.client, 'transport', None)
+        channel = getattr(transport, 'channel', None)
+        if channel is not None:
+            channel.close()
+
+    def request(self, feature, **kwargs):
+        """
+        Send a request to the Google Cloud Language API once the rate limiter granted a permit for it
+
+        :param str feature: The client method, e.g. `classify_text`
+        :return: The response of the API
+        """
+        with METRICS.timed('quota_wait', feature=feature):
+            self.rate_limiter.acquire(feature)
+        with METRICS.timed(feature):
+            return getattr(self.client, feature)(**kwargs)
+
+    def get_vader_analyzer(self, language):
+        """
+        Get the VADER analyzer for a language
+
+        :param str language: The language of the text
+        :return: The analyzer or None if VADER does not support the language
+        :rtype: SentimentIntensityAnalyzer
+        """
+        if language not in VADER_SUPPORTED_LANGUAGES:
+            return None
+        if language == "de":
+            return self.vader_analyzer_german
+        return self.vader_analyzer
+
+    def polarity_scores_batch(self, texts, language, workers=1):
+        """
+        Score many texts of one language with VADER, see `BatchScoringMixin.polarity_scores_batch`
+
+        :param iterable texts: The texts to score
+        :param str language: The language of all texts, has to be in VADER_SUPPORTED_LANGUAGES
+        :param int workers: Processes to fan large batches out to, None uses all cores
+        :return: The VADER scores in input order
+        :rtype: list
+        """
+        analyzer = self.get_vader_analyzer(language)
+        if analyzer is None:
+            raise ValueError('VADER does not support the language {}'.format(language))
+        return analyzer.polarity_scores_batch(texts, workers=workers)
+
     def entity_filter(self, entity, keyword_string):
         """
         A filter to check if an entity should be stored or not
@@ -70,6 +154,19 @@ class GoogleCloudLanguageProcessor:
                 entities_filtered.append(entity)
         return entities_filtered
 
+    @property
+    def requests_per_process(self):
+        """
+        The expected number of Google Cloud Language requests a single `process` call sends.
+        The fallback requests after a failed annotateText request are not counted, the rate
+        limiter grants a permit for each of them
+
+        :rtype: int
+        """
+        if self.combined_requests:
+            return 1
+        return len(GOOGLE_FEATURES)
+
     def process(self, text: str, keyword_string: str, keyword_language: str):
         """
         Analyze given text and return the score returned by the API
@@ -77,9 +174,48 @@ class GoogleCloudLanguageProcessor:
         :return: Score, entities and categories
         :rtype: Tuple with 3 slots
         """
+        with METRICS.labels(language=keyword_language):
+            return self.__process(text, keyword_string, keyword_language)
+
+    def __process(self, text, keyword_string, keyword_language):
+        raw_text = text
+
         # Clean text before inserting https://stackoverflow.com/questions/43358857/how-to-remove-special-characters-except-space-from-a-file-in-python/43358965
         text = re.sub(r"[^a-zA-Z0-9]+", ' ', text)
 
+        # Identical texts were already analyzed
+        key = None
+        if self.result_cache is not None:
+            key = cache_key(text, keyword_language, keyword_string)
+            try:
+                cached = self.result_cache.get(key)
+                METRICS.increment('nlp_cache_lookups_total', help_text='Lookups of cached results', cache='result', outcome='miss' if cached is None else 'hit')
+                if cached is not None:
+                    return cached
+            except Exception as ex: # The cache is only an optimization, analyze the text if it fails
+                DEFAULT_LOGGER.log('Failed to read the result cache', LogTypes.ERROR.value, ex)
+
+        vader_analyzer = self.get_vader_analyzer(keyword_language)
+
+        # A near-duplicate of the text was already analyzed, links, mentions and emojis are ignored
+        fingerprint = None
+        namespace = (keyword_language, keyword_string.lower())
+        if self.near_duplicates is not None:
+            fingerprint = fingerprint_text(raw_text)
+            representative = self.near_duplicates.lookup(namespace, fingerprint) if fingerprint is not None else None
+            METRICS.increment('nlp_cache_lookups_total', help_text='Lookups of cached results', cache='near_duplicate', outcome='miss' if representative is None else 'hit')
+            if representative is not None:
+                return self.reuse_near_duplicate(representative, text, keyword_string, vader_analyzer)
+
+        # Skip requests which cannot succeed for this text
+        features = GOOGLE_FEATURES if vader_analyzer is None else GOOGLE_FEATURES[1:]
+        if self.eligibility_filter is not None:
+            eligible = self.eligibility_filter.eligible_features(raw_text, keyword_language, features)
+            for feature in features:
+                if feature not in eligible:
+                    METRICS.increment('nlp_requests_skipped_total', help_text='Google requests skipped by the eligibility filter', feature=feature)
+            features = eligible
+
         # Setup
         document = language.types.Document(
             content=text,
@@ -88,29 +224,152 @@ class GoogleCloudLanguageProcessor:
 
         # Requests
         DEFAULT_LOGGER.log('Analyzing text: {}'.format(text), log_type=LogTypes.INFO.value)
-        try: # Get the sentiment of the text
-            if keyword_language in VADER_SUPPORTED_LANGUAGES:
-                if keyword_language == "de":
-                    score = self.vader_analyzer_german.polarity_scores(text)["compound"]
-                else:
-                    score = self.vader_analyzer.polarity_scores(text)["compound"]
-            else:
-                score = self.client.analyze_sentiment(document=document).document_sentiment.score
+        result = None
+        errors = []
+        if self.combined_requests:
+            try:
+                result = self.process_combined(document, text, keyword_string, vader_analyzer, features=features)
+            except QUOTA_ERRORS as ex: # Do not send more requests to an exhausted quota
+                DEFAULT_LOGGER.log('Quota exhausted while annotating text of {}'.format(keyword_string), LogTypes.ERROR.value, ex)
+                errors.append('annotate_text')
+                score = self.vader_score(vader_analyzer, text, keyword_string) if vader_analyzer is not None else None
+                result = (score, [], [])
+            except Exception as ex: # If the combined request fails fall back to one request per feature
+                DEFAULT_LOGGER.log('Failed to annotate text of {}, sending separate requests'.format(keyword_string), LogTypes.ERROR.value, ex)
+
+        if result is None:
+            result = self.process_separately(document, text, keyword_string, vader_analyzer, errors=errors, features=features)
+
+        # Results with failed features are not reused, the next copy of the text retries them
+        if errors or result[0] is None:
+            return result
+
+        if key is not None:
+            try:
+                self.result_cache.set(key, *result)
+            except Exception as ex:
+                DEFAULT_LOGGER.log('Failed to write the result cache', LogTypes.ERROR.value, ex)
+
+        if fingerprint is not None:
+            try:
+                self.near_duplicates.add(namespace, fingerprint, compact_result(*result))
+            except Exception as ex:
+                DEFAULT_LOGGER.log('Failed to index the text for near-duplicates', LogTypes.ERROR.value, ex)
+
+        return result
+
+    def reuse_near_duplicate(self, representative, text, keyword_string, vader_analyzer):
+        """
+        Build the result of a near-duplicate from the result of its representative
+
+        :param tuple representative: Score, entities and categories of the representative
+        :param str text: The cleaned text of the near-duplicate
+        :param str keyword_string: The keyword which was used to get the text
+        :param SentimentIntensityAnalyzer vader_analyzer: The VADER analyzer for the language or None
+        :return: Score, entities and categories
+        :rtype: Tuple with 3 slots
+        """
+        score, entities, categories = representative
+        if vader_analyzer is not None and self.near_duplicate_vader:
+            score = self.vader_score(vader_analyzer, text, keyword_string)
+        return (score, entities, categories)
+
+    def process_combined(self, document, text, keyword_string, vader_analyzer, features=None):
+        """
+        Get score, entities and categories with a single `annotate_text` request,
+        the document sentiment is only requested if VADER does not support the language
+
+        :param Document document: The document to analyze
+        :param str text: The cleaned text of the document
+        :param str keyword_string: The keyword which was used to get the text
+        :param SentimentIntensityAnalyzer vader_analyzer: The VADER analyzer for the language or None
+        :param iterable features: The eligible features of GOOGLE_FEATURES, None requests all of them
+        :return: Score, entities and categories
+        :rtype: Tuple with 3 slots
+        """
+        features = GOOGLE_FEATURES if features is None else features
+        extract_document_sentiment = vader_analyzer is None and "analyze_sentiment" in features
+
+        response = None
+        if extract_document_sentiment or "analyze_entity_sentiment" in features or "classify_text" in features:
+            request_features = language.types.AnnotateTextRequest.Features(
+                extract_document_sentiment=extract_document_sentiment,
+                extract_entity_sentiment="analyze_entity_sentiment" in features,
+                classify_text="classify_text" in features,
+            )
+            response = self.request('annotate_text', document=document, features=request_features)
+
+        if vader_analyzer is not None:
+            score = self.vader_score(vader_analyzer, text, keyword_string)
+        else:
+            score = response.document_sentiment.score if extract_document_sentiment else None
+
+        if response is None:
+            return (score, [], [])
+
+        entities = self.filter_entities(response.entities, keyword_string)
+
+        return (score, entities, response.categories)
+
+    def process_separately(self, document, text, keyword_string, vader_analyzer, errors=None, features=None):
+        """
+        Get score, entities and categories with one request per feature
+
+        :param Document document: The document to analyze
+        :param str text: The cleaned text of the document
+        :param str keyword_string: The keyword which was used to get the text
+        :param SentimentIntensityAnalyzer vader_analyzer: The VADER analyzer for the language or None
+        :param list errors: The features whose request failed are appended to it
+        :param iterable features: The eligible features of GOOGLE_FEATURES, None requests all of them
+        :return: Score, entities and categories
+        :rtype: Tuple with 3 slots
+        """
+        errors = errors if errors is not None else []
+        features = GOOGLE_FEATURES if features is None else features
+
+        score = None
+        entities = []
+        categories = []
+
+        if vader_analyzer is not None:
+            score = self.vader_score(vader_analyzer, text, keyword_string)
+        elif "analyze_sentiment" in features:
+            try: # Get the sentiment of the text
+                score = self.request('analyze_sentiment', document=document).document_sentiment.score
+            except Exception as ex: # If it fails make document sentiment None
+                DEFAULT_LOGGER.log('Failed to get sentiment of {}'.format(keyword_string), LogTypes.ERROR.value, ex)
+                errors.append('analyze_sentiment')
+                score = None
+
+        if "analyze_entity_sentiment" in features:
+            try: # Get all entities of the text
+                entities = self.request('analyze_entity_sentiment', document=document).entities
+                entities = self.filter_entities(entities, keyword_string)
+            except Exception as ex: # If it fails make entities an empty list
+                DEFAULT_LOGGER.log('Failed to get entities of {}'.format(keyword_string), LogTypes.ERROR.value, ex)
+                errors.append('analyze_entity_sentiment')
+                entities = []
+
+        if "classify_text" in features:
+            try: # Get the categories of the text
+                categories = self.request('classify_text', document=document).categories
+            except Exception as ex: # If it fails make categories an empty list
+                DEFAULT_LOGGER.log('Failed to get categories for {}'.format(keyword_string), LogTypes.ERROR.value, ex)
+                errors.append('classify_text')
+                categories = []
+
+        return (score, entities, categories)
+
+    def vader_score(self, vader_analyzer, text, keyword_string):
+        """
+        Get the compound VADER score of a text
+
+        :return: The score or None if scoring failed
+        :rtype: float
+        """
+        try:
+            with METRICS.timed('vader'):
+                return vader_analyzer.polarity_scores(text)["compound"]
         except Exception as ex: # If it fails make document sentiment None
             DEFAULT_LOGGER.log('Failed to get sentiment of {}'.format(keyword_string), LogTypes.ERROR.value, ex)
-            score = None
-
-        try: # Get all entities of the text
-            entities = self.client.analyze_entity_sentiment(document=document).entities
-            entities = self.filter_entities(entities, keyword_string)
-        except Exception as ex: # If it fails make entities an empty list
-            DEFAULT_LOGGER.log('Failed to get entities of {}'.format(keyword_string), LogTypes.ERROR.value, ex)
-            entities = []
-
-        try: # Get the categories of the text
-            categories = self.client.classify_text(document=document).categories
-        except Exception as ex: # If it fails make categories an empty list
-            DEFAULT_LOGGER.log('Failed to get categories for {}'.format(keyword_string), LogTypes.ERROR.value, ex)
-            categories = []
-        
-        return (score, entities, categories)
+            return None
@@ -4,19 +4,32 @@ Accepts input commands and runs scripts accordingly
 
 import sys
 
-from controller import Controller
+from helpers.metrics import start_exporters
+
+def run(mode, argv=None):
+    # Export metrics if METRICS_PORT or METRICS_LOG_INTERVAL are set
+    start_exporters()
+
+    # Offline modes neither need mongo nor Google
+    if mode == 'score-file':
+        from helpers.file_scoring import main
+        return main(argv)
 
-def run(mode):
     # Create a new controller instance
+    from controller import Controller
     controller = Controller()
 
     # Run the specified mode
     if mode == 'full':
         return controller.run_full()
+    elif mode == 'full-async':
+        return controller.run_full_async()
+    elif mode == 'stream':
+        return controller.run_stream()
     else:
         return print('Please enter a valid mode')
 
 
 if __name__ == '__main__':
     mode = sys.argv[1]
-    run(mode)
+    run(mode, sys.argv[2:])
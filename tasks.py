@@ -5,16 +5,45 @@ It also runs all the setup required for celery to function.
 import os
 
 from celery import Celery
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown
 from common.utils.logging import DEFAULT_LOGGER, LogTypes
 from common.mongo.data_types.crawling.crawl_result import CrawlResult
 from common.celery import queues
 
+from helpers.controller_pool import CONTROLLER_POOL
 from helpers.decorators import inject_controller
+from helpers.metrics import start_exporters
+from helpers.vader import PRELOAD_ANALYZERS, preload_analyzers
 
 app = Celery('tasks',
     broker = os.environ['BROKER_URL']
 )
 
+@worker_init.connect
+def preload(**kwargs):
+    """
+    Load the VADER analyzers in the master process before it forks the worker processes,
+    with PRELOAD_ANALYZERS=true all worker processes share them instead of loading their own
+    """
+    if PRELOAD_ANALYZERS:
+        preload_analyzers()
+
+@worker_process_init.connect
+def open_controller(**kwargs):
+    """
+    Create the controller of a worker process once, right after the process was started.
+    Worker processes would compete for the metrics port, so they only log metric snapshots
+    """
+    CONTROLLER_POOL.open()
+    start_exporters(http=False)
+
+@worker_process_shutdown.connect
+def close_controller(**kwargs):
+    """
+    Close the connections of the worker process controller before the process exits
+    """
+    CONTROLLER_POOL.close()
+
 @app.task(name='process-crawl', queue=queues['processor'])
 @inject_controller
 def process_crawl(crawl_dict, controller=None):
@@ -35,3 +64,35 @@ def process_crawl(crawl_dict, controller=None):
     result = controller.run_single_crawl(crawl)
 
     return True if result else False
+
+@app.task(name='process-crawl-batch', queue=queues['processor'])
+@inject_controller
+def process_crawl_batch(crawl_dicts, controller=None):
+    """
+    Process a batch of crawl results, see `helpers.batching.dispatch_crawls` to send them
+
+    :param list crawl_dicts: The dictonaries of the crawl results
+    :param Controller controller: The controller is injected by @inject_controller
+    :return: For each crawl dict if it was processed, None if it was not a valid crawl result
+    :rtype: list
+    """
+    crawls = []
+    for crawl_dict in crawl_dicts:
+        try:
+            crawls.append(CrawlResult.from_dict(crawl_dict))
+        except Exception as ex:
+            DEFAULT_LOGGER.log('Received invalid crawl to process', LogTypes.ERROR.value, ex)
+            crawls.append(None)
+
+    valid = [index for index, crawl in enumerate(crawls) if crawl]
+    if len(valid) < len(crawls):
+        DEFAULT_LOGGER.log('Received {} empty or invalid crawls to process'.format(len(crawls) - len(valid)), log_type=LogTypes.ERROR.value)
+
+    DEFAULT_LOGGER.log('Received batch processing request for {} crawls'.format(len(valid)), log_type=LogTypes.INFO.value)
+
+    processed = controller.run_crawl_batch([crawls[index] for index in valid])
+
+    results = [None] * len(crawls)
+    for index, result in zip(valid, processed):
+        results[index] = result
+    return results
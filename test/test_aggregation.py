@@ -0,0 +1,54 @@
+"""
+This module tests the aggregation of entities and categories
+"""
+
+import unittest
+
+from collections import namedtuple
+
+from helpers.aggregation import MAX, MEAN, Aggregator, aggregate_categories, aggregate_entities
+
+Sentiment = namedtuple('Sentiment', ['score'])
+Entity = namedtuple('Entity', ['name', 'sentiment'])
+Category = namedtuple('Category', ['name', 'confidence'])
+
+class TestAggregation(unittest.TestCase):
+    def test_entities_mean(self):
+        entities = [Entity("Berlin", Sentiment(0.5)), Entity("Hamburg", Sentiment(0.1)), Entity("berlin ", Sentiment(-0.1))]
+
+        result = aggregate_entities(entities)
+
+        self.assertEqual(len(result), 2)
+        self.assertEqual(result[0]["value"], "Berlin", "The first spelling should be kept")
+        self.assertAlmostEqual(result[0]["score"], 0.2)
+        self.assertEqual(result[0]["count"], 2)
+        self.assertEqual(result[1], {"value": "Hamburg", "score": 0.1, "count": 1})
+
+    def test_entities_max(self):
+        entities = [Entity("Berlin", Sentiment(-0.5)), Entity("Berlin", Sentiment(0.3))]
+        self.assertEqual(aggregate_entities(entities, MAX), [{"value": "Berlin", "score": 0.3, "count": 2}])
+
+    def test_categories(self):
+        categories = [Category("/News", 0.6), Category("/News", 0.9), Category("/Sports", 0.7)]
+
+        result = aggregate_categories(categories)
+
+        self.assertEqual(result, [
+            {"value": "/News", "confidence": 0.9, "count": 2},
+            {"value": "/Sports", "confidence": 0.7, "count": 1},
+        ])
+
+    def test_empty(self):
+        self.assertEqual(aggregate_entities([]), [])
+        self.assertEqual(aggregate_categories([]), [])
+
+    def test_add_formatted_weights_counts(self):
+        aggregator = Aggregator("score", MEAN)
+        aggregator.add_formatted([{"value": "Berlin", "score": 0.5, "count": 3}])
+        aggregator.add_formatted([{"value": "Berlin", "score": -0.5, "count": 1}])
+
+        self.assertEqual(aggregator.formatted(), [{"value": "Berlin", "score": 0.25, "count": 4}])
+
+    def test_unknown_reduction(self):
+        with self.assertRaises(ValueError):
+            Aggregator("score", "median")
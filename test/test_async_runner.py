@@ -0,0 +1,100 @@
+"""
+This module tests the asyncio crawl runner
+"""
+
+import time
+import asyncio
+import unittest
+
+from threading import Lock
+
+from helpers.async_runner import AsyncCrawlRunner
+
+class CrawlMock():
+    """
+    This class is a simplified version of the crawl result class used by the common library
+    """
+    def __init__(self, _id):
+        self._id = _id
+
+class CrawlStoreMock():
+    """
+    This class is a mock version of the crawl collection, crawls stay unprocessed until they were processed
+    """
+    def __init__(self, count, failing=()):
+        self.unprocessed = [CrawlMock(i) for i in range(count)]
+        self.failing = set(failing)
+        self.processed = []
+        self.running = 0
+        self.max_running = 0
+        self.lock = Lock()
+
+    def fetch(self, limit):
+        with self.lock:
+            return list(self.unprocessed[:limit])
+
+    def process(self, crawl):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+
+        time.sleep(0.001)
+
+        with self.lock:
+            self.running -= 1
+            if crawl._id in self.failing:
+                raise Exception("processing failed")
+            self.unprocessed.remove(crawl)
+            self.processed.append(crawl._id)
+
+class TestAsyncCrawlRunner(unittest.TestCase):
+    """
+    Testing Setup
+    """
+    def test_all_crawls_processed_once(self):
+        store = CrawlStoreMock(100)
+        runner = AsyncCrawlRunner(store.fetch, store.process, concurrency=8, page_size=20)
+
+        processed = asyncio.run(runner.run())
+
+        self.assertEqual(processed, 100)
+        self.assertEqual(sorted(store.processed), list(range(100)))
+
+    def test_concurrency_bounded(self):
+        store = CrawlStoreMock(50)
+        runner = AsyncCrawlRunner(store.fetch, store.process, concurrency=4, page_size=10)
+
+        asyncio.run(runner.run())
+
+        self.assertLessEqual(store.max_running, 4)
+
+    def test_failing_crawls_not_retried(self):
+        store = CrawlStoreMock(30, failing=[3, 7])
+        runner = AsyncCrawlRunner(store.fetch, store.process, concurrency=4, page_size=10)
+
+        processed = asyncio.run(runner.run())
+
+        self.assertEqual(processed, 28)
+        self.assertEqual(runner.failed, 2)
+
+    def test_failing_crawls_at_head_do_not_stop_the_run(self):
+        store = CrawlStoreMock(100, failing=range(5))
+        runner = AsyncCrawlRunner(store.fetch, store.process, concurrency=4, page_size=5)
+
+        processed = asyncio.run(runner.run())
+
+        self.assertEqual(processed, 95)
+        self.assertEqual(runner.failed, 5)
+        self.assertEqual(sorted(store.processed), list(range(5, 100)))
+
+    def test_processed_crawls_still_unprocessed_do_not_stop_the_run(self):
+        store = CrawlStoreMock(100)
+
+        def process(crawl):
+            if crawl._id >= 5: # e.g. written without a score, they still match the query
+                store.process(crawl)
+
+        runner = AsyncCrawlRunner(store.fetch, process, concurrency=4, page_size=5)
+
+        self.assertEqual(asyncio.run(runner.run()), 100)
+        self.assertEqual(sorted(store.processed), list(range(5, 100)))
@@ -0,0 +1,44 @@
+"""
+This module tests the batched dispatch of crawls
+"""
+
+import unittest
+
+from unittest.mock import MagicMock
+
+from helpers.batching import TASK_PROCESS_CRAWL, TASK_PROCESS_CRAWL_BATCH, chunk_crawls, dispatch_crawls
+
+class TestBatching(unittest.TestCase):
+    def test_chunk_crawls(self):
+        self.assertEqual(list(chunk_crawls(range(5), 2)), [[0, 1], [2, 3], [4]])
+
+    def test_chunk_crawls_lazy(self):
+        def stream():
+            yield 1
+            yield 2
+            raise AssertionError("The stream should not be consumed further")
+
+        self.assertEqual(next(chunk_crawls(stream(), 2)), [1, 2])
+
+    def test_chunk_crawls_invalid_size(self):
+        with self.assertRaises(ValueError):
+            list(chunk_crawls([1], 0))
+
+    def test_dispatch_batches(self):
+        app = MagicMock()
+
+        dispatch_crawls(app, [{"id": i} for i in range(5)], batch_size=2)
+
+        names = [call[0][0] for call in app.send_task.call_args_list]
+        sizes = [len(call[1]["args"][0]) for call in app.send_task.call_args_list]
+        self.assertEqual(names, [TASK_PROCESS_CRAWL_BATCH] * 3)
+        self.assertEqual(sizes, [2, 2, 1])
+
+    def test_dispatch_single(self):
+        app = MagicMock()
+
+        dispatch_crawls(app, [{"id": i} for i in range(3)], batch_size=1)
+
+        names = [call[0][0] for call in app.send_task.call_args_list]
+        self.assertEqual(names, [TASK_PROCESS_CRAWL] * 3)
+        self.assertEqual(app.send_task.call_args_list[0][1]["args"], [{"id": 0}])
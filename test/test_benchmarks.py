@@ -0,0 +1,24 @@
+"""
+This module tests the regression check of the benchmark suite
+"""
+
+import unittest
+
+from benchmarks.suite import CASES, compare
+
+class TestBenchmarkSuite(unittest.TestCase):
+    def test_compare(self):
+        rows = compare({"fast": 1.0, "slow": 1.5, "new": 2.0}, {"fast": 1.1, "slow": 1.0}, threshold=0.2)
+
+        self.assertEqual(rows, [
+            ("fast", 1.0, 1.1, False),
+            ("slow", 1.5, 1.0, True),
+            ("new", 2.0, None, False),
+        ])
+
+    def test_compare_within_threshold(self):
+        self.assertFalse(compare({"case": 1.19}, {"case": 1.0}, threshold=0.2)[0][3])
+
+    def test_cases_registered(self):
+        for name in ["lexicon_load_de_cold", "sentitext_de_long", "polarity_scores_en_short", "processor_process_google", "controller_process_crawl"]:
+            self.assertIn(name, CASES)
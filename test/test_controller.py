@@ -0,0 +1,73 @@
+"""
+This module tests how the controller processes batches of crawls
+"""
+
+import unittest
+
+from unittest.mock import MagicMock
+
+from controller import Controller
+from helpers.crawl_writer import WriteReport
+
+class Crawl():
+    """
+    This class is a simplified version of the crawl result class used by the common library
+    """
+    def __init__(self, _id, text='some text'):
+        self._id = _id
+        self.text = text
+        self.keyword_ref = 'keyword'
+        self.keyword_string = 'keyword'
+
+class TestRunCrawlBatch(unittest.TestCase):
+    """
+    Testing Setup
+    """
+    def setUp(self):
+        # The controller is built without connecting to mongo or Google
+        self.controller = Controller.__new__(Controller)
+        self.controller.processor = MagicMock()
+        self.controller.processor.process.side_effect = self.process
+        self.controller.keyword_cache = MagicMock()
+        self.controller.keyword_cache.get.return_value = MagicMock(language='de')
+        self.controller.result_writer = MagicMock()
+        self.controller.result_writer.write_many.side_effect = lambda results: [WriteReport(result[0], None) for result in results]
+
+    def process(self, text, keyword_string, language):
+        if text == 'failing':
+            raise Exception('analysis failed')
+        if text == 'unscored':
+            return (None, [], [])
+        return (0.5, [], [])
+
+    def test_all_processed(self):
+        crawls = [Crawl(i) for i in range(3)]
+
+        self.assertEqual(self.controller.run_crawl_batch(crawls, analysis_workers=2), [True, True, True])
+        self.controller.keyword_cache.prefetch.assert_called_once_with({'keyword'})
+        self.assertEqual(self.controller.result_writer.write_many.call_count, 1, "All results should be written at once")
+
+    def test_failed_analysis_does_not_fail_batch(self):
+        crawls = [Crawl(1), Crawl(2, 'failing'), Crawl(3)]
+
+        self.assertEqual(self.controller.run_crawl_batch(crawls), [True, False, True])
+        written = [result[0] for result in self.controller.result_writer.write_many.call_args[0][0]]
+        self.assertEqual(written, [1, 3], "The failed crawl should stay unprocessed")
+
+    def test_failed_write_reported(self):
+        self.controller.result_writer.write_many.side_effect = lambda results: [
+            WriteReport(result[0], 'write failed' if result[0] == 2 else None) for result in results
+        ]
+
+        self.assertEqual(self.controller.run_crawl_batch([Crawl(1), Crawl(2), Crawl(3)]), [True, False, True])
+
+    def test_unscored_crawl_written(self):
+        self.assertEqual(self.controller.run_crawl_batch([Crawl(1, 'unscored')]), [False])
+        self.assertEqual(self.controller.result_writer.write_many.call_count, 1)
+
+    def test_nothing_analyzed(self):
+        self.assertEqual(self.controller.run_crawl_batch([Crawl(1, 'failing')]), [False])
+        self.assertFalse(self.controller.result_writer.write_many.called)
+
+    def test_empty_batch(self):
+        self.assertEqual(self.controller.run_crawl_batch([]), [])
@@ -0,0 +1,66 @@
+"""
+This module tests the lifecycle of the worker controller pool
+"""
+
+import unittest
+
+from helpers.controller_pool import ControllerPool
+
+class ControllerMock():
+    """
+    This class is a mock version of the controller which only tracks its lifecycle
+    """
+    def __init__(self):
+        self.healthy = True
+        self.closed = False
+
+    def is_healthy(self):
+        return self.healthy
+
+    def close(self):
+        self.closed = True
+
+class TestControllerPool(unittest.TestCase):
+    """
+    Testing Setup
+    """
+    def setUp(self):
+        self.pool = ControllerPool(factory=ControllerMock, health_check_interval=0)
+
+    def test_controller_reused(self):
+        controller = self.pool.acquire()
+        self.assertIs(self.pool.acquire(), controller, "The controller should have been reused")
+
+    def test_open_creates_controller(self):
+        controller = self.pool.open()
+        self.assertIs(self.pool.acquire(), controller)
+
+    def test_unhealthy_controller_rebuilt(self):
+        controller = self.pool.acquire()
+        controller.healthy = False
+
+        new_controller = self.pool.acquire()
+
+        self.assertIsNot(new_controller, controller, "The controller should have been rebuilt")
+        self.assertTrue(controller.closed, "The broken controller should have been closed")
+
+    def test_release_failed_keeps_healthy_controller(self):
+        controller = self.pool.acquire()
+        self.pool.release_failed()
+        self.assertIs(self.pool.acquire(), controller)
+
+    def test_release_failed_drops_broken_controller(self):
+        controller = self.pool.acquire()
+        controller.healthy = False
+
+        self.pool.release_failed()
+
+        self.assertTrue(controller.closed)
+        self.assertIsNone(self.pool.controller)
+
+    def test_close(self):
+        controller = self.pool.acquire()
+        self.pool.close()
+
+        self.assertTrue(controller.closed)
+        self.assertIsNone(self.pool.controller)
@@ -0,0 +1,97 @@
+"""
+This module tests the pages of unprocessed crawls handed out to the engines
+"""
+
+import unittest
+
+from unittest.mock import patch
+
+from helpers.crawl_feed import CrawlFeed
+
+class CrawlMock():
+    """
+    This class is a simplified version of the crawl result class used by the common library
+    """
+    def __init__(self, _id):
+        self._id = _id
+
+class CrawlStoreMock():
+    """
+    This class is a mock version of the crawl collection, crawls stay unprocessed until they were processed
+    """
+    def __init__(self, count):
+        self.unprocessed = [CrawlMock(i) for i in range(count)]
+        self.limits = []
+
+    def fetch(self, limit):
+        self.limits.append(limit)
+        return list(self.unprocessed[:limit])
+
+    def process(self, crawl_id):
+        self.unprocessed = [crawl for crawl in self.unprocessed if crawl._id != crawl_id]
+
+def ids(crawls):
+    return [crawl._id for crawl in crawls]
+
+class TestCrawlFeed(unittest.TestCase):
+    """
+    Testing Setup
+    """
+    def setUp(self):
+        self.store = CrawlStoreMock(20)
+        self.feed = CrawlFeed(self.store.fetch, 5)
+
+    def test_running_crawls_excluded(self):
+        self.assertEqual(ids(self.feed.next_page()), [0, 1, 2, 3, 4])
+        self.assertEqual(ids(self.feed.next_page()), [5, 6, 7, 8, 9])
+        self.assertEqual(self.store.limits, [5, 10])
+        self.assertEqual(self.feed.in_flight, 10)
+
+    def test_failed_crawls_excluded(self):
+        for crawl in self.feed.next_page():
+            self.feed.finish(crawl._id, failed=True)
+
+        self.assertEqual(ids(self.feed.next_page()), [5, 6, 7, 8, 9])
+        self.assertEqual(self.feed.in_flight, 5)
+
+    def test_processed_crawls(self):
+        for crawl in self.feed.next_page():
+            self.store.process(crawl._id)
+            self.feed.finish(crawl._id)
+
+        self.assertEqual(ids(self.feed.next_page()), [5, 6, 7, 8, 9])
+        self.assertEqual(self.store.limits, [5, 10])
+
+    def test_finished_crawls_still_unprocessed_excluded(self):
+        """
+        Crawls which finished but still match the unprocessed query, e.g. written without a score
+        """
+        for _ in range(3):
+            for crawl in self.feed.next_page():
+                self.feed.finish(crawl._id)
+
+        self.assertEqual(ids(self.feed.next_page()), [15, 16, 17, 18, 19])
+        self.assertEqual(self.feed.next_page(), [])
+        self.assertEqual(self.store.limits, [5, 10, 15, 20, 25])
+
+    def test_end_of_backlog(self):
+        while True:
+            crawls = self.feed.next_page()
+            if not crawls:
+                break
+            for crawl in crawls:
+                if crawl._id % 2:
+                    self.store.process(crawl._id)
+                self.feed.finish(crawl._id, failed=crawl._id % 2 == 0)
+
+        self.assertEqual(self.feed.in_flight, 0)
+        self.assertEqual(len(self.feed.failed), 10)
+
+    def test_restart_retries_failed_crawls_after_interval(self):
+        feed = CrawlFeed(self.store.fetch, 5, retry_failed_after=60)
+        for crawl in feed.next_page():
+            feed.finish(crawl._id, failed=True)
+
+        with patch("helpers.crawl_feed.time.monotonic", return_value=10 ** 9):
+            feed.restart()
+            self.assertEqual(ids(feed.next_page()), [0, 1, 2, 3, 4])
@@ -0,0 +1,91 @@
+"""
+This module tests writing processing results to the crawl collection
+"""
+
+import unittest
+
+from unittest.mock import MagicMock, patch
+
+from bson import ObjectId
+from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError
+
+from common.mongo.controller import MongoController
+
+from helpers.crawl_writer import CRAWLS_COLLECTION, FIELD_ENTITIES, PROCESSED_QUERY, CrawlResultWriter, build_update
+
+class TestCrawlResultWriter(unittest.TestCase):
+    """
+    Testing Setup
+    """
+    def setUp(self):
+        self.collection = MagicMock()
+        self.writer = CrawlResultWriter(self.collection)
+
+        self.entities = [{"value": "test", "score": 0.5, "count": 1}]
+        self.categories = [{"value": "/test", "confidence": 0.9, "count": 1}]
+
+    def test_build_update(self):
+        update = build_update(0.5, self.entities, self.categories)
+        self.assertEqual(update, {"$set": {"entities": self.entities, "categories": self.categories, "score": 0.5}})
+
+    def test_build_update_without_score(self):
+        update = build_update(None, self.entities, self.categories)
+        self.assertEqual(update, {"$set": {"entities": self.entities, "categories": self.categories}})
+
+    def test_processed_query(self):
+        self.assertIn(FIELD_ENTITIES, build_update(None, [], [])["$set"])
+        self.assertEqual(PROCESSED_QUERY, {"entities": {"$exists": True}})
+
+    def test_write_single_update(self):
+        self.writer.write("id", 0.5, self.entities, self.categories)
+
+        self.assertEqual(self.collection.update_one.call_count, 1)
+        self.collection.update_one.assert_called_with({"_id": "id"}, build_update(0.5, self.entities, self.categories))
+
+    def test_write_many_single_bulk_write(self):
+        reports = self.writer.write_many([("a", 0.5, [], []), ("b", None, [], [])])
+
+        self.assertEqual(self.collection.bulk_write.call_count, 1)
+        self.assertFalse(self.collection.bulk_write.call_args[1]["ordered"])
+        self.assertEqual([report.crawl_id for report in reports], ["a", "b"])
+        self.assertTrue(all(report.error is None for report in reports))
+
+    def test_write_many_reports_errors(self):
+        self.collection.bulk_write.side_effect = BulkWriteError({
+            "writeErrors": [{"index": 1, "errmsg": "document too large"}],
+            "writeConcernErrors": [],
+        })
+
+        reports = self.writer.write_many([("a", 0.5, [], []), ("b", 0.1, [], []), ("c", 0.2, [], [])])
+
+        self.assertEqual([report.error for report in reports], [None, "document too large", None])
+
+    def test_write_many_empty(self):
+        self.assertEqual(self.writer.write_many([]), [])
+        self.assertFalse(self.collection.bulk_write.called)
+
+@unittest.skipUnless(hasattr(MongoController, "set_score_crawl"), "the common library is not installed")
+class TestCommonLibrarySchema(unittest.TestCase):
+    """
+    The single update sets the same fields of the same collection as the MongoController of the common library
+    """
+    def test_update_matches_mongo_controller(self):
+        entities = [{"value": "test", "score": 0.5, "count": 1}]
+        categories = [{"value": "/test", "confidence": 0.9, "count": 1}]
+        crawl_id = ObjectId()
+
+        with patch.object(Collection, "update_one", autospec=True) as update_one:
+            mongo_controller = MongoController("mongodb://localhost:27017", "test")
+            mongo_controller.set_entities_crawl(crawl_id, entities)
+            mongo_controller.set_categories_crawl(crawl_id, categories)
+            mongo_controller.set_score_crawl(crawl_id, 0.5)
+
+        self.assertEqual(update_one.call_count, 3, "The controller should set every result with one update_one")
+        expected = {}
+        for call in update_one.call_args_list:
+            collection, query, update = call[0][:3]
+            self.assertEqual(collection.name, CRAWLS_COLLECTION)
+            self.assertEqual(query, {"_id": crawl_id})
+            expected.update(update["$set"])
+        self.assertEqual(build_update(0.5, entities, categories), {"$set": expected})
@@ -0,0 +1,50 @@
+"""
+This module tests the eligibility pre-filter
+"""
+
+import unittest
+
+from common.utils.read_json import read_json
+
+from helpers.eligibility import EligibilityFilter, count_tokens
+
+class TestEligibilityFilter(unittest.TestCase):
+    """
+    Testing Setup
+    """
+    def setUp(self):
+        self.eligibility_filter = EligibilityFilter({
+            "analyze_entity_sentiment": {"languages": ["en", "es"], "min_tokens": 1},
+            "classify_text": {"languages": ["en"], "min_tokens": 20},
+        })
+
+    def test_count_tokens_ignores_links(self):
+        self.assertEqual(count_tokens("great show! https://t.co/abc123 @someone www.example.com"), 2)
+        self.assertEqual(count_tokens("😍😍 !!!"), 0)
+
+    def test_language_support(self):
+        self.assertTrue(self.eligibility_filter.is_eligible("analyze_entity_sentiment", 3, "es"))
+        self.assertFalse(self.eligibility_filter.is_eligible("analyze_entity_sentiment", 3, "de"))
+        self.assertTrue(self.eligibility_filter.is_eligible("analyze_entity_sentiment", 3, None), "Unknown languages are left to Google")
+
+    def test_min_tokens(self):
+        self.assertFalse(self.eligibility_filter.is_eligible("classify_text", 19, "en"))
+        self.assertTrue(self.eligibility_filter.is_eligible("classify_text", 20, "en"))
+        self.assertFalse(self.eligibility_filter.is_eligible("analyze_entity_sentiment", 0, "en"))
+
+    def test_feature_without_rule(self):
+        self.assertTrue(self.eligibility_filter.is_eligible("analyze_sentiment", 0, "xx"))
+
+    def test_eligible_features_counts_saved(self):
+        features = ["analyze_sentiment", "analyze_entity_sentiment", "classify_text"]
+
+        eligible = self.eligibility_filter.eligible_features("a short text", "de", features)
+        self.eligibility_filter.eligible_features("a short text", "en", features)
+
+        self.assertEqual(eligible, {"analyze_sentiment"})
+        self.assertEqual(self.eligibility_filter.stats, {"analyze_entity_sentiment": 1, "classify_text": 2})
+
+    def test_config(self):
+        rules = read_json('./config/feature_support.json')
+        self.assertEqual(set(rules), {"analyze_sentiment", "analyze_entity_sentiment", "classify_text"})
+        self.assertTrue(all("min_tokens" in rule and "languages" in rule for rule in rules.values()))
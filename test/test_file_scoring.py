@@ -0,0 +1,139 @@
+"""
+This module tests the offline scoring of files
+"""
+
+import csv
+import json
+import os
+import tempfile
+import unittest
+
+from helpers.file_scoring import SCORE_COLUMNS, RecordWriter, create_analyzers, detect_format, iter_scored, record_item, score_file
+
+RECORDS = [
+    {"id": "1", "text": "Das ist wirklich toll!", "language": "de"},
+    {"id": "2", "text": "This is really bad.", "language": "en"},
+    {"id": "3", "text": "Ce n'est pas mal", "language": "fr"},
+    {"id": "4", "text": "Das ist schlecht", "language": ""},
+    {"id": "5", "text": "", "language": "en"},
+]
+
+class TestFileScoring(unittest.TestCase):
+    """
+    Testing Setup
+    """
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.analyzers = create_analyzers()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def expected_compound(self, record, default_language="de"):
+        analyzer = self.analyzers.get(record["language"] or default_language)
+        if analyzer is None or not record["text"]:
+            return None
+        return analyzer.polarity_scores(record["text"])["compound"]
+
+    def write_jsonl(self, name):
+        with open(self.path(name), "w", encoding="utf-8") as file:
+            for record in RECORDS:
+                file.write(json.dumps(record) + "\n")
+
+    def test_detect_format(self):
+        self.assertEqual(detect_format("data.JSONL"), "jsonl")
+        self.assertEqual(detect_format("data.tsv"), "tsv")
+        self.assertEqual(detect_format("data.txt", "csv"), "csv")
+        with self.assertRaises(ValueError):
+            detect_format("data.txt")
+
+    def test_iter_scored_routes_languages(self):
+        results = list(iter_scored(iter(RECORDS), default_language="de", workers=1, chunksize=2))
+
+        self.assertEqual([record["id"] for record, _ in results], ["1", "2", "3", "4", "5"])
+        for record, scores in results:
+            compound = scores["compound"] if scores is not None else None
+            self.assertEqual(compound, self.expected_compound(record))
+
+    def test_iter_scored_pool_matches_single_process(self):
+        records = RECORDS * 20
+        single = list(iter_scored(records, default_language="de", workers=1))
+        pooled = list(iter_scored(records, default_language="de", workers=2, chunksize=7))
+        self.assertEqual(pooled, single)
+
+    def test_record_item(self):
+        self.assertEqual(record_item({"text": "gut", "language": ""}, default_language="de"), ("de", "gut"))
+        self.assertEqual(record_item({"language": "en"}), ("en", None))
+        self.assertIsNone(record_item({"text": 5, "language": "en"}))
+        self.assertIsNone(record_item({"text": "gut", "language": ["de"]}))
+        self.assertIsNone(record_item(["gut", "de"]))
+        self.assertIsNone(record_item(None))
+
+    def test_iter_scored_pool_skips_malformed(self):
+        records = [RECORDS[0], {"text": 5}, ["de"], None, RECORDS[1]] * 5
+        single = list(iter_scored(records, workers=1))
+        pooled = list(iter_scored(records, workers=2, chunksize=3))
+
+        self.assertEqual(pooled, single)
+        self.assertEqual([scores is None for _, scores in single[:5]], [False, True, True, True, False])
+
+    def test_score_jsonl_malformed_records(self):
+        with open(self.path("input.jsonl"), "w", encoding="utf-8") as file:
+            file.write(json.dumps(RECORDS[0]) + "\n")
+            file.write('{"id": "6", "text": 5, "language": "en"}\n')
+            file.write('{"id": "7", "text": "gut", "language": ["de"]}\n')
+            file.write('["Das ist toll", "de"]\n')
+            file.write('{"id": "8", "text": \n')
+            file.write(json.dumps(RECORDS[1]) + "\n")
+
+        stats = score_file(self.path("input.jsonl"), self.path("output.jsonl"), workers=1)
+
+        with open(self.path("output.jsonl"), encoding="utf-8") as file:
+            output = [json.loads(line) for line in file]
+        self.assertEqual(stats["documents"], 6)
+        self.assertEqual(stats["unscored"], 4)
+        self.assertEqual(stats["skipped"], 2)
+        self.assertEqual([record["id"] for record in output], ["1", "6", "7", "2"])
+        self.assertIsNone(output[1]["vader_compound"])
+        self.assertIsNotNone(output[3]["vader_compound"])
+
+    def test_csv_writer_drops_later_columns(self):
+        with open(self.path("output.csv"), "w", newline="", encoding="utf-8") as file:
+            writer = RecordWriter(file, "csv")
+            writer.write({"id": "1"}, None)
+            writer.write({"id": "2", "author": "a", "url": "b"}, None)
+            writer.write({"id": "3", "author": "c"}, None)
+
+        self.assertEqual(writer.dropped_columns, ["author", "url"])
+        with open(self.path("output.csv"), newline="", encoding="utf-8") as file:
+            self.assertEqual(next(csv.reader(file)), ["id"] + SCORE_COLUMNS)
+
+    def test_score_jsonl(self):
+        self.write_jsonl("input.jsonl")
+
+        stats = score_file(self.path("input.jsonl"), self.path("output.jsonl"), workers=1, default_language="de")
+
+        with open(self.path("output.jsonl"), encoding="utf-8") as file:
+            output = [json.loads(line) for line in file]
+        self.assertEqual(stats["documents"], 5)
+        self.assertEqual(stats["unscored"], 2)
+        self.assertEqual([record["vader_compound"] for record in output], [self.expected_compound(record) for record in RECORDS])
+        self.assertEqual(output[0]["id"], "1")
+
+    def test_score_csv_to_tsv(self):
+        with open(self.path("input.csv"), "w", newline="", encoding="utf-8") as file:
+            writer = csv.DictWriter(file, ["id", "text", "language"])
+            writer.writeheader()
+            writer.writerows(RECORDS)
+
+        score_file(self.path("input.csv"), self.path("output.tsv"), workers=1)
+
+        with open(self.path("output.tsv"), newline="", encoding="utf-8") as file:
+            reader = csv.DictReader(file, delimiter="\t")
+            output = list(reader)
+        self.assertEqual(reader.fieldnames, ["id", "text", "language"] + SCORE_COLUMNS)
+        self.assertEqual(float(output[0]["vader_compound"]), self.expected_compound(RECORDS[0]))
+        self.assertEqual(output[3]["vader_compound"], "", "Records without a language should not be scored without a default")
@@ -0,0 +1,127 @@
+"""
+This module tests the keyword cache
+"""
+
+import unittest
+
+from unittest.mock import MagicMock, patch
+
+from bson import ObjectId
+from pymongo.collection import Collection
+
+from common.mongo.controller import MongoController
+
+from helpers.keyword_cache import KEYWORDS_COLLECTION, KeywordCache, KeywordLoader
+
+class Keyword():
+    """
+    This class is a simplified version of the keyword class used by the common library
+    """
+    def __init__(self, _id, keyword_string, language):
+        self._id = _id
+        self.keyword_string = keyword_string
+        self.language = language
+
+class TestKeywordCache(unittest.TestCase):
+    """
+    Testing Setup
+    """
+    def setUp(self):
+        self.keywords = {i: Keyword(i, "keyword {}".format(i), "en") for i in range(10)}
+        self.load_one = MagicMock(side_effect=self.keywords.get)
+        self.load_many = MagicMock(side_effect=lambda ids: {i: self.keywords[i] for i in ids if i in self.keywords})
+        self.cache = KeywordCache(self.load_one, self.load_many, maxsize=5, ttl=60)
+
+    def test_get_cached(self):
+        self.assertEqual(self.cache.get(1), self.keywords[1])
+        self.assertEqual(self.cache.get(1), self.keywords[1])
+
+        self.assertEqual(self.load_one.call_count, 1)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_missing_keyword_not_cached(self):
+        self.assertIsNone(self.cache.get(42))
+        self.assertIsNone(self.cache.get(42))
+        self.assertEqual(self.load_one.call_count, 2)
+
+    def test_prefetch_single_query(self):
+        self.cache.get(1)
+
+        self.cache.prefetch([1, 2, 3, 2])
+
+        self.assertEqual(self.load_many.call_count, 1)
+        self.assertEqual(self.load_many.call_args[0][0], {2, 3})
+        for keyword_id in [1, 2, 3]:
+            self.cache.get(keyword_id)
+        self.assertEqual(self.load_one.call_count, 1)
+
+    def test_prefetch_all_cached(self):
+        self.cache.get(1)
+        self.cache.prefetch([1])
+        self.assertFalse(self.load_many.called)
+
+    def test_lru_eviction(self):
+        for keyword_id in range(6):
+            self.cache.get(keyword_id)
+        self.cache.get(0)
+        self.assertEqual(self.load_one.call_count, 7)
+
+    def test_invalidate(self):
+        self.cache.get(1)
+        self.cache.invalidate(1)
+        self.cache.get(1)
+        self.assertEqual(self.load_one.call_count, 2)
+
+    def test_clear(self):
+        self.cache.get(1)
+        self.cache.get(2)
+        self.cache.clear()
+        self.cache.get(1)
+        self.assertEqual(self.load_one.call_count, 3)
+
+class TestKeywordLoader(unittest.TestCase):
+    """
+    Testing Setup
+    """
+    def test_load_many_single_query(self):
+        collection = MagicMock()
+        collection.find.return_value = [{"_id": 1, "keyword_string": "test", "language": "de"}]
+        loader = KeywordLoader(MagicMock(), collection, lambda document: Keyword(document["_id"], document["keyword_string"], document["language"]))
+
+        keywords = loader.load_many({1, 2})
+
+        self.assertEqual(collection.find.call_count, 1)
+        self.assertEqual(sorted(collection.find.call_args[0][0]["_id"]["$in"]), [1, 2])
+        self.assertEqual(list(keywords), [1])
+        self.assertIsInstance(keywords[1], Keyword)
+        self.assertEqual((keywords[1].keyword_string, keywords[1].language), ("test", "de"))
+
+    def test_load_one_through_controller(self):
+        mongo_controller = MagicMock()
+
+        loader = KeywordLoader(mongo_controller, MagicMock(), MagicMock())
+        loader.load_one(1)
+
+        mongo_controller.get_keyword_by_id.assert_called_once_with(1, cast=True)
+
+@unittest.skipUnless(hasattr(MongoController, "get_keyword_by_id"), "the common library is not installed")
+class TestCommonLibrarySchema(unittest.TestCase):
+    """
+    Batch loaded keywords are read from the same collection and cast like the keywords of the MongoController of the common library
+    """
+    def test_load_many_matches_mongo_controller(self):
+        from common.mongo.data_types.crawling.keyword import Keyword as CommonKeyword
+
+        collection = MagicMock()
+        collection.find.return_value = [{"_id": ObjectId(), "keyword_string": "test", "language": "de"}]
+        loaded = KeywordLoader(None, collection, CommonKeyword.from_dict).load_many({collection.find.return_value[0]["_id"]})
+
+        with patch.object(Collection, "find_one", autospec=True, return_value=dict(collection.find.return_value[0])) as find_one:
+            mongo_controller = MongoController("mongodb://localhost:27017", "test")
+            keyword = mongo_controller.get_keyword_by_id(collection.find.return_value[0]["_id"], cast=True)
+
+        self.assertEqual(find_one.call_count, 1)
+        self.assertEqual(find_one.call_args[0][0].name, KEYWORDS_COLLECTION)
+        batch_keyword = loaded[collection.find.return_value[0]["_id"]]
+        self.assertIs(type(batch_keyword), type(keyword))
+        self.assertEqual(vars(batch_keyword), vars(keyword))
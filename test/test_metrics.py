@@ -0,0 +1,124 @@
+"""
+This module tests the metrics layer
+"""
+
+import unittest
+
+from urllib.request import urlopen
+from unittest.mock import patch
+
+from helpers.metrics import STAGE_SECONDS, Histogram, MetricsRegistry, start_http_server
+
+class TestMetricsRegistry(unittest.TestCase):
+    """
+    Testing Setup
+    """
+    def setUp(self):
+        self.registry = MetricsRegistry(trace=False)
+
+    def test_counter(self):
+        self.registry.increment("crawls_total", help_text="Crawls", outcome="success")
+        self.registry.increment("crawls_total", 2, outcome="success")
+
+        rendered = self.registry.render()
+
+        self.assertIn("# TYPE crawls_total counter", rendered)
+        self.assertIn('crawls_total{outcome="success"} 3', rendered)
+
+    def test_histogram_render(self):
+        self.registry.observe("latency_seconds", 0.003, stage="vader")
+        self.registry.observe("latency_seconds", 100, stage="vader")
+
+        rendered = self.registry.render()
+
+        self.assertIn("# TYPE latency_seconds histogram", rendered)
+        self.assertIn('latency_seconds_bucket{stage="vader",le="0.0025"} 0', rendered)
+        self.assertIn('latency_seconds_bucket{stage="vader",le="0.005"} 1', rendered)
+        self.assertIn('latency_seconds_bucket{stage="vader",le="+Inf"} 2', rendered)
+        self.assertIn('latency_seconds_count{stage="vader"} 2', rendered)
+
+    def test_label_escaping(self):
+        self.registry.increment("events_total", keyword='say "hi"\\')
+        self.assertIn('events_total{keyword="say \\"hi\\"\\\\"} 1', self.registry.render())
+
+    def test_timed_outcome_and_context_labels(self):
+        with self.registry.labels(language="de"):
+            with self.registry.timed("classify_text"):
+                pass
+            with self.assertRaises(ValueError):
+                with self.registry.timed("classify_text"):
+                    raise ValueError("request failed")
+        with self.registry.timed("write"):
+            pass
+
+        series = self.registry.histograms[STAGE_SECONDS]
+        labels = {key for key in series}
+        self.assertEqual(labels, {
+            (("language", "de"), ("outcome", "success"), ("stage", "classify_text")),
+            (("language", "de"), ("outcome", "error"), ("stage", "classify_text")),
+            (("outcome", "success"), ("stage", "write")),
+        })
+
+    def test_trace(self):
+        registry = MetricsRegistry(trace=True)
+
+        with patch("helpers.metrics.DEFAULT_LOGGER") as logger:
+            with registry.trace("crawl-1"):
+                with registry.timed("keyword_lookup"):
+                    pass
+                with registry.trace("nested"):
+                    with registry.timed("vader"):
+                        pass
+
+        self.assertEqual(logger.log.call_count, 1)
+        message = logger.log.call_args[0][0]
+        self.assertTrue(message.startswith("Trace crawl-1"))
+        self.assertIn("keyword_lookup=", message)
+        self.assertIn("vader=", message)
+
+    def test_trace_disabled(self):
+        with patch("helpers.metrics.DEFAULT_LOGGER") as logger:
+            with self.registry.trace("crawl-1"):
+                with self.registry.timed("vader"):
+                    pass
+        self.assertFalse(logger.log.called)
+
+    def test_snapshot(self):
+        self.registry.increment("crawls_total")
+        self.registry.observe("latency_seconds", 0.02, stage="vader")
+
+        lines = self.registry.snapshot()
+
+        self.assertEqual(lines[0], "crawls_total 1")
+        self.assertIn("count=1", lines[1])
+        self.assertIn("p95<=25ms", lines[1])
+
+    def test_snapshot_above_last_bucket(self):
+        self.registry.observe("latency_seconds", 45, stage="quota_wait")
+
+        lines = self.registry.snapshot()
+
+        self.assertIn("p95<=+Infms", lines[0])
+
+    def test_histogram_quantile(self):
+        histogram = Histogram(buckets=[1, 2, 3])
+        for value in [0.5, 1.5, 1.5, 2.5]:
+            histogram.observe(value)
+        self.assertEqual(histogram.quantile(0.5), 2)
+        self.assertEqual(histogram.quantile(1), 3)
+
+    def test_http_endpoint(self):
+        self.registry.increment("crawls_total")
+
+        with patch("helpers.metrics.DEFAULT_LOGGER"):
+            server = start_http_server(0, registry=self.registry)
+        try:
+            url = "http://127.0.0.1:{}/metrics".format(server.server_address[1])
+            with urlopen(url) as response:
+                body = response.read().decode("utf-8")
+                self.assertTrue(response.headers["Content-Type"].startswith("text/plain"))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertIn("crawls_total 1", body)
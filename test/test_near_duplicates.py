@@ -0,0 +1,82 @@
+"""
+This module tests the near-duplicate index
+"""
+
+import unittest
+
+from helpers.near_duplicates import NearDuplicateIndex, fingerprint_text, similarity, text_features
+
+TWEET = "Die neue Folge war wirklich großartig, ich freue mich schon auf nächste Woche"
+
+class TestFingerprint(unittest.TestCase):
+    def test_features_ignore_links_and_mentions(self):
+        self.assertEqual(
+            text_features("@someone great show https://t.co/abc123"),
+            text_features("@other great show https://t.co/xyz789"),
+        )
+
+    def test_variants_are_similar(self):
+        fingerprint = fingerprint_text(TWEET + " https://t.co/abc123")
+        variant = fingerprint_text("@someone " + TWEET + " 😍 https://t.co/xyz789")
+        self.assertEqual(similarity(fingerprint, variant), 1)
+
+    def test_different_texts_are_not_similar(self):
+        fingerprint = fingerprint_text(TWEET)
+        other = fingerprint_text("Der Zug hat schon wieder Verspätung und niemand sagt uns warum")
+        self.assertLess(similarity(fingerprint, other), 0.9)
+
+    def test_short_text_not_fingerprinted(self):
+        self.assertIsNone(fingerprint_text("toll"))
+
+class TestNearDuplicateIndex(unittest.TestCase):
+    """
+    Testing Setup
+    """
+    def setUp(self):
+        self.index = NearDuplicateIndex(threshold=0.95, max_entries=3)
+
+    def test_invalid_threshold(self):
+        with self.assertRaises(ValueError):
+            NearDuplicateIndex(threshold=0)
+
+    def test_bands_cover_fingerprint(self):
+        self.assertEqual(self.index.max_distance, 3)
+        self.assertEqual(len(self.index.bands), 4)
+        self.assertEqual(sum(bin(mask).count('1') for _, mask in self.index.bands), 64)
+
+    def test_lookup_within_distance(self):
+        fingerprint = 0x0123456789abcdef
+        self.index.add("ns", fingerprint, "value")
+
+        close = fingerprint ^ (1 << 0) ^ (1 << 20) ^ (1 << 40) # 3 bits differ, one in every but one band
+        far = fingerprint ^ (1 << 0) ^ (1 << 20) ^ (1 << 40) ^ (1 << 60)
+
+        self.assertEqual(self.index.lookup("ns", close), "value")
+        self.assertIsNone(self.index.lookup("ns", far))
+        self.assertEqual((self.index.hits, self.index.misses), (1, 1))
+
+    def test_lookup_picks_closest(self):
+        self.index.add("ns", 0b111, "far")
+        self.index.add("ns", 0b001, "close")
+        self.assertEqual(self.index.lookup("ns", 0b000), "close")
+
+    def test_namespaces_are_separate(self):
+        self.index.add("ns", 42, "value")
+        self.assertIsNone(self.index.lookup("other", 42))
+
+    def test_lru_eviction(self):
+        for fingerprint in [1 << 8, 1 << 24, 1 << 40]:
+            self.index.add("ns", fingerprint, fingerprint)
+        self.index.lookup("ns", 1 << 8)
+        self.index.add("ns", 1 << 56, 1 << 56)
+
+        self.assertEqual(len(self.index), 3)
+        self.assertIsNone(self.index.lookup("ns", (1 << 24) | (1 << 28) | (1 << 30) | (1 << 31)), "Least recently used entry should be evicted")
+        self.assertEqual(self.index.lookup("ns", 1 << 8), 1 << 8)
+        self.assertTrue(all(bucket for table in self.index.tables for bucket in table.values()))
+
+    def test_clear(self):
+        self.index.add("ns", 42, "value")
+        self.index.clear()
+        self.assertIsNone(self.index.lookup("ns", 42))
+        self.assertEqual(len(self.index), 0)
@@ -0,0 +1,132 @@
+"""
+This module tests the staged crawl pipeline
+"""
+
+import unittest
+
+from threading import Lock
+
+from helpers.crawl_writer import WriteReport
+from helpers.pipeline import CrawlPipeline
+
+class CrawlMock():
+    """
+    This class is a simplified version of the crawl result class used by the common library
+    """
+    def __init__(self, _id):
+        self._id = _id
+
+class CrawlStoreMock():
+    """
+    This class is a mock version of the crawl collection, crawls stay unprocessed until they were written
+    """
+    def __init__(self, count):
+        self.unprocessed = [CrawlMock(i) for i in range(count)]
+        self.processed = []
+        self.lock = Lock()
+
+    def fetch(self, limit):
+        with self.lock:
+            return list(self.unprocessed[:limit])
+
+    def process(self, crawl):
+        with self.lock:
+            self.unprocessed.remove(crawl)
+            self.processed.append(crawl._id)
+
+class TestCrawlPipeline(unittest.TestCase):
+    """
+    Testing Setup
+    """
+    def setUp(self):
+        self.written_batches = []
+
+    def write(self, store):
+        def write_items(items):
+            self.written_batches.append(len(items))
+            for crawl, result in items:
+                self.assertEqual(result, crawl._id * 2)
+                store.process(crawl)
+        return write_items
+
+    def test_all_crawls_processed_once(self):
+        store = CrawlStoreMock(120)
+        pipeline = CrawlPipeline(store.fetch, lambda crawl: crawl._id * 2, self.write(store), analysis_workers=4, page_size=25)
+
+        processed = pipeline.run()
+
+        self.assertEqual(processed, 120)
+        self.assertEqual(sorted(store.processed), list(range(120)))
+
+    def test_write_batches_bounded(self):
+        store = CrawlStoreMock(60)
+        pipeline = CrawlPipeline(store.fetch, lambda crawl: crawl._id * 2, self.write(store), analysis_workers=2, page_size=30, write_batch_size=7)
+
+        pipeline.run()
+
+        self.assertEqual(sum(self.written_batches), 60)
+        self.assertLessEqual(max(self.written_batches), 7)
+
+    def test_failing_analysis_counted(self):
+        store = CrawlStoreMock(20)
+
+        def analyze(crawl):
+            if crawl._id % 5 == 0:
+                raise Exception("analysis failed")
+            return crawl._id * 2
+
+        pipeline = CrawlPipeline(store.fetch, analyze, self.write(store), analysis_workers=3, page_size=10)
+
+        processed = pipeline.run()
+
+        self.assertEqual(processed, 16)
+        self.assertEqual(pipeline.failed, 4)
+
+    def test_failing_crawls_at_head_do_not_stop_the_run(self):
+        store = CrawlStoreMock(100)
+
+        def analyze(crawl):
+            if crawl._id < 5: # e.g. the keyword was deleted
+                raise Exception("analysis failed")
+            return crawl._id * 2
+
+        pipeline = CrawlPipeline(store.fetch, analyze, self.write(store), analysis_workers=3, page_size=5)
+
+        processed = pipeline.run()
+
+        self.assertEqual(processed, 95)
+        self.assertEqual(pipeline.failed, 5)
+        self.assertEqual(sorted(store.processed), list(range(5, 100)))
+
+    def test_processed_crawls_still_unprocessed_do_not_stop_the_run(self):
+        store = CrawlStoreMock(100)
+
+        def write(items):
+            for crawl, _ in items:
+                if crawl._id >= 5: # e.g. written without a score, they still match the query
+                    store.process(crawl)
+
+        pipeline = CrawlPipeline(store.fetch, lambda crawl: crawl._id * 2, write, analysis_workers=3, page_size=5)
+
+        self.assertEqual(pipeline.run(), 100)
+        self.assertEqual(sorted(store.processed), list(range(5, 100)))
+
+    def test_failed_writes_counted(self):
+        store = CrawlStoreMock(10)
+
+        def write(items):
+            for crawl, _ in items:
+                if crawl._id != 4:
+                    store.process(crawl)
+            return [WriteReport(4, "write failed")] if any(crawl._id == 4 for crawl, _ in items) else []
+
+        pipeline = CrawlPipeline(store.fetch, lambda crawl: crawl._id * 2, write, analysis_workers=2, page_size=5)
+
+        self.assertEqual(pipeline.run(), 9)
+        self.assertEqual(pipeline.failed, 1)
+
+    def test_empty_backlog(self):
+        store = CrawlStoreMock(0)
+        pipeline = CrawlPipeline(store.fetch, lambda crawl: None, self.write(store))
+
+        self.assertEqual(pipeline.run(), 0)
@@ -2,11 +2,20 @@
 This module tests all relevant functionality of the processor
 """
 
+import os
+import tempfile
 import unittest
 
 from unittest.mock import patch, MagicMock
 
+from google.api_core.exceptions import ResourceExhausted
+
 from processor import GoogleCloudLanguageProcessor, VADER_SUPPORTED_LANGUAGES
+from helpers.eligibility import EligibilityFilter
+from helpers.metrics import METRICS, STAGE_SECONDS
+from helpers.near_duplicates import NearDuplicateIndex
+from helpers.rate_limiter import InMemoryBackend, RateLimiter
+from helpers.result_cache import CachedCategory, ResultCache
 
 class GoogleCloudClientMock():
     """
@@ -53,6 +62,10 @@ class GoogleCloudClientMock():
     def classify_text(self, document=None):
         return self.category_response_object
 
+    def annotate_text(self, document=None, features=None):
+        self.annotate_features = features
+        return AnnotateTextResponse(self.sentiment_document_object, self.entities, self.categories)
+
 class Sentiment():
     """
     This class is a simplified version of the sentiment class used by the google library
@@ -81,6 +94,15 @@ class Entity():
     def __init__(self, name):
         self.name = name
 
+class AnnotateTextResponse():
+    """
+    This class is a simplified version of the annotate text response class used by the google library
+    """
+    def __init__(self, document_sentiment, entities, categories):
+        self.document_sentiment = document_sentiment
+        self.entities = entities
+        self.categories = categories
+
 class CategoryResponse():
     """
     This class is a simplified version of the category response class used by the google library
@@ -96,6 +118,8 @@ class TestGoogleCloudLanguageProcessor(unittest.TestCase):
         # Mocking
         self.google_cloud_client_mock_object = GoogleCloudClientMock()
         self.mock_google_cloud_client()
+        self.mock_rate_limiter()
+        self.mock_eligibility_filter()
 
         # Processor
         self.processor = GoogleCloudLanguageProcessor()
@@ -104,6 +128,16 @@ class TestGoogleCloudLanguageProcessor(unittest.TestCase):
         self.google_cloud_mock = patch("processor.language.LanguageServiceClient", return_value=self.google_cloud_client_mock_object)
         self.google_cloud_mock.start()
 
+    def mock_rate_limiter(self):
+        rate_limiter = RateLimiter(InMemoryBackend(), 10 ** 6, burst=10 ** 6)
+        self.rate_limiter_mock = patch("processor.get_rate_limiter", return_value=rate_limiter)
+        self.rate_limiter_mock.start()
+
+    def mock_eligibility_filter(self):
+        # Send every request, the filter is tested with explicit rules below
+        self.eligibility_filter_mock = patch("processor.create_eligibility_filter", return_value=None)
+        self.eligibility_filter_mock.start()
+
     def test_construction(self):
         processor = GoogleCloudLanguageProcessor()
         self.assertIsNotNone(processor)
@@ -164,7 +198,7 @@ class TestGoogleCloudLanguageProcessor(unittest.TestCase):
         self.assertEqual(entities, entities_expected)
         self.assertEqual(categories, categories_expected)
 
-    @patch("processor.SentimentIntensityAnalyzer.polarity_scores", mock=MagicMock(return_value={ "compound": 15 }))
+    @patch("helpers.vader.SentimentIntensityAnalyzer.polarity_scores", mock=MagicMock(return_value={ "compound": 15 }))
     def test_process_vader_used(self, mock):
         language = VADER_SUPPORTED_LANGUAGES[0]
         
@@ -172,10 +206,182 @@ class TestGoogleCloudLanguageProcessor(unittest.TestCase):
 
         self.assertTrue(mock.called)
 
-    @patch("processor.SentimentIntensityAnalyzerGerman.polarity_scores", mock=MagicMock(return_value={"compound": 15}))
+    @patch("helpers.vader.SentimentIntensityAnalyzerGerman.polarity_scores", mock=MagicMock(return_value={"compound": 15}))
     def test_process_vader_used_german(self, mock):
         language = "de"
 
         self.processor.process("some text", "keyword", language)
 
         self.assertTrue(mock.called)
+
+    def test_polarity_scores_batch(self):
+        texts = ["Das ist toll!", "Das ist schlecht", "Haus"]
+        expected = [self.processor.vader_analyzer_german.polarity_scores(text) for text in texts]
+
+        result = self.processor.polarity_scores_batch(texts, "de")
+
+        self.assertEqual(result, expected)
+
+    def test_polarity_scores_batch_unsupported_language(self):
+        with self.assertRaises(ValueError):
+            self.processor.polarity_scores_batch(["some text"], "zh")
+
+    def test_requests_per_process(self):
+        self.assertEqual(GoogleCloudLanguageProcessor(combined_requests=False).requests_per_process, 3)
+        self.assertEqual(GoogleCloudLanguageProcessor(combined_requests=True).requests_per_process, 1, "Pages are sized by the expected cost, the rate limiter gates fallback requests")
+
+    def test_process_combined_results_content(self):
+        processor = GoogleCloudLanguageProcessor(combined_requests=True)
+
+        score, entities, categories = processor.process("some text", "keyword", "zh")
+
+        self.assertEqual(score, self.google_cloud_client_mock_object.sentiment_document_object.score)
+        self.assertEqual(entities, self.google_cloud_client_mock_object.entities)
+        self.assertEqual(categories, self.google_cloud_client_mock_object.categories)
+        self.assertTrue(self.google_cloud_client_mock_object.annotate_features.extract_document_sentiment)
+
+    def test_process_combined_skips_sentiment_for_vader(self):
+        processor = GoogleCloudLanguageProcessor(combined_requests=True)
+
+        score, _, _ = processor.process("some text", "keyword", "de")
+
+        self.assertFalse(self.google_cloud_client_mock_object.annotate_features.extract_document_sentiment)
+        self.assertEqual(score, processor.vader_analyzer_german.polarity_scores("some text")["compound"])
+
+    def test_process_combined_falls_back(self):
+        processor = GoogleCloudLanguageProcessor(combined_requests=True)
+        processor.client.annotate_text = MagicMock(side_effect=Exception("annotate failed"))
+
+        score, entities, categories = processor.process("some text", "keyword", "zh")
+
+        self.assertEqual(score, self.google_cloud_client_mock_object.sentiment_document_object.score)
+        self.assertEqual(entities, self.google_cloud_client_mock_object.entities)
+        self.assertEqual(categories, self.google_cloud_client_mock_object.categories)
+
+    def test_process_combined_quota_exhausted(self):
+        processor = GoogleCloudLanguageProcessor(combined_requests=True)
+        processor.client.annotate_text = MagicMock(side_effect=ResourceExhausted("quota exceeded"))
+        processor.client.analyze_entity_sentiment = MagicMock()
+
+        score, entities, categories = processor.process("some text", "keyword", "de")
+
+        processor.client.analyze_entity_sentiment.assert_not_called()
+        self.assertEqual(score, processor.vader_analyzer_german.polarity_scores("some text")["compound"])
+        self.assertEqual((entities, categories), ([], []))
+
+    def test_process_combined_eligibility_always_applied(self):
+        with patch("processor.create_eligibility_filter") as create_eligibility_filter:
+            GoogleCloudLanguageProcessor(combined_requests=True)
+            create_eligibility_filter.assert_called_once_with(enabled=True)
+
+    def test_requests_take_permits(self):
+        rate_limiter = MagicMock()
+        processor = GoogleCloudLanguageProcessor(rate_limiter=rate_limiter)
+
+        processor.process("some text", "keyword", "zh")
+
+        features = [call[0][0] for call in rate_limiter.acquire.call_args_list]
+        self.assertEqual(features, ["analyze_sentiment", "analyze_entity_sentiment", "classify_text"])
+
+    def create_cached_processor(self, directory):
+        self.google_cloud_client_mock_object.entities = [Entity("entity")]
+        self.google_cloud_client_mock_object.entities[0].sentiment = SentimentDocument(0.5)
+        self.google_cloud_client_mock_object.categories = [CachedCategory("/test", 0.9)]
+        result_cache = ResultCache(os.path.join(directory, "cache.sqlite"))
+        return GoogleCloudLanguageProcessor(result_cache=result_cache)
+
+    def test_process_cached(self):
+        with tempfile.TemporaryDirectory() as directory:
+            processor = self.create_cached_processor(directory)
+            rate_limiter = MagicMock()
+            processor.rate_limiter = rate_limiter
+
+            first = processor.process("some text!", "keyword", "zh")
+            second = processor.process("some text?", "keyword", "zh") # Same text after cleaning
+
+            self.assertEqual(rate_limiter.acquire.call_count, 3, "The second text should not be sent to Google")
+            self.assertEqual(second[0], first[0])
+            self.assertEqual(second[1][0].name, "entity")
+            self.assertEqual(processor.result_cache.stats["hits"], 1)
+            processor.close()
+
+    def test_process_failed_features_not_cached(self):
+        with tempfile.TemporaryDirectory() as directory:
+            processor = self.create_cached_processor(directory)
+            processor.client.classify_text = MagicMock(side_effect=Exception("classify failed"))
+
+            processor.process("some text", "keyword", "zh")
+            processor.process("some text", "keyword", "zh")
+
+            self.assertEqual(processor.client.classify_text.call_count, 2)
+            processor.close()
+
+    def test_process_near_duplicate_reused(self):
+        self.google_cloud_client_mock_object.entities = [Entity("entity")]
+        self.google_cloud_client_mock_object.entities[0].sentiment = SentimentDocument(0.5)
+        self.google_cloud_client_mock_object.categories = [CachedCategory("/test", 0.9)]
+        processor = GoogleCloudLanguageProcessor(near_duplicates=NearDuplicateIndex())
+        processor.rate_limiter = MagicMock()
+        text = "Die neue Folge war wirklich toll, ich freue mich auf die naechste Woche"
+
+        processor.process(text + " https://t.co/abc", "keyword", "de")
+        score, entities, categories = processor.process("@someone " + text + " https://t.co/xyz", "keyword", "de")
+
+        self.assertEqual(processor.rate_limiter.acquire.call_count, 2, "The near-duplicate should not be sent to Google")
+        self.assertEqual(entities[0].name, "entity")
+        self.assertEqual(categories[0].name, "/test")
+        self.assertEqual(score, processor.vader_analyzer_german.polarity_scores("someone " + text + " https t co xyz")["compound"])
+
+    def create_filtered_processor(self, **kwargs):
+        eligibility_filter = EligibilityFilter({
+            "analyze_sentiment": {"languages": ["en"], "min_tokens": 1},
+            "analyze_entity_sentiment": {"languages": ["en"], "min_tokens": 1},
+            "classify_text": {"languages": ["en"], "min_tokens": 5},
+        })
+        processor = GoogleCloudLanguageProcessor(eligibility_filter=eligibility_filter, **kwargs)
+        processor.rate_limiter = MagicMock()
+        return processor
+
+    def test_process_ineligible_requests_skipped(self):
+        processor = self.create_filtered_processor()
+
+        score, entities, categories = processor.process("some text https://t.co/abc123 https://t.co/def456", "keyword", "zh")
+
+        self.assertEqual(processor.rate_limiter.acquire.call_count, 0)
+        self.assertEqual((score, entities, categories), (None, [], []))
+        self.assertEqual(processor.eligibility_filter.stats, {"analyze_sentiment": 1, "analyze_entity_sentiment": 1, "classify_text": 1})
+
+    def test_process_short_text_not_classified(self):
+        processor = self.create_filtered_processor()
+
+        processor.process("nice weather", "keyword", None)
+
+        features = [call[0][0] for call in processor.rate_limiter.acquire.call_args_list]
+        self.assertEqual(features, ["analyze_sentiment", "analyze_entity_sentiment"])
+
+    def test_process_combined_ineligible_features(self):
+        processor = self.create_filtered_processor(combined_requests=True)
+
+        processor.process("some text", "keyword", "en")
+
+        request_features = self.google_cloud_client_mock_object.annotate_features
+        self.assertTrue(request_features.extract_entity_sentiment)
+        self.assertFalse(request_features.classify_text)
+
+    def test_process_combined_nothing_eligible(self):
+        processor = self.create_filtered_processor(combined_requests=True)
+
+        score, entities, categories = processor.process("https://t.co/abc123", "keyword", "de")
+
+        self.assertEqual(processor.rate_limiter.acquire.call_count, 0)
+        self.assertEqual((entities, categories), ([], []))
+
+    def test_process_records_stage_metrics(self):
+        METRICS.reset()
+
+        self.processor.process("some text", "keyword", "zh")
+
+        stages = {dict(key)["stage"]: dict(key) for key in METRICS.histograms[STAGE_SECONDS]}
+        self.assertEqual(set(stages), {"quota_wait", "analyze_sentiment", "analyze_entity_sentiment", "classify_text"})
+        self.assertEqual(stages["classify_text"]["language"], "zh")
+        self.assertEqual(stages["classify_text"]["outcome"], "success")
@@ -0,0 +1,114 @@
+"""
+This module tests the token bucket rate limiter
+"""
+
+import time
+import unittest
+
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from helpers.rate_limiter import InMemoryBackend, MongoBackend, RateLimiter
+
+class TestInMemoryBackend(unittest.TestCase):
+    """
+    Testing Setup
+    """
+    def setUp(self):
+        self.backend = InMemoryBackend()
+
+    def test_take_within_capacity(self):
+        for _ in range(5):
+            self.assertEqual(self.backend.take("bucket", 5, 1), 0)
+
+    def test_take_exceeding_capacity(self):
+        for _ in range(5):
+            self.backend.take("bucket", 5, 1)
+
+        wait = self.backend.take("bucket", 5, 1)
+
+        self.assertGreater(wait, 0)
+        self.assertLessEqual(wait, 1)
+
+    def test_buckets_independent(self):
+        self.backend.take("bucket", 1, 1)
+        self.assertEqual(self.backend.take("other bucket", 1, 1), 0)
+
+    def test_refund(self):
+        self.backend.take("bucket", 1, 0.01)
+        self.backend.refund("bucket", 1)
+        self.assertEqual(self.backend.take("bucket", 1, 0.01), 0)
+
+class TestMongoBackend(unittest.TestCase):
+    """
+    Testing Setup
+    """
+    def test_server_clock_used(self):
+        collection = MagicMock()
+        collection.database.command.return_value = {"localTime": datetime.utcfromtimestamp(time.time() - 3600)}
+        collection.find_one.return_value = {"_id": "bucket", "tokens": 0.0, "updated_at": time.time() - 3600}
+        collection.update_one.return_value.modified_count = 1
+        backend = MongoBackend(collection)
+
+        wait = backend.take("bucket", 5, 1)
+
+        self.assertGreater(wait, 0.9, "A local clock an hour ahead of the server must not refill the bucket")
+        self.assertAlmostEqual(backend.now(), time.time() - 3600, delta=1)
+        self.assertEqual(collection.database.command.call_count, 1, "The offset should be measured once per interval")
+
+class TestRateLimiter(unittest.TestCase):
+    """
+    Testing Setup
+    """
+    def test_acquire_within_quota(self):
+        rate_limiter = RateLimiter(InMemoryBackend(), 600, burst=10)
+
+        for _ in range(10):
+            self.assertTrue(rate_limiter.acquire("classify_text", timeout=0))
+
+    def test_acquire_timeout(self):
+        rate_limiter = RateLimiter(InMemoryBackend(), 60, burst=1)
+
+        self.assertTrue(rate_limiter.acquire("classify_text", timeout=0))
+        self.assertFalse(rate_limiter.acquire("classify_text", timeout=0.01))
+
+    def test_feature_limit(self):
+        rate_limiter = RateLimiter(InMemoryBackend(), 600, feature_limits={"classify_text": 60}, burst=1)
+
+        self.assertTrue(rate_limiter.acquire("classify_text", timeout=0))
+        self.assertFalse(rate_limiter.acquire("classify_text", timeout=0))
+
+    def test_feature_limit_not_below_project_limit_skipped(self):
+        backend = MagicMock(wraps=InMemoryBackend())
+        rate_limiter = RateLimiter(backend, 600, feature_limits={"classify_text": 600, "analyze_sentiment": 60}, burst=10)
+
+        self.assertTrue(rate_limiter.acquire("classify_text", timeout=0))
+
+        self.assertEqual(rate_limiter.feature_limits, {"analyze_sentiment": 60})
+        self.assertEqual([call[0][0] for call in backend.take.call_args_list], ["google-nlp:project"])
+
+    def test_project_limit_shared_by_features(self):
+        rate_limiter = RateLimiter(InMemoryBackend(), 60, burst=1)
+
+        self.assertTrue(rate_limiter.acquire("classify_text", timeout=0))
+        self.assertFalse(rate_limiter.acquire("analyze_sentiment", timeout=0))
+
+    def test_feature_token_refunded_on_timeout(self):
+        rate_limiter = RateLimiter(InMemoryBackend(), 60, feature_limits={"classify_text": 1}, burst=1)
+        self.assertTrue(rate_limiter.acquire("analyze_sentiment", timeout=0))
+
+        self.assertFalse(rate_limiter.acquire("classify_text", timeout=0), "The project bucket is empty")
+        rate_limiter.backend.buckets["google-nlp:project"] = (1, time.time())
+
+        self.assertTrue(rate_limiter.acquire("classify_text", timeout=0), "The feature token should have been put back")
+
+    def test_fallback_on_backend_failure(self):
+        backend = MagicMock()
+        backend.take.side_effect = Exception("mongo unavailable")
+        fallback_backend = InMemoryBackend()
+        rate_limiter = RateLimiter(backend, 600, burst=10, fallback_backend=fallback_backend)
+
+        self.assertTrue(rate_limiter.acquire("classify_text", timeout=0))
+        self.assertTrue(rate_limiter.acquire("classify_text", timeout=0))
+        self.assertEqual(backend.take.call_count, 1, "The failed backend should not be retried right away")
+        self.assertIn("google-nlp:project", fallback_backend.buckets)
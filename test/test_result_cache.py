@@ -0,0 +1,83 @@
+"""
+This module tests the persistent NLP result cache
+"""
+
+import os
+import tempfile
+import unittest
+
+from unittest.mock import patch
+
+from helpers.result_cache import CachedCategory, CachedEntity, CachedSentiment, ResultCache, cache_key
+
+class TestResultCache(unittest.TestCase):
+    """
+    Testing Setup
+    """
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'cache.sqlite')
+        self.cache = ResultCache(self.path, max_entries=10, ttl=60)
+
+        self.entities = [CachedEntity("entity", CachedSentiment(0.5))]
+        self.categories = [CachedCategory("/category", 0.9)]
+
+    def tearDown(self):
+        self.cache.close()
+        self.directory.cleanup()
+
+    def test_key_normalizes_whitespace(self):
+        self.assertEqual(cache_key("some  text ", "en", "keyword"), cache_key("some text", "en", "keyword"))
+
+    def test_key_depends_on_language_and_keyword(self):
+        key = cache_key("some text", "en", "keyword")
+        self.assertNotEqual(key, cache_key("some text", "de", "keyword"))
+        self.assertNotEqual(key, cache_key("some text", "en", "other"))
+        self.assertNotEqual(key, cache_key("other text", "en", "keyword"))
+
+    def test_roundtrip(self):
+        self.cache.set("key", 0.3, self.entities, self.categories)
+
+        score, entities, categories = self.cache.get("key")
+
+        self.assertEqual(score, 0.3)
+        self.assertEqual(entities[0].name, "entity")
+        self.assertEqual(entities[0].sentiment.score, 0.5)
+        self.assertEqual(categories[0].name, "/category")
+        self.assertEqual(categories[0].confidence, 0.9)
+
+    def test_counters(self):
+        self.assertIsNone(self.cache.get("key"))
+        self.cache.set("key", 0.3, [], [])
+        self.cache.get("key")
+
+        self.assertEqual(self.cache.stats["hits"], 1)
+        self.assertEqual(self.cache.stats["misses"], 1)
+
+    def test_persistent(self):
+        self.cache.set("key", 0.3, [], [])
+
+        other = ResultCache(self.path)
+        self.assertEqual(other.get("key"), (0.3, [], []))
+        other.close()
+
+    def test_ttl(self):
+        self.cache.set("key", 0.3, [], [])
+
+        with patch("helpers.result_cache.time.time", return_value=10 ** 12):
+            self.assertIsNone(self.cache.get("key"))
+
+    def test_size_bound(self):
+        for i in range(25):
+            self.cache.set(str(i), 0.1, [], [])
+
+        hits = sum(1 for i in range(25) if self.cache.get(str(i)) is not None)
+
+        self.assertLessEqual(hits, 10)
+        self.assertIsNotNone(self.cache.get("24"), "The most recent entry should not be evicted")
+        self.assertGreater(self.cache.stats["evictions"], 0)
+
+    def test_clear(self):
+        self.cache.set("key", 0.3, [], [])
+        self.cache.clear()
+        self.assertIsNone(self.cache.get("key"))
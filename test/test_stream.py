@@ -0,0 +1,248 @@
+"""
+This module tests the change stream runner
+"""
+
+import unittest
+
+from unittest.mock import MagicMock
+
+from pymongo.errors import OperationFailure
+
+from helpers.stream import CrawlStreamRunner, ResumeTokenStore
+
+class Crawl():
+    """
+    This class is a simplified version of the crawl result class used by the common library
+    """
+    def __init__(self, _id):
+        self._id = _id
+
+class ChangeStreamMock():
+    """
+    A simplified change stream which returns its changes and then stops the runner
+    """
+    def __init__(self, changes, runner_getter):
+        self.changes = list(changes)
+        self.runner_getter = runner_getter
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def try_next(self):
+        if self.changes:
+            return self.changes.pop(0)
+        self.runner_getter().stop()
+        return None
+
+class CollectionMock():
+    """
+    A simplified crawl collection, `processed` holds the ids of crawls with results
+    """
+    def __init__(self):
+        self.processed = set()
+        self.changes = []
+        self.watch_error = None
+        self.watch_calls = []
+        self.runner = None
+
+    def watch(self, pipeline, resume_after=None, max_await_time_ms=None):
+        self.watch_calls.append(resume_after)
+        if self.watch_error is not None:
+            error, self.watch_error = self.watch_error, None if resume_after is not None else self.watch_error
+            raise error
+        return ChangeStreamMock(self.changes, lambda: self.runner)
+
+    def find(self, query, projection=None):
+        return [{'_id': _id} for _id in query['_id']['$in'] if _id in self.processed]
+
+class TokenStoreMock():
+    def __init__(self, token=None):
+        self.token = token
+        self.saved = []
+
+    def load(self):
+        return self.token
+
+    def save(self, token):
+        self.token = token
+        self.saved.append(token)
+
+def change(_id):
+    return {'_id': {'_data': 'token {}'.format(_id)}, 'fullDocument': {'_id': _id}}
+
+class TestCrawlStreamRunner(unittest.TestCase):
+    """
+    Testing Setup
+    """
+    def setUp(self):
+        self.collection = CollectionMock()
+        self.token_store = TokenStoreMock()
+        self.unprocessed = []
+        self.batches = []
+
+        self.runner = self.create_runner()
+
+    def create_runner(self, **kwargs):
+        runner = CrawlStreamRunner(
+            self.collection, self.token_store, self.fetch, self.process_batch, lambda document: Crawl(document['_id']),
+            processed_query={'entities': {'$exists': True}}, batch_size=2, max_batch_wait=0.01, min_poll_interval=0.001, max_poll_interval=0.004, **kwargs
+        )
+        self.collection.runner = runner
+        return runner
+
+    def fetch(self, limit):
+        return [crawl for crawl in self.unprocessed if crawl._id not in self.collection.processed][:limit]
+
+    def process_batch(self, crawls):
+        self.batches.append([crawl._id for crawl in crawls])
+        self.collection.processed.update(crawl._id for crawl in crawls)
+        return [True] * len(crawls)
+
+    def test_changes_processed_in_batches(self):
+        self.token_store.token = {'_data': 'start'}
+        self.collection.changes = [change(1), change(2), change(3)]
+
+        processed = self.runner.run()
+
+        self.assertEqual(processed, 3)
+        self.assertEqual(self.batches, [[1, 2], [3]])
+        self.assertEqual(self.token_store.token, change(3)['_id'])
+        self.assertEqual(self.collection.watch_calls, [{'_data': 'start'}])
+
+    def test_drains_without_token(self):
+        self.unprocessed = [Crawl(1), Crawl(2), Crawl(3)]
+        self.collection.changes = [change(3), change(4)]
+
+        self.runner.run()
+
+        self.assertEqual(self.batches, [[1, 2], [3], [4]], "Crawl 3 should only be processed once")
+
+    def test_replayed_changes_skipped(self):
+        self.token_store.token = {'_data': 'start'}
+        self.collection.processed = {1}
+        self.collection.changes = [change(1), change(2)]
+
+        self.runner.run()
+
+        self.assertEqual(self.batches, [[2]])
+        self.assertEqual(self.token_store.token, change(2)['_id'])
+
+    def test_expired_token_drains(self):
+        self.token_store.token = {'_data': 'expired'}
+        self.collection.watch_error = OperationFailure("resume token not found")
+        self.unprocessed = [Crawl(1)]
+
+        self.runner.run()
+
+        self.assertEqual(self.collection.watch_calls, [{'_data': 'expired'}, None])
+        self.assertEqual(self.batches, [[1]])
+
+    def test_falls_back_to_polling(self):
+        self.collection.watch_error = OperationFailure("The $changeStream stage is only supported on replica sets", code=40573)
+        self.unprocessed = [Crawl(1), Crawl(2), Crawl(3)]
+        polls = []
+        fetch_unprocessed = self.fetch
+
+        def fetch(limit):
+            polls.append(limit)
+            if len(polls) > 5:
+                runner.stop()
+            return fetch_unprocessed(limit)
+
+        self.fetch = fetch
+        runner = self.create_runner()
+        processed = runner.run()
+
+        self.assertEqual(processed, 3)
+        self.assertEqual(self.batches, [[1, 2], [3]])
+
+    def test_processing_errors_do_not_switch_to_polling(self):
+        self.token_store.token = {'_data': 'start'}
+        self.collection.changes = [change(1)]
+
+        def process_batch(crawls):
+            raise OperationFailure("bulk write failed", code=2)
+
+        self.process_batch = process_batch
+        runner = self.create_runner()
+
+        with self.assertRaises(OperationFailure):
+            runner.run()
+
+    def test_failed_crawls_not_polled_again(self):
+        self.collection.watch_error = OperationFailure("The $changeStream stage is only supported on replica sets", code=40573)
+        self.unprocessed = [Crawl(i) for i in range(5)]
+        polls = []
+        fetch_unprocessed = self.fetch
+
+        def fetch(limit):
+            polls.append(limit)
+            if len(polls) > 8:
+                runner.stop()
+            return fetch_unprocessed(limit)
+
+        def process_batch(crawls):
+            self.batches.append([crawl._id for crawl in crawls])
+            self.collection.processed.update(crawl._id for crawl in crawls if crawl._id >= 2)
+            return [crawl._id >= 2 for crawl in crawls]
+
+        self.fetch = fetch
+        self.process_batch = process_batch
+        runner = self.create_runner()
+        runner.run()
+
+        self.assertEqual(self.batches, [[0, 1], [2, 3], [4]], "Crawls 0 and 1 keep failing and should not be sent again")
+
+    def test_failed_changes_retried(self):
+        self.token_store.token = {'_data': 'start'}
+        self.unprocessed = [Crawl(1), Crawl(2)]
+        self.collection.changes = [change(1), change(2)]
+        attempts = []
+
+        def process_batch(crawls):
+            self.batches.append([crawl._id for crawl in crawls])
+            results = [crawl._id != 1 or attempts.count(1) > 0 for crawl in crawls]
+            attempts.extend(crawl._id for crawl in crawls)
+            self.collection.processed.update(crawl._id for crawl, result in zip(crawls, results) if result)
+            return results
+
+        self.process_batch = process_batch
+        runner = self.create_runner(retry_failed_after=0.0)
+        processed = runner.run()
+
+        self.assertEqual(self.batches, [[1, 2], [1]])
+        self.assertEqual(processed, 2)
+        self.assertEqual(self.token_store.saved, [change(2)['_id']], "The token should be saved once the failed crawl succeeded")
+
+    def test_token_not_saved_past_failed_changes(self):
+        self.token_store.token = {'_data': 'start'}
+        self.collection.changes = [change(1), change(2), change(3)]
+
+        def process_batch(crawls):
+            self.batches.append([crawl._id for crawl in crawls])
+            return [crawl._id != 1 for crawl in crawls]
+
+        self.process_batch = process_batch
+        runner = self.create_runner()
+        processed = runner.run()
+
+        self.assertEqual(processed, 2, "Failed crawls should not count as processed")
+        self.assertEqual(self.token_store.saved, [])
+        self.assertEqual(self.token_store.token, {'_data': 'start'})
+
+class TestResumeTokenStore(unittest.TestCase):
+    def test_load_save(self):
+        collection = MagicMock()
+        collection.find_one.return_value = {'_id': 'processor', 'token': {'_data': 'x'}}
+        store = ResumeTokenStore(collection, 'processor')
+
+        self.assertEqual(store.load(), {'_data': 'x'})
+        store.save({'_data': 'y'})
+        store.save(None)
+
+        self.assertEqual(collection.update_one.call_args[0][0], {'_id': 'processor'})
+        self.assertTrue(collection.update_one.call_args[1]['upsert'])
+        collection.delete_one.assert_called_once_with({'_id': 'processor'})
@@ -0,0 +1,61 @@
+"""
+This module tests the Celery tasks
+"""
+
+import os
+import unittest
+
+from unittest.mock import MagicMock, patch
+
+os.environ.setdefault('BROKER_URL', 'memory://')
+
+import tasks
+
+class Crawl():
+    """
+    This class is a simplified version of the crawl result class used by the common library
+    """
+    def __init__(self, _id):
+        self._id = _id
+        self.keyword_string = 'keyword'
+        self.language = 'de'
+
+def from_dict(crawl_dict):
+    if 'invalid' in crawl_dict:
+        raise ValueError('invalid crawl')
+    return Crawl(crawl_dict['_id']) if crawl_dict else None
+
+class TestProcessCrawlBatch(unittest.TestCase):
+    """
+    Testing Setup
+    """
+    def setUp(self):
+        self.controller = MagicMock()
+        self.controller_pool = MagicMock()
+        self.controller_pool.acquire.return_value = self.controller
+
+        self.controller_pool_mock = patch('helpers.decorators.CONTROLLER_POOL', self.controller_pool)
+        self.controller_pool_mock.start()
+        self.from_dict_mock = patch('tasks.CrawlResult.from_dict', side_effect=from_dict)
+        self.from_dict_mock.start()
+
+    def tearDown(self):
+        self.controller_pool_mock.stop()
+        self.from_dict_mock.stop()
+
+    def test_results_in_input_order(self):
+        self.controller.run_crawl_batch.return_value = [True, False]
+
+        results = tasks.process_crawl_batch([{'_id': 1}, {}, {'invalid': True}, {'_id': 2}])
+
+        self.assertEqual(results, [True, None, None, False])
+        crawls = self.controller.run_crawl_batch.call_args[0][0]
+        self.assertEqual([crawl._id for crawl in crawls], [1, 2], "Invalid crawls should not be processed")
+
+    def test_controller_failure_releases_controller(self):
+        self.controller.run_crawl_batch.side_effect = Exception('mongo unavailable')
+
+        with self.assertRaises(Exception):
+            tasks.process_crawl_batch([{'_id': 1}])
+
+        self.controller_pool.release_failed.assert_called_once_with()
@@ -0,0 +1,43 @@
+"""
+This module tests the analyzers shared by a process
+"""
+
+import unittest
+from unittest.mock import patch
+
+from helpers.vader import SentimentIntensityAnalyzer, SentimentIntensityAnalyzerGerman, get_analyzer, get_analyzers, preload_analyzers
+
+class TestSharedAnalyzers(unittest.TestCase):
+    """
+    Testing Setup
+    """
+    def test_get_analyzer_shared(self):
+        """
+        Every call returns the same analyzer of a language
+        """
+        self.assertIsInstance(get_analyzer('en'), SentimentIntensityAnalyzer)
+        self.assertIsInstance(get_analyzer('de'), SentimentIntensityAnalyzerGerman)
+        self.assertIs(get_analyzer('de'), get_analyzer('de'))
+        self.assertIs(get_analyzers()['en'], get_analyzer('en'))
+
+    def test_get_analyzer_unsupported(self):
+        """
+        Languages VADER does not support have no analyzer
+        """
+        self.assertIsNone(get_analyzer('fr'))
+        self.assertEqual(set(get_analyzers()), {'en', 'de'})
+
+    @patch("helpers.vader.gc")
+    def test_preload_analyzers(self, gc):
+        """
+        Preloading creates all analyzers and freezes them if the interpreter supports it
+        """
+        gc.get_freeze_count.return_value = 1
+        analyzers = preload_analyzers()
+        self.assertIs(analyzers['de'], get_analyzer('de'))
+        gc.collect.assert_called_once_with()
+        gc.freeze.assert_called_once_with()
+
+        gc.reset_mock()
+        preload_analyzers(freeze=False)
+        gc.freeze.assert_not_called()
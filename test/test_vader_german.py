@@ -0,0 +1,358 @@
+"""
+This module tests the german VADER analyzer
+"""
+
+import io
+import os
+import gzip
+import json
+import shutil
+import tempfile
+import unittest
+import contextlib
+
+from unittest.mock import patch
+
+from VaderGerman.vaderSentimentGerman import evaluation, lexicon, vaderSentimentGER, vectorized
+from VaderGerman.vaderSentimentGerman.emojis import EmojiTranslator
+from VaderGerman.vaderSentimentGerman.idioms import PhraseMatcher
+from VaderGerman.vaderSentimentGerman.tokenizer import tokenize, tokenize_with_offsets
+from VaderGerman.vaderSentimentGerman.vaderSentimentGER import SentimentIntensityAnalyzer, SentiText, entry, sentimentAll
+
+GOLDEN_CORPUS = os.path.join(os.path.dirname(__file__), 'data', 'gervader_golden.jsonl.gz')
+
+def read_golden_corpus():
+    """
+    Read the golden corpus, a gzipped JSON line per text with the expected `polarity_scores` output
+
+    The scores were produced by the original list.index based implementation with only
+    the duplicate token index bug fixed, the texts are randomly generated from the lexicon,
+    boosters, negations, idioms, emojis and punctuation plus the demo sentences.
+
+    Since emojis are translated wherever they occur, the reference translates them by a naive
+    longest match at every character. This changed the expected scores of the texts with emojis
+    attached to punctuation, and 300 texts with emojis attached to words and to each other were added.
+    """
+    with gzip.open(GOLDEN_CORPUS, 'rt', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+class TestLexicon(unittest.TestCase):
+    """
+    Testing the compiled lexicon artifact
+    """
+    def setUp(self):
+        self.lexicon_path = lexicon.resolve_path(lexicon.DEFAULT_LEXICON_FILE)
+        self.emoji_path = lexicon.resolve_path(lexicon.DEFAULT_EMOJI_LEXICON_FILE)
+
+    def test_compiled_up_to_date(self):
+        is_up_to_date = lexicon.check_compiled(lexicon.DEFAULT_COMPILED_FILE, self.lexicon_path, self.emoji_path)
+        self.assertTrue(is_up_to_date, "Rebuild the lexicon with `python -m VaderGerman.vaderSentimentGerman.lexicon`")
+
+    def test_compiled_matches_text(self):
+        compiled = lexicon.load_compiled(lexicon.DEFAULT_COMPILED_FILE, self.lexicon_path, self.emoji_path)
+        self.assertEqual(compiled, lexicon.load_text(self.lexicon_path, self.emoji_path))
+
+    def test_stale_artifact_rejected(self):
+        """
+        An edit which keeps the size of a source must not load the stale artifact
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            lexicon_path = os.path.join(directory, 'lexicon.txt')
+            emoji_path = os.path.join(directory, 'emojis.txt')
+            compiled_path = os.path.join(directory, 'lexicons.bin')
+            with open(lexicon_path, 'w', encoding='utf-8') as f:
+                f.write('gut\t0.5')
+            with open(emoji_path, 'w', encoding='utf-8') as f:
+                f.write(':)\tsmile')
+            lexicon.compile_lexicons(lexicon_path, emoji_path, compiled_path)
+            self.assertEqual(lexicon.load_compiled(compiled_path, lexicon_path, emoji_path)[0], {'gut': 0.5})
+
+            with open(lexicon_path, 'w', encoding='utf-8') as f:
+                f.write('gut\t0.7')
+            with self.assertRaises(lexicon.LexiconFormatError):
+                lexicon.load_compiled(compiled_path, lexicon_path, emoji_path)
+            self.assertFalse(lexicon.check_compiled(compiled_path, lexicon_path, emoji_path))
+
+    def test_invalid_artifact_rejected(self):
+        with self.assertRaises(lexicon.LexiconFormatError):
+            lexicon._read_header(b'XXXX' + bytes(lexicon.HEADER.size))
+
+    def test_analyzers_share_lexicon(self):
+        analyzer = SentimentIntensityAnalyzer()
+        self.assertIs(analyzer.lexicon, SentimentIntensityAnalyzer().lexicon)
+        self.assertEqual(analyzer.lexicon, analyzer.make_lex_dict())
+        self.assertEqual(analyzer.emojis, analyzer.make_emoji_dict())
+
+class TestTokenizer(unittest.TestCase):
+    """
+    Testing the single pass tokenizer
+    """
+    def test_punctuation_stripped(self):
+        tokens = tokenize("Hallo, Welt!!! ,gut ?!?super a :-) don't ...")
+        self.assertEqual(tokens, ["Hallo", "Welt", "gut", "super", ":-)", "don't", "..."])
+
+    def test_punctuation_kept_around_words_with_punctuation(self):
+        self.assertEqual(tokenize("c.a.t, ,cat, cat!!!!! x."), ["c.a.t,", ",cat,", "cat!!!!!", "x."])
+
+    def test_offsets(self):
+        text = "  Hallo, Welt!! :-) gut"
+        tokens, offsets = tokenize_with_offsets(text)
+
+        self.assertEqual(tokens, tokenize(text))
+        self.assertEqual([text[start:end] for start, end in offsets], tokens)
+
+class TestPolarityScores(unittest.TestCase):
+    """
+    Testing the scoring engine
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.analyzer = SentimentIntensityAnalyzer()
+        cls.golden_corpus = read_golden_corpus()
+
+    def test_golden_corpus(self):
+        self.assertGreater(len(self.golden_corpus), 3000)
+        for entry in self.golden_corpus:
+            self.assertEqual(self.analyzer.polarity_scores(entry["text"]), entry["scores"], entry["text"])
+
+    def test_repeated_word_scored_by_position(self):
+        # "nicht" only negates the second "gut", the first one stays positive
+        sentiments = self.analyzer.polarity_scores("gut nicht gut")
+        single = self.analyzer.polarity_scores("gut")
+
+        self.assertGreater(sentiments["pos"], 0)
+        self.assertGreater(sentiments["neg"], 0)
+        self.assertGreater(single["compound"], 0)
+
+    def test_but_check_scales_by_position(self):
+        sentiments = [2.0, 1.0, 0, 2.0, 3.0]
+        words = ["a", "b", "but", "c", "d"]
+
+        result = SentimentIntensityAnalyzer._but_check(words, list(sentiments))
+
+        self.assertEqual(result, [1.0, 0.5, 0, 3.0, 4.5])
+
+class TestBatchScoring(unittest.TestCase):
+    """
+    Testing the batch scoring API
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.analyzer = SentimentIntensityAnalyzer()
+        cls.texts = [entry["text"] for entry in read_golden_corpus()[:400]]
+        cls.expected = [cls.analyzer.polarity_scores(text) for text in cls.texts]
+
+    def test_batch_in_process(self):
+        result = self.analyzer.polarity_scores_batch(iter(self.texts), workers=4)
+        self.assertEqual(result, self.expected)
+
+    def test_batch_process_pool_keeps_order(self):
+        analyzer = SentimentIntensityAnalyzer()
+        analyzer.min_parallel_batch = 0
+
+        result = analyzer.polarity_scores_batch(self.texts, workers=2, chunksize=25)
+
+        self.assertEqual(result, self.expected)
+
+    def test_iter_polarity_scores(self):
+        result = list(self.analyzer.iter_polarity_scores(iter(self.texts), workers=2, chunksize=30))
+        self.assertEqual(result, self.expected)
+
+    def test_empty_batch(self):
+        self.assertEqual(self.analyzer.polarity_scores_batch([], workers=2), [])
+
+class TestEvaluation(unittest.TestCase):
+    """
+    Testing the single pass evaluation of a labeled corpus
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.analyzer = SentimentIntensityAnalyzer()
+        cls.rows = [
+            ('positive', "Das ist wirklich großartig!"),
+            ('positive', "Ich hasse diesen Film."),
+            ('negative', "Das war ein schrecklicher Tag."),
+            ('neutral', "Der Zug fährt um acht Uhr."),
+            ('neutral', "Super Wetter heute!"),
+            ('unlabeled', "Ein ganz normaler Satz."),
+        ]
+        cls.directory = tempfile.mkdtemp()
+        cls.corpus = os.path.join(cls.directory, 'corpus.tsv')
+        with open(cls.corpus, 'w', encoding='utf-8') as f:
+            for i, (label, text) in enumerate(cls.rows):
+                f.write('{}\t{}\t{}\n'.format(i, label, text))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def expected_confusion(self, threshold):
+        confusion = {gold: dict.fromkeys(evaluation.LABELS, 0) for gold in evaluation.LABELS + (evaluation.UNKNOWN,)}
+        for label, text in self.rows:
+            gold = label if label in evaluation.LABELS else evaluation.UNKNOWN
+            confusion[gold][evaluation.classify(self.analyzer.polarity_scores(text)['compound'], threshold)] += 1
+        return confusion
+
+    def test_report(self):
+        report = evaluation.evaluate(self.corpus, workers=1, thresholds=[0.0, 0.05, 0.5])
+
+        self.assertEqual(report['documents'], len(self.rows))
+        self.assertEqual(report['confusion'], self.expected_confusion(0.05))
+        self.assertEqual(report['labels'], {'positive': 2, 'neutral': 2, 'negative': 1, 'unknown': 1})
+        self.assertEqual([entry['threshold'] for entry in report['sweep']], [0.0, 0.05, 0.5])
+        self.assertEqual(report['sweep'][1]['classes'], report['classes'])
+        self.assertIn(report['best_threshold'], [0.0, 0.05, 0.5])
+        json.dumps(report)
+
+    def test_metrics(self):
+        confusion = {gold: dict.fromkeys(evaluation.LABELS, 0) for gold in evaluation.LABELS + (evaluation.UNKNOWN,)}
+        confusion['positive'].update(positive=3, negative=1)
+        confusion['negative'].update(negative=2, positive=1)
+        confusion['unknown'].update(positive=5)
+
+        summary = evaluation.summarize(confusion)
+
+        self.assertAlmostEqual(summary['accuracy'], 5 / 7)
+        self.assertEqual(summary['classes']['positive'], {'precision': 0.75, 'recall': 0.75, 'f1': 0.75, 'support': 4})
+        self.assertEqual(summary['classes']['neutral'], {'precision': 0.0, 'recall': 0.0, 'f1': 0.0, 'support': 0})
+
+    def test_parallel_matches_in_process(self):
+        self.assertEqual(
+            evaluation.evaluate(self.corpus, analyzer=self.analyzer, workers=2),
+            evaluation.evaluate(self.corpus, analyzer=self.analyzer, workers=1),
+        )
+
+    def test_sweep_thresholds(self):
+        self.assertEqual(evaluation.sweep_thresholds(0.0, 0.2, 0.05), [0.0, 0.05, 0.1, 0.15, 0.2])
+
+    def test_legacy_outputs(self):
+        cwd = os.getcwd()
+        os.chdir(self.directory)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                report = sentimentAll(self.corpus, 'corpus')
+                entry(self.corpus, 'corpus', 'positive')
+        finally:
+            os.chdir(cwd)
+
+        with open(os.path.join(self.directory, 'results', 'mode_All', 'corpus', 'GERVADER_positive.tsv'), encoding='utf-8') as f:
+            self.assertEqual(len(f.readlines()), report['predictions']['positive'])
+        with open(os.path.join(self.directory, 'results', 'corpus', 'positive', 'GERVADER_right.tsv'), encoding='utf-8') as f:
+            self.assertEqual(len(f.readlines()), report['confusion']['positive']['positive'])
+
+@unittest.skipIf(vectorized.np is None, "numpy is not installed")
+class TestVectorizedScoring(unittest.TestCase):
+    """
+    Testing the NumPy scoring backend against `polarity_scores`
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.analyzer = SentimentIntensityAnalyzer()
+
+    def assertScoresMatch(self, texts, chunksize=None):
+        result = self.analyzer.polarity_scores_vectorized(texts, chunksize=chunksize)
+        self.assertEqual(len(result), len(texts))
+        for text, scores in zip(texts, result):
+            expected = self.analyzer.polarity_scores(text)
+            for key, value in expected.items():
+                self.assertAlmostEqual(scores[key], value, delta=vectorized.TOLERANCE, msg=text)
+
+    def test_golden_corpus(self):
+        self.assertScoresMatch([entry["text"] for entry in read_golden_corpus()], chunksize=256)
+
+    def test_rules(self):
+        self.assertScoresMatch([
+            "Das ist SEHR gut, aber nicht toll",
+            "nicht so gut but schlecht",
+            "never so schön",
+            "at least gut",
+            "least gut",
+            "ein kind of gut",
+            "Das ist the shit!!",
+            "Guter Film 🔛 ??",
+            "",
+            "a b c",
+            "???",
+        ])
+
+    def test_idiom_words_without_idiom(self):
+        self.assertFalse(vectorized.has_idiom("the kiss"))
+        self.assertTrue(vectorized.has_idiom("Das ist the shit!"))
+
+    def test_vocabulary_is_bounded(self):
+        scorer = vectorized.VectorizedScorer(self.analyzer, max_vocabulary=3)
+        scorer.polarity_scores_batch(["eins zwei drei vier"])
+        self.assertEqual(scorer.polarity_scores_batch(["gut"]), [self.analyzer.polarity_scores("gut")])
+        self.assertEqual(len(scorer.vocabulary), 2)
+
+class TestPhraseMatcher(unittest.TestCase):
+    """
+    Testing the idiom automaton
+    """
+    def test_overlapping_phrases(self):
+        matcher = PhraseMatcher([{"a b": 1, "b c": 2, "a b c d": 3}, {"b c": -1}])
+
+        spans = matcher.match("x a b c d a b".split())
+
+        self.assertEqual(spans, {(1, 3): (1, None), (2, 4): (2, -1), (1, 5): (3, None), (5, 7): (1, None)})
+
+    def test_no_match(self):
+        self.assertEqual(PhraseMatcher([{"kind of": 1}]).match("kind kind x of".split()), {})
+
+    def test_special_idioms(self):
+        analyzer = SentimentIntensityAnalyzer()
+        sentitext = SentiText("Das ist the shit")
+        self.assertEqual(sentitext.idiom_spans, {(2, 4): (3, None)})
+        self.assertEqual(analyzer._special_idioms_check(1.0, sentitext.idiom_spans, 3), 3)
+        self.assertEqual(analyzer._special_idioms_check(1.0, sentitext.idiom_spans, 2), 3)
+
+    def test_multi_word_booster(self):
+        with patch.dict(vaderSentimentGER.BOOSTER_DICT, {"sort of": vaderSentimentGER.B_DECR}):
+            vaderSentimentGER.compile_idioms()
+            try:
+                spans = SentiText("Das ist sort of gut").idiom_spans
+            finally:
+                vaderSentimentGER.compile_idioms()
+
+        self.assertEqual(spans, {(2, 4): (None, vaderSentimentGER.B_DECR)})
+        self.assertAlmostEqual(SentimentIntensityAnalyzer._special_idioms_check(1.0, spans, 4), 1.0 + vaderSentimentGER.B_DECR)
+
+    def test_sentiment_laden_idioms(self):
+        check = SentimentIntensityAnalyzer._sentiment_laden_idioms_check
+        self.assertEqual(check(0.5, "er ist under the weather und in the red"), -2)
+        self.assertEqual(check(0.5, "in the reddish"), 0.5)
+
+class TestEmojiTranslator(unittest.TestCase):
+    """
+    Testing the translation of emojis into their descriptions
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.analyzer = SentimentIntensityAnalyzer()
+        cls.translator = cls.analyzer.emoji_translator
+
+    def translate(self, text):
+        return self.translator.translate(text).split()
+
+    def test_text_without_emoji_unchanged(self):
+        text = "Das ist toll!! #1 2019 ok"
+        self.assertIs(self.translator.translate(text), text)
+
+    def test_attached_emojis(self):
+        self.assertEqual(self.translate("toll😀!"), ["toll", "grinning", "face", "!"])
+        self.assertEqual(self.translate("😂😂"), ["face", "with", "tears", "of", "joy"] * 2)
+
+    def test_longest_sequence(self):
+        self.assertEqual(self.translate("x👍🏻"), ["x", "thumbs", "up:", "light", "skin", "tone"])
+        self.assertEqual(self.translate("1⃣2️⃣ 2019"), ["keycap:", "1", "keycap:", "2", "2019"])
+
+    def test_same_scores_as_standalone_emoji(self):
+        self.assertEqual(self.analyzer.polarity_scores("Super😀"), self.analyzer.polarity_scores("Super 😀"))
+
+    def test_ascii_emojis(self):
+        translator = EmojiTranslator({":)": "smiley", "#⃣": "keycap hash"})
+        self.assertIsNone(translator.markers)
+        self.assertEqual(translator.translate("ok:) #⃣#"), "ok smiley   keycap hash #")
+
+    def test_shared_translator(self):
+        self.assertIs(SentimentIntensityAnalyzer().emoji_translator, self.translator)